@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+import argparse
+
+from .lib.pool_registry import registry
+from .lib.stream import STDIN
+from .main import get_args_parser
+from .strategy.stream import ObfuscateStream
+
+BATCH_CHUNKS_PER_WORKER = 4  # Chunks of a batch per worker: a slow chunk does not hold the others back
+
+_worker_obfuscator = None  # Obfuscator of the current pool worker process
+
+
+def _init_batch_worker(obfuscator):
+    """Run before the batch pool starts: its workers inherit the obfuscator"""
+    global _worker_obfuscator
+    _worker_obfuscator = obfuscator
+
+
+def _obfuscate_chunk(records):
+    """Worker function: obfuscate a chunk on the worker's own obfuscator, only the records cross process boundaries"""
+    return _worker_obfuscator._obfuscate_chunk(records)
+
+
+def _parse_options(salt, options):
+    """Command line args of options by their dest name: through the parser, with its types and checks"""
+    parser = get_args_parser()
+    parser.exit_on_error = False
+    actions = {action.dest: action for action in parser._actions if action.option_strings}
+    argv = ["--input", STDIN, "--salt", salt]
+    for name, value in options.items():
+        if name not in actions:
+            raise TypeError(f"Unknown option: {name}")
+        action = actions[name]
+        if action.nargs == 0:
+            # A flag: given when the value is not its default
+            if bool(value) != bool(action.default):
+                argv.append(action.option_strings[-1])
+        elif value is not None:
+            argv.extend([action.option_strings[-1], str(value)])
+    try:
+        return parser.parse_args(argv)
+    except argparse.ArgumentError as e:
+        raise ValueError(str(e)) from e
+
+
+class Obfuscator:
+    """Obfuscate bytes, lines and batches of records with one scrubber, built once for a salt
+
+    In memory: no files, no temp folders. Options are the command line ones, by their dest name, checked
+    the way the command line checks them (ValueError):
+
+        with Obfuscator(salt="1234", engine="native", workers=4) as obfuscator:
+            records = obfuscator.obfuscate_batch(records)
+
+    Records are str or bytes, and results have the type of their record.
+    Instances are independent: each has its own salt, token caches and workers pool.
+    """
+
+    def __init__(self, salt="1234", **options):
+        self._strategy = ObfuscateStream(_parse_options(salt, options))
+        self._strategy.customise_scrubber()
+        self.args = self._strategy.args
+        # Its own pool: closing it leaves the other instances' ones
+        self._purpose = ("api", id(self))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """Shut the workers pool of obfuscate_batch down"""
+        registry.close(self._strategy.pool_function, purpose=self._purpose)
+
+    def obfuscate_bytes(self, data):
+        """Obfuscate a bytes buffer of any number of lines"""
+        return self._strategy.scrub_batch([data])
+
+    def obfuscate_text(self, text):
+        return self.obfuscate_bytes(text.encode("utf-8", errors="surrogateescape")).decode(
+            "utf-8", errors="surrogateescape"
+        )
+
+    def _obfuscate(self, record):
+        return self.obfuscate_bytes(record) if isinstance(record, bytes) else self.obfuscate_text(record)
+
+    def obfuscate_lines(self, lines):
+        """Yield the obfuscated lines of an iterable, lazily: fit for endless inputs"""
+        for line in lines:
+            yield self._obfuscate(line)
+
+    def _obfuscate_chunk(self, records):
+        return [self._obfuscate(record) for record in records]
+
+    def obfuscate_batch(self, records, workers=None):
+        """Obfuscate a list of records, in order
+
+        :param workers: fan out on a workers pool of this size. Default: --workers, 1 to obfuscate in this process
+        """
+        records = list(records)
+        workers = workers or self.args.workers
+        if workers <= 1 or len(records) <= 1 or self.args.serially:
+            return self._obfuscate_chunk(records)
+
+        chunk_size = max(1, -(-len(records) // (workers * BATCH_CHUNKS_PER_WORKER)))
+        chunks = [records[idx : idx + chunk_size] for idx in range(0, len(records), chunk_size)]
+        # The obfuscator and its scrubber reach each worker once, not with every chunk
+        with registry.borrow(
+            self._strategy.pool_function,
+            workers,
+            purpose=self._purpose,
+            initializer=_init_batch_worker,
+            initargs=(self,),
+        ) as pool:
+            results = pool.map(_obfuscate_chunk, chunks)
+        return [record for chunk in results for record in chunk]
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Per-item IPC overhead of the hybrid pipeline: strategy-bound payloads vs compact ones
+
+Usage: python -m obfuscator.benchmarks.pipeline_ipc -i <input folder> [obfuscator arguments] [--rounds N]
+
+Before: every item travelled with its stage function - a bound method that pickles the whole strategy -
+and a filth_to_segment dict keyed by filth objects.
+After: workers build the strategies once in their initializer, items are (flag, path, {placeholder: segments}).
+"""
+import multiprocessing
+import pickle
+import sys
+import time
+
+from ..lib import utils
+from ..main import get_args_parser
+from ..strategy.hybrids import ObfuscateHybrid
+
+
+def _echo(in_queue, out_queue):
+    for message in iter(in_queue.get, None):
+        out_queue.put(message)
+
+
+def measure(payloads, rounds):
+    """Return (mean pickled bytes, mean pickle seconds, mean queue round trip seconds) per payload"""
+    start = time.perf_counter()
+    sizes = [len(pickle.dumps(payload)) for _ in range(rounds) for payload in payloads]
+    pickle_time = (time.perf_counter() - start) / len(sizes)
+
+    in_queue, out_queue = multiprocessing.Queue(), multiprocessing.Queue()
+    process = multiprocessing.Process(target=_echo, args=(in_queue, out_queue))
+    process.start()
+    try:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for payload in payloads:
+                in_queue.put(payload)
+                out_queue.get()
+        round_trip = (time.perf_counter() - start) / len(sizes)
+    finally:
+        in_queue.put(None)
+        process.join()
+    return sum(sizes) / len(sizes), pickle_time, round_trip
+
+
+def main():
+    parser = get_args_parser()
+    parser.add_argument("--rounds", type=int, default=20, help="Times to send every item")
+    args = parser.parse_args()
+    utils.init_logger(args)
+
+    hybrid = ObfuscateHybrid(args)
+    hybrid.raw_files = utils.get_text_files(args)
+    hybrid.pre_all()
+    strategy = hybrid.main_strategy
+    items = [item for item in map(strategy.orchestrate_iterator, hybrid.raw_files) if item[1] is not None]
+    if not items:
+        utils.logger.warning("No files with segments to measure")
+        return 1
+
+    work = [hybrid.orchestrator.decide(item) for item in items]
+    before = [
+        (hybrid.orchestrator.obfuscate_file, (flag, src_file, strategy.resolve_filths(future_args)))
+        for flag, src_file, future_args in work
+    ]
+    results = {"before": measure(before, args.rounds), "after": measure(work, args.rounds)}
+
+    print(f"{len(items)} items x {args.rounds} rounds")
+    for name, (size, pickle_time, round_trip) in results.items():
+        print(
+            f"{name:>6}: {size:10.0f} bytes/item  pickle {pickle_time * 1e6:8.1f} us  queue {round_trip * 1e6:8.1f} us"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
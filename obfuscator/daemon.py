@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+import argparse
+import copy
+import itertools
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import stat
+import sys
+import threading
+
+from .lib import utils
+from .lib.enums import RCEnum
+from .lib.pool_registry import registry
+from .lib.stream import STDIN
+from .main import create_strategy, input_path
+
+# Events sent back to the client, one JSON object per line
+QUEUED = "queued"
+STARTED = "started"
+LOG = "log"
+ERROR = "error"
+DONE = "done"
+
+
+class _JobLogHandler(logging.Handler):
+    """Forwards the log records of the running job to its client"""
+
+    def __init__(self, events):
+        super().__init__()
+        self.events = events
+        self.setFormatter(logging.Formatter("%(message)s"))
+
+    def emit(self, record):
+        self.events.put({"event": LOG, "level": record.levelname, "message": self.format(record)})
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    def _send(self, event):
+        self.wfile.write(json.dumps(event).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def handle(self):
+        try:
+            events = self.server.obfuscator.submit(json.loads(self.rfile.readline()))
+        except (KeyError, ValueError, TypeError, argparse.ArgumentTypeError) as e:
+            self._send({"event": ERROR, "message": f"Bad job: {e}"})
+            self._send({"event": DONE, "rc": RCEnum.FAILURE.value})
+            return
+        while True:
+            event = events.get()
+            self._send(event)
+            if event["event"] == DONE:
+                return
+
+
+class ObfuscatorDaemon:
+    """Resident obfuscator: runs jobs sent over a Unix-domain socket, without per-invocation startup
+
+    Modules, compiled detectors and workers pools stay warm across jobs. A job is a JSON line:
+    {"input": path, "output": path, "salt": str, "strategy": name, "priority": int}, and the daemon
+    answers with JSON lines of events - queued, started, log records, done with the run's rc.
+    Jobs run one at a time, lowest priority first then in arrival order, and share the pools:
+    a job's salt and keywords travel with its tasks, warm workers keep no previous job's ones.
+    Other options are the daemon's own.
+    """
+
+    def __init__(self, args, socket_path):
+        self.args = args
+        self.socket_path = socket_path
+        self._jobs = queue.PriorityQueue()
+        self._arrival = itertools.count()
+
+    def _job_args(self, request):
+        if request["input"] == STDIN:
+            raise ValueError("the daemon has no stdin to read")
+        args = copy.copy(self.args)
+        args.input_folder = input_path(request["input"])
+        args.output_folder = request.get("output") or None
+        args.salt = str(request.get("salt", self.args.salt))
+        args.strategy = request.get("strategy", self.args.strategy)
+        return args
+
+    def submit(self, request):
+        """Queue a job: return the queue of its events"""
+        args = self._job_args(request)
+        events = queue.Queue()
+        events.put({"event": QUEUED, "position": self._jobs.qsize()})
+        self._jobs.put((int(request.get("priority", 0)), next(self._arrival), args, events))
+        return events
+
+    @staticmethod
+    def _run(args, events):
+        handler = _JobLogHandler(events)
+        utils.logger.addHandler(handler)
+        try:
+            strategy = create_strategy(args)
+            events.put({"event": STARTED, "strategy": str(strategy)})
+            rc = strategy.run()
+        except Exception as e:
+            events.put({"event": ERROR, "message": str(e)})
+            rc = RCEnum.FAILURE.value
+        finally:
+            utils.logger.removeHandler(handler)
+        events.put({"event": DONE, "rc": rc})
+
+    def _run_jobs(self):
+        while True:
+            _, _, args, events = self._jobs.get()
+            self._run(args, events)
+
+    def _remove_stale_socket(self):
+        """Remove the socket a dead daemon left behind: not a live daemon's, nor anything but a socket"""
+        try:
+            mode = os.lstat(self.socket_path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(f"Daemon: {self.socket_path} exists and is not a socket")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(self.socket_path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                pass  # Nobody listens: stale
+            else:
+                raise FileExistsError(f"Daemon: another daemon is listening on {self.socket_path}")
+        os.remove(self.socket_path)
+
+    def serve_forever(self):
+        self._remove_stale_socket()
+        registry.resident = True
+        # Owner only from its creation on: a chmod after bind leaves a window where others may connect
+        umask = os.umask(0o177)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(self.socket_path, _JobHandler)
+        finally:
+            os.umask(umask)
+        server.daemon_threads = True
+        server.obfuscator = self
+        threading.Thread(target=self._run_jobs, name="jobs", daemon=True).start()
+        utils.logger.info(f"Daemon: listening on {self.socket_path}")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            os.remove(self.socket_path)
+            registry.shutdown(force=True)
+
+
+def _print_event(event):
+    if event["event"] == LOG:
+        print(event["message"], file=sys.stderr)
+    elif event["event"] != DONE:
+        print(f"{event['event']}: {json.dumps(event)}", file=sys.stderr)
+
+
+def submit_job(socket_path, request, on_event=_print_event):
+    """Client: send a job to the daemon, pass its events to on_event, return the job's rc"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        for line in sock.makefile("rb"):
+            event = json.loads(line)
+            on_event(event)
+            if event["event"] == DONE:
+                return event["rc"]
+    raise ConnectionError(f"Daemon {socket_path} closed the connection before the job was done")
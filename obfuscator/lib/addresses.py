@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+import ipaddress
+import re
+
+# Runs of hex digits, colons and dots that have a colon or a dot, not followed by a word: cheap, no backtracking
+# alternation. A run may start right after a key (ip:10.0.0.1, host_10.0.0.1). An IPv6 zone id (fe80::1%eth0)
+# is part of its run
+CANDIDATE_REGEX = r"[0-9a-f]*[:.][0-9a-f:.]*(?:%[\w.-]+)?(?![\w:.])"
+MAC_REGEX = re.compile(r"([0-9a-f]{2}:){5}[0-9a-f]{2}", re.IGNORECASE)
+
+
+def is_ipv4(text):
+    parts = text.split(".")
+    return len(parts) == 4 and all(0 < len(part) <= 3 and part.isdigit() and int(part) <= 255 for part in parts)
+
+
+def is_ipv6(text):
+    try:
+        ipaddress.IPv6Address(text)
+    except ValueError:
+        return False
+    return True
+
+
+class AddressClassifier:
+    """Find MAC, IPv4 and IPv6 addresses: extract candidate tokens with a cheap regex, then validate them
+
+    Replaces the address regexes in a SegmentScanner: its regex is the candidate pattern, and classify
+    tells which filth - if any - a candidate is. A candidate may follow a key: ip:10.0.0.1, mac:00:1a:2b:3c:4d:5e
+    or host_10.0.0.1, the key's last hex letters (the "ac" of mac:) are left out. It never runs into a word:
+    1.2.3.4port is not an address. An IPv4 may be followed by a port (or more colon parts),
+    and a trailing dot ends a sentence, not the address. The zone id of an IPv6 (fe80::1%eth0) names
+    a host's interface: it is obfuscated with the address.
+    """
+
+    regex = CANDIDATE_REGEX
+
+    def __init__(self, mac, ipv4, ipv6):
+        self.mac = mac
+        self.ipv4 = ipv4
+        self.ipv6 = ipv6
+        # Filths order: the replacement precedence
+        self.filths = [mac, ipv4, ipv6]
+
+    def classify(self, candidate):
+        """Return (filth, segment) of an address in candidate, None if there is none"""
+        # The candidate as it is, without the separator of a key, without a key: prefix
+        for text in dict.fromkeys((candidate, candidate.lstrip("."), candidate.partition(":")[2])):
+            address = self._classify(text)
+            if address is not None:
+                return address
+        return None
+
+    def _classify(self, candidate):
+        if MAC_REGEX.fullmatch(candidate):
+            return self.mac, candidate
+        address, _, zone = candidate.rstrip(".").partition("%")
+        if address.count(":") >= 2 and is_ipv6(address):
+            return self.ipv6, f"{address}%{zone}" if zone else address
+        head = address.split(":", 1)[0].rstrip(".")
+        if is_ipv4(head):
+            return self.ipv4, head
+        return None
+
+    def iter_addresses(self, text):
+        """Yield (filth, segment) of every address in text"""
+        for match in re.finditer(self.regex, text, re.IGNORECASE):
+            address = self.classify(match.group())
+            if address is not None:
+                yield address
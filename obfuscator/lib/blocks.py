@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+import os
+import re
+import shutil
+from tempfile import mkstemp
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from .segments import iter_line_blocks
+
+IO_TEXT = "text"  # --io-mode value: decode files as UTF-8
+IO_BYTES = "bytes"  # --io-mode value: scrub raw bytes
+LINE_MODE = 0  # --block-size-in-bytes value: scrub line by line
+BLOCK_SIZE = 4 * 1024 * 1024  # 4 MB of whole lines per scrubber.clean call
+
+# Anchors that match at a line edge when scrubbing lines, but only at a block edge when scrubbing blocks
+_STRING_ANCHORS = {sre_parse.AT_BEGINNING_STRING, sre_parse.AT_END_STRING}
+_LINE_ANCHORS = {sre_parse.AT_BEGINNING, sre_parse.AT_END}  # Unless MULTILINE
+
+
+_NEWLINE = ord("\n")
+# Character categories of \s, \D, \W: they have the newline
+_NEWLINE_CATEGORIES = {
+    sre_parse.CATEGORY_SPACE,
+    sre_parse.CATEGORY_NOT_DIGIT,
+    sre_parse.CATEGORY_NOT_WORD,
+    sre_parse.CATEGORY_LINEBREAK,
+}
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, "POSSESSIVE_REPEAT", None)}
+
+
+def _in_has_newline(items):
+    negate = bool(items) and items[0][0] is sre_parse.NEGATE
+    found = False
+    for op, av in items[1:] if negate else items:
+        if op is sre_parse.LITERAL:
+            found = av == _NEWLINE
+        elif op is sre_parse.RANGE:
+            found = av[0] <= _NEWLINE <= av[1]
+        elif op is sre_parse.CATEGORY:
+            found = av in _NEWLINE_CATEGORIES
+        else:
+            return True  # Unknown: may have it
+        if found:
+            break
+    return found != negate
+
+
+def _can_match_newline(node, flags):
+    """Whether a pattern may match, or look at, a newline character. True when unsure"""
+    for op, av in node:
+        if op is sre_parse.LITERAL:
+            newline = av == _NEWLINE
+        elif op is sre_parse.NOT_LITERAL:
+            newline = av != _NEWLINE
+        elif op is sre_parse.ANY:
+            newline = bool(flags & re.DOTALL)
+        elif op is sre_parse.IN:
+            newline = _in_has_newline(av)
+        elif op is sre_parse.AT:
+            newline = False
+        elif op in _REPEATS:
+            newline = _can_match_newline(av[2], flags)
+        elif op is sre_parse.SUBPATTERN:
+            _, add_flags, del_flags, pattern = av
+            newline = _can_match_newline(pattern, (flags | add_flags) & ~del_flags)
+        elif op is sre_parse.BRANCH:
+            newline = any(_can_match_newline(pattern, flags) for pattern in av[1])
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            newline = _can_match_newline(av[1], flags)
+        elif op is getattr(sre_parse, "ATOMIC_GROUP", None):
+            newline = _can_match_newline(av, flags)
+        elif op is sre_parse.GROUPREF_EXISTS:
+            newline = any(_can_match_newline(pattern, flags) for pattern in av[1:] if pattern is not None)
+        else:
+            newline = True  # Group references, and any other op
+        if newline:
+            return True
+    return False
+
+
+def _line_dependent(node, anchors, flags):
+    if isinstance(node, sre_parse.SubPattern):
+        return any(_line_dependent_op(op, av, anchors, flags) for op, av in node)
+    if isinstance(node, (tuple, list)):
+        return any(_line_dependent(item, anchors, flags) for item in node)
+    return False
+
+
+def _line_dependent_op(op, av, anchors, flags):
+    if op is sre_parse.AT:
+        return av in anchors
+    if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT) and _can_match_newline(av[1], flags):
+        # Lookahead or lookbehind: sees across the newline into the next or previous line in a block,
+        # only the end or the start of the text line by line. Unless it cannot match a newline at all
+        return True
+    if op is sre_parse.SUBPATTERN:
+        _, add_flags, del_flags, pattern = av
+        return _line_dependent(pattern, anchors, (flags | add_flags) & ~del_flags)
+    return _line_dependent(av, anchors, flags)
+
+
+def block_safe(scrubber):
+    """Whether scrubbing blocks of lines finds the same filths as scrubbing line by line
+
+    True if every detector is a regex without line anchors, nor lookarounds that may see a newline.
+    Matches that cross a line boundary are handled by scrub_block.
+    """
+    detectors = getattr(scrubber, "_detectors", None)
+    if not detectors:
+        return False
+    for detector in detectors.values():
+        regex = getattr(detector.filth_cls, "regex", None)
+        if regex is None:
+            return False
+        if isinstance(regex, str):
+            regex = re.compile(regex)
+        anchors = _STRING_ANCHORS if regex.flags & re.MULTILINE else _STRING_ANCHORS | _LINE_ANCHORS
+        parsed = sre_parse.parse(regex.pattern, regex.flags)
+        if _line_dependent(parsed, anchors, parsed.state.flags):
+            return False
+    return True
+
+
+def _newline(block):
+    return b"\n" if isinstance(block, bytes) else "\n"
+
+
+def iter_lines(block):
+    """Split a str or bytes block into lines, keeping the newlines - like iterating a file does"""
+    newline = _newline(block)
+    start = 0
+    while start < len(block):
+        end = block.find(newline, start)
+        end = len(block) if end == -1 else end + 1
+        yield block[start:end]
+        start = end
+
+
+def scrub_block(scrubber, block):
+    """Scrub a block of whole lines in one scrubber.clean call: same output as line by line
+
+    Tokens have no newlines, so a filth that crossed a line boundary shows as a missing newline:
+    such a block is scrubbed again line by line.
+    """
+    newline = _newline(block)
+    cleaned = scrubber.clean(text=block)
+    if cleaned.count(newline) == block.count(newline):
+        return cleaned
+    return block[:0].join(scrubber.clean(text=line) for line in iter_lines(block))
+
+
+class LineCounter:
+    """Where scrub_stream is: index of the line being scrubbed, of the first line of the block in blocks"""
+
+    def __init__(self):
+        self.line = 0
+
+
+def scrub_stream(scrubber, reader, writer, block_size=BLOCK_SIZE, counter=None):
+    """Scrub reader into writer: in blocks of whole lines, or line by line for LINE_MODE
+
+    counter: a LineCounter kept up to date, e.g. to tell the line an error happened at
+    """
+    counter = LineCounter() if counter is None else counter
+    if block_size == LINE_MODE:
+        for idx, line in enumerate(reader):
+            counter.line = idx
+            writer.write(scrubber.clean(text=line))
+        return
+    lines = 0
+    for block in iter_line_blocks(reader, block_size):
+        counter.line = lines
+        writer.write(scrub_block(scrubber, block))
+        lines += block.count(_newline(block))
+
+
+def scrub_in_place(src_file, scrubber, block_size=BLOCK_SIZE, buffering=-1, binary=False):
+    """Scrub src_file: stream into a temp file next to it, then rename over it
+
+    binary: read and write raw bytes, for a scrubber of bytes (BytesScrubber)
+    """
+    dirname, basename = os.path.split(src_file)
+    tmp_fd, tmp_path = mkstemp(dir=dirname or None, prefix=f"{basename}.", suffix=".tmp")
+    mode, encoding = ("b", None) if binary else ("", "utf-8")
+    try:
+        with open(tmp_fd, f"w{mode}", buffering=buffering, encoding=encoding) as writer, open(
+            src_file, f"r{mode}", buffering=buffering, encoding=encoding
+        ) as reader:
+            scrub_stream(scrubber, reader, writer, block_size)
+        shutil.copymode(src_file, tmp_path)
+        os.replace(tmp_path, src_file)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return src_file
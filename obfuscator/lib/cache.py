@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+import itertools
+import os
+import threading
+from collections import OrderedDict
+
+LINE_CACHE_SIZE = 16 * 1024  # Lines per worker
+LINE_CACHE_MAX_LENGTH = 2 * 1024  # Longer texts (e.g. blocks) are not cached
+TOKEN_CACHE_SIZE = 64 * 1024  # Segment tokens per worker
+PROCESS_CACHES = 16  # Caches a process keeps: the most recently used ones
+
+_process_caches = OrderedDict()  # cache id -> this process's LRUCache of that id
+_process_caches_lock = threading.Lock()
+_cache_ids = itertools.count()
+
+
+def _process_cache(cache_id, maxsize, cache=None):
+    """This process's cache of cache_id: created on first use, then kept across the tasks it comes with"""
+    with _process_caches_lock:
+        cache = _process_caches.get(cache_id, cache)
+        if cache is None:
+            cache = LRUCache(maxsize, cache_id=cache_id)
+        _process_caches[cache_id] = cache
+        _process_caches.move_to_end(cache_id)
+        while len(_process_caches) > PROCESS_CACHES:
+            _process_caches.popitem(last=False)
+        return cache
+
+
+class LRUCache:
+    """Bounded memo: evicts the least recently used entry beyond maxsize, counts hits and misses
+
+    Pickles as a handle: every worker process fills its own cache of that handle, and keeps it across tasks.
+    A new cache - e.g. of another salt's scrubber - is another handle: never mixed up. maxsize 0 disables it.
+    """
+
+    def __init__(self, maxsize, cache_id=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_id = cache_id
+        if cache_id is None:
+            # Unique across processes: a worker's own caches do not take ids of its parent's
+            self.cache_id = (os.getpid(), next(_cache_ids))
+            _process_cache(self.cache_id, maxsize, cache=self)
+
+    def __reduce__(self):
+        return _process_cache, (self.cache_id, self.maxsize)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, compute):
+        """Cached value of key, compute() on a miss"""
+        if not self.maxsize:
+            return compute()
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                pass
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = value
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def get_many(self, keys, compute_many):
+        """Cached values of keys, in order: compute_many(missing keys) computes all misses at once"""
+        keys = list(keys)
+        if not self.maxsize:
+            return list(compute_many(keys))
+        values = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries and key not in values:
+                    self._entries.move_to_end(key)
+                    values[key] = self._entries[key]
+                    self.hits += 1
+        missing = [key for key in dict.fromkeys(keys) if key not in values]
+        if missing:
+            computed = list(zip(missing, compute_many(missing)))
+            values.update(computed)
+            with self._lock:
+                self.misses += len(missing)
+                for key, value in computed:
+                    self._entries[key] = value
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return [values[key] for key in keys]
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.0%}), {len(self)}/{self.maxsize} entries"
+
+
+class CachedScrubber:
+    """Scrubber with a line -> scrubbed line cache in front of clean: repeated lines are scrubbed once
+
+    Texts longer than max_length are scrubbed as they are: it is for line by line scrubbing, not blocks.
+    """
+
+    def __init__(self, scrubber, maxsize=LINE_CACHE_SIZE, max_length=LINE_CACHE_MAX_LENGTH):
+        self.scrubber = scrubber
+        self.max_length = max_length
+        self.lines = LRUCache(maxsize)
+
+    def clean(self, text, **kwargs):
+        if kwargs or len(text) > self.max_length:
+            return self.scrubber.clean(text=text, **kwargs)
+        return self.lines.get(text, lambda: self.scrubber.clean(text=text))
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import os
+from collections import defaultdict
+
+from .pruning import SAMPLE_SIZE
+from .ranges import open_range, split_ranges
+
+DENSITY_SAMPLES = 0  # --density-samples default: no estimate, scan until the threshold is crossed
+
+
+class DensityEstimator:
+    """Estimate the unique segments of a file from the heads of evenly spread byte ranges
+
+    Segments seen in a single sampled range are the ones that keep appearing as the file goes on:
+    they are extrapolated to the bytes not sampled. Segments seen in several ranges - the same few
+    ips all over a log - are counted once. Unique segments of the samples are a lower bound.
+    """
+
+    def __init__(self, scanner, samples=DENSITY_SAMPLES, sample_size=SAMPLE_SIZE):
+        self.scanner = scanner
+        self.samples = samples
+        self.sample_size = sample_size
+
+    def _iter_samples(self, src_file):
+        for file_range in split_ranges(src_file, self.samples):
+            with open_range(file_range, errors="surrogateescape") as reader:
+                # Whole lines, about sample_size of them
+                lines = reader.readlines(self.sample_size)
+            yield "".join(lines)
+
+    def estimate(self, src_file):
+        """Return (unique segments in the samples, estimated unique segments of the file)
+
+        None if the file is too small to be worth sampling: scan all of it.
+        """
+        size = os.path.getsize(src_file)
+        if self.samples < 2 or size <= 2 * self.samples * self.sample_size:
+            return None
+
+        ranges_of = defaultdict(set)  # segment -> indices of the samples it is in
+        sampled_size = 0
+        for idx, sample in enumerate(self._iter_samples(src_file)):
+            sampled_size += len(sample.encode("utf-8", errors="surrogateescape"))
+            for filth, segment in self.scanner.iter_block_segments(sample):
+                ranges_of[(filth, segment)].add(idx)
+        if not sampled_size:
+            return None
+        unique = len(ranges_of)
+        singletons = sum(1 for indices in ranges_of.values() if len(indices) == 1)
+        return unique, unique + int(singletons * (size - sampled_size) / sampled_size)
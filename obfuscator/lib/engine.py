@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+import re
+import time
+
+from .cache import TOKEN_CACHE_SIZE, LRUCache
+from .pruning import DetectorStats, can_match, required_chars
+
+ENGINE_SCRUBADUB = "scrubadub"  # --engine value: scrubadub's Scrubber.clean
+ENGINE_NATIVE = "native"  # --engine value: NativeScrubber below
+
+_SCOPED_FLAGS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"), (re.VERBOSE, "x"), (re.ASCII, "a"))
+# Group references break once patterns are joined: their group numbers shift
+_GROUP_REFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+_STR_ONLY_SPACES = re.compile(rb"[\x1c-\x1f]")  # ASCII that str \s matches, and bytes \s does not
+
+
+def _scoped(regex):
+    pattern = regex.pattern.decode("ascii") if isinstance(regex.pattern, bytes) else regex.pattern
+    flags = "".join(letter for flag, letter in _SCOPED_FLAGS if regex.flags & flag)
+    return f"(?{flags}:{pattern})" if flags else f"(?:{pattern})"
+
+
+def _alternation(regexes, binary=False):
+    """One regex of all regexes, a named group each: None if they cannot be joined"""
+    patterns = [_scoped(regex) for regex in regexes]
+    if any(_GROUP_REFERENCE.search(pattern) for pattern in patterns):
+        return None
+    pattern = "|".join(f"(?P<f{idx}>{pattern})" for idx, pattern in enumerate(patterns))
+    try:
+        return re.compile(pattern.encode("ascii") if binary else pattern)
+    except re.error:
+        # e.g. group names repeated across detectors: scan every text
+        return None
+
+
+def _find_spans(text, regexes, indices=None, stats=None, names=None):
+    """Matches (start, end, regex index, match) of the regexes at indices, timed per name in stats"""
+    spans = []
+    for idx in range(len(regexes)) if indices is None else indices:
+        if stats is None:
+            spans.extend((match.start(), match.end(), idx, match) for match in regexes[idx].finditer(text))
+            continue
+        start = time.perf_counter()
+        found = [(match.start(), match.end(), idx, match) for match in regexes[idx].finditer(text)]
+        stats.add(names[idx], hits=len(found), seconds=time.perf_counter() - start)
+        spans.extend(found)
+    return spans
+
+
+def _iter_groups(text, regexes, indices=None, stats=None, names=None):
+    """Groups of touching matches (start, end, regex index, match), in scrubadub's order
+
+    Matches are sorted by (start, -end), and each match that starts before the end of the
+    group so far joins the group: scrubadub merges these into one filth.
+    """
+    spans = _find_spans(text, regexes, indices=indices, stats=stats, names=names)
+    if not spans:
+        return
+    # Stable: equal spans keep detectors order
+    spans.sort(key=lambda span: (span[0], -span[1]))
+    group = [spans[0]]
+    group_end = spans[0][1]
+    for span in spans[1:]:
+        if span[0] <= group_end:
+            group.append(span)
+            group_end = max(group_end, span[1])
+            continue
+        yield group
+        group = [span]
+        group_end = span[1]
+    yield group
+
+
+class NativeScrubber:
+    """Scrubber.clean for regex detectors, without scrubadub's per-line machinery
+
+    One alternation of all detectors, a named group each, rules out most texts in a single search.
+    Texts that have filth are scanned by every detector, the way scrubadub does: matches are sorted
+    by (start, -end) and touching ones merged. Lone matches are replaced with their filth's token -
+    no sorting of Filth objects - and only merged ones go through Filth.merge, so every token is
+    the one scrubadub emits. Detectors that need a character the text does not have are skipped.
+    """
+
+    def __init__(self, detectors, token_cache_size=TOKEN_CACHE_SIZE):
+        self.detectors = list(detectors)
+        self.filth_classes = [detector.filth_cls for detector in self.detectors]
+        self.regexes = [filth_cls.regex for filth_cls in self.filth_classes]
+        self.regex = _alternation(self.regexes)
+        self.names = [getattr(filth_cls, "type", filth_cls.__name__) for filth_cls in self.filth_classes]
+        self.requirements = [required_chars(regex) for regex in self.regexes]
+        # Per detector hits, skips and time, over the texts this process cleaned
+        self.stats = DetectorStats()
+        # (detector index, segment) -> token of lone matches
+        self.tokens = LRUCache(token_cache_size)
+
+    @classmethod
+    def supports(cls, detector):
+        """Only plain regex detectors: others may find filth a regex does not"""
+        from scrubadub.detectors.base import RegexDetector  # scrubadub on use, not on import
+
+        if not isinstance(detector, RegexDetector) or type(detector).iter_filth is not RegexDetector.iter_filth:
+            return False
+        return isinstance(getattr(detector.filth_cls, "regex", None), re.Pattern)
+
+    @classmethod
+    def from_scrubber(cls, scrubber, token_cache_size=TOKEN_CACHE_SIZE):
+        """NativeScrubber over scrubber's detectors, None if any of them is not supported"""
+        detectors = list(scrubber._detectors.values())
+        if not all(cls.supports(detector) for detector in detectors):
+            return None
+        return cls(detectors, token_cache_size=token_cache_size)
+
+    def active(self, text):
+        """Indices of the detectors that can match text"""
+        indices = []
+        for idx, required in enumerate(self.requirements):
+            if can_match(required, text):
+                indices.append(idx)
+            else:
+                self.stats.add(self.names[idx], skips=1)
+        return indices
+
+    def _filth(self, group):
+        _, _, idx, match = group[0]
+        filth = self.filth_classes[idx](match)
+        for _, _, idx, match in group[1:]:
+            filth = filth.merge(self.filth_classes[idx](match))
+        return filth
+
+    def _token(self, group, **kwargs):
+        if len(group) > 1 or kwargs:
+            return self._filth(group).replace_with(**kwargs)
+        # A lone filth's token depends on its detector and text only: render each segment once
+        _, _, idx, match = group[0]
+        return self.tokens.get((idx, match.group()), lambda: self._filth(group).replace_with())
+
+    def clean(self, text, **kwargs):
+        if self.regex is not None and self.regex.search(text) is None:
+            return text
+        chunks = []
+        pos = 0
+        groups = _iter_groups(text, self.regexes, self.active(text), stats=self.stats, names=self.names)
+        for group in groups:
+            # Merged filth spans the whole group
+            start, end = group[0][0], max(span[1] for span in group)
+            chunks.append(text[pos:start])
+            chunks.append(self._token(group, **kwargs))
+            pos = end
+        chunks.append(text[pos:])
+        return "".join(chunks)
+
+
+class BytesScrubber:
+    r"""Scrubber.clean over raw bytes: no decoding of whole files, no UnicodeDecodeError
+
+    ASCII data - nearly all of a log - is scanned by bytes versions of the detectors' regexes, and only
+    data that has filth is decoded, to build the filths that render the tokens. On ASCII they match what
+    the str regexes do, but for the separators \x1c-\x1f: str \s and \S see them as spaces, bytes ones
+    do not. Data with any of them, and any other data, is decoded with surrogateescape and goes through
+    the str scrubber: invalid bytes survive the round trip untouched.
+    """
+
+    def __init__(self, scrubber):
+        self.scrubber = scrubber
+        native = scrubber if isinstance(scrubber, NativeScrubber) else NativeScrubber.from_scrubber(scrubber)
+        self.native = native if native is not None and self._ascii_patterns(native.regexes) else None
+        if self.native is not None:
+            self.regexes = [
+                re.compile(regex.pattern.encode("ascii"), regex.flags & ~re.UNICODE) for regex in native.regexes
+            ]
+            self.regex = _alternation(self.regexes, binary=True)
+
+    @staticmethod
+    def _ascii_patterns(regexes):
+        return all(regex.pattern.isascii() for regex in regexes)
+
+    def _decoded_clean(self, data, **kwargs):
+        text = data.decode("utf-8", errors="surrogateescape")
+        return self.scrubber.clean(text=text, **kwargs).encode("utf-8", errors="surrogateescape")
+
+    def clean(self, text, **kwargs):
+        """Scrub bytes: named text like Scrubber.clean's argument"""
+        data = text
+        if self.native is None or not data.isascii() or _STR_ONLY_SPACES.search(data):
+            return self._decoded_clean(data, **kwargs)
+        if self.regex is not None and self.regex.search(data) is None:
+            return data
+
+        decoded = None
+        chunks = []
+        pos = 0
+        native = self.native
+        for group in _iter_groups(data, self.regexes, native.active(data), stats=native.stats, names=native.names):
+            # Same positions in the ASCII decoded text: redo the matches there, to build the filths
+            decoded = data.decode("ascii") if decoded is None else decoded
+            str_group = []
+            for start, end, idx, _ in group:
+                match = self.native.regexes[idx].match(decoded, start)
+                if match is None or match.end() != end:
+                    return self._decoded_clean(data, **kwargs)
+                str_group.append((start, end, idx, match))
+            end = max(span[1] for span in group)
+            chunks.append(data[pos : group[0][0]])
+            chunks.append(self.native._token(str_group, **kwargs).encode("utf-8", errors="surrogateescape"))
+            pos = end
+        chunks.append(data[pos:])
+        return b"".join(chunks)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+import copyreg
+import re
+from functools import lru_cache
+
+from . import utils
+from .cache import LRUCache
+from .hashing import format_token, token_key
+
+COLLISIONS_BATCH = 1024  # New tokens of a filth class registered at once, at the latest
+
+
+class _ConfiguredFilth(type):
+    """Metaclass of the configured filth classes: they pickle as their configuration, not by name"""
+
+
+def _legacy_token(filth):
+    return type(filth).base_filth.replace_with(filth)
+
+
+def _token(filth):
+    cls = type(filth)
+    if cls.hasher is None or cls.hasher.legacy:
+        return _legacy_token(filth)
+    if cls.placeholder is None:
+        # The placeholder of the filth's own token, e.g. IPV4 of {{IPV4-8341c}}: low level tokens use the same
+        legacy = _legacy_token(filth)
+        cls.placeholder = legacy[2 : legacy.rindex("-")] if legacy.startswith("{{") and "-" in legacy else ""
+        cls.const_hash = token_key(cls.placeholder, cls.salt)
+    if not cls.placeholder:
+        return _legacy_token(filth)
+    return format_token(cls.placeholder, cls.hasher.hash(f"{cls.const_hash}{filth.text}"))
+
+
+def _new_token(filth):
+    cls = type(filth)
+    token = _token(filth)
+    if cls.registry is not None:
+        cls.new_tokens.append((token, filth.text))
+        if len(cls.new_tokens) >= COLLISIONS_BATCH:
+            check_collisions([cls])
+    return token
+
+
+def _replace_with(filth, *args, **kwargs):
+    cls = type(filth)
+    if args or kwargs:
+        return cls.base_filth.replace_with(filth, *args, **kwargs)
+    # A token depends on the filth's class and text only: render each segment once
+    return cls.tokens.get(filth.text, lambda: _new_token(filth))
+
+
+@lru_cache(maxsize=256)  # A daemon's workers see every job's salt
+def _configured(filth_cls, salt, pattern, flags, hasher, cache_size):
+    attrs = {
+        "base_filth": filth_cls,
+        "salt": salt,
+        "hasher": hasher,
+        "registry": None,
+        "new_tokens": [],  # (token, segment) made since the last check_collisions
+        "placeholder": None,
+        "const_hash": None,
+        # segment -> token of this process. Its own id: not one of the caches that pickle as handles
+        "tokens": LRUCache(cache_size, cache_id=("filth", filth_cls.__name__, salt, pattern, hasher)),
+        "replace_with": _replace_with,
+        "__module__": filth_cls.__module__,
+    }
+    if pattern is not None:
+        attrs["regex"] = re.compile(pattern, flags)
+    return _ConfiguredFilth(filth_cls.__name__, (filth_cls,), attrs)
+
+
+def configured_filth(filth_cls, salt, regex=None, hasher=None, registry=None, cache_size=0):
+    """Subclass of filth_cls with its own salt, and regex if given: filth_cls itself is left as it is
+
+    Scrubbers of different salts or keywords live side by side in a process, and a task pickled to a worker
+    carries the salt and regex of its scrubber: workers of a long-lived pool do not keep a previous job's ones.
+    Same configuration, same class: a worker builds it once.
+    A hasher other than the legacy one renders the tokens the way LowLevelFilth does, so the strategies of a
+    hybrid give a segment the same token. Tokens are registered in registry, see check_collisions.
+    The last cache_size tokens are remembered per process: repeated segments are rendered once.
+    """
+    filth_cls = getattr(filth_cls, "base_filth", filth_cls)
+    if regex is None:
+        configured = _configured(filth_cls, salt, None, 0, hasher, cache_size)
+    else:
+        configured = _configured(filth_cls, salt, regex.pattern, regex.flags, hasher, cache_size)
+    if registry is not None:
+        configured.registry = registry
+    return configured
+
+
+def _reduce_configured(cls):
+    regex = cls.__dict__.get("regex")
+    return configured_filth, (cls.base_filth, cls.salt, regex, cls.hasher, cls.registry, cls.tokens.maxsize)
+
+
+copyreg.pickle(_ConfiguredFilth, _reduce_configured)
+
+
+def configure_detector(detector, salt, regex=None, hasher=None, registry=None, cache_size=0):
+    """Give a detector instance its own filth class, see configured_filth"""
+    detector.filth_cls = configured_filth(detector.filth_cls, salt, regex, hasher, registry, cache_size)
+    return detector
+
+
+def check_collisions(filth_classes):
+    """Register the tokens that configured filth_classes made since the last check: one call per class"""
+    for filth_cls in filth_classes:
+        if getattr(filth_cls, "registry", None) is None or not filth_cls.new_tokens:
+            continue
+        new_tokens, filth_cls.new_tokens = filth_cls.new_tokens, []
+        for token in filth_cls.registry.add_many(new_tokens):
+            utils.logger.warning(f"Token collision: {token} is used for 2 different segments")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+import hashlib
+import threading
+
+from . import utils
+
+HASH_LEGACY = "legacy"  # utils.hash_string: tokens of previous runs stay the same
+HASH_BLAKE2B = "blake2b"  # blake2b keyed with the salt
+TOKEN_WIDTH = 5  # Hex chars of a token's hash
+MAX_TOKEN_WIDTH = hashlib.blake2b.MAX_DIGEST_SIZE * 2
+
+
+def token_key(placeholder, salt):
+    """Hashed in front of each segment of placeholder: tokens of other placeholders and salts differ"""
+    return utils.hash_string(f"{placeholder}{salt}")
+
+
+def format_token(placeholder, text_hash):
+    return "{{" + "%s-%s" % (placeholder, text_hash) + "}}"
+
+
+class Hasher:
+    """Hash of token texts, truncated to width hex chars
+
+    Keyed blake2b is computed from a copy of a hasher already keyed with the salt, so the key is
+    processed once, not once per segment. Legacy keeps utils.hash_string and its width.
+    Hashers of the same configuration are equal: they hash alike.
+    """
+
+    def __init__(self, algorithm=HASH_LEGACY, salt="", width=TOKEN_WIDTH):
+        if not 0 < width <= MAX_TOKEN_WIDTH:
+            raise ValueError(f"Token width must be 1-{MAX_TOKEN_WIDTH}, got {width}")
+        self.algorithm = algorithm
+        self.salt = salt
+        self.width = width
+        self._keyed = None
+        if algorithm == HASH_BLAKE2B:
+            key = salt.encode("utf-8")
+            if len(key) > hashlib.blake2b.MAX_KEY_SIZE:
+                key = hashlib.blake2b(key).digest()
+            self._keyed = hashlib.blake2b(key=key, digest_size=(width + 1) // 2)
+        elif algorithm != HASH_LEGACY:
+            raise ValueError(f"Unknown hash algorithm: {algorithm}")
+
+    def __getstate__(self):
+        # hashlib objects do not pickle: rebuild the keyed hasher in the worker
+        return {"algorithm": self.algorithm, "salt": self.salt, "width": self.width}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __eq__(self, other):
+        return isinstance(other, Hasher) and self.__getstate__() == other.__getstate__()
+
+    def __hash__(self):
+        return hash((self.algorithm, self.salt, self.width))
+
+    @property
+    def legacy(self):
+        return self._keyed is None
+
+    def hash(self, text):
+        if self._keyed is None:
+            return utils.hash_string(text)
+        hasher = self._keyed.copy()
+        hasher.update(text.encode("utf-8", errors="surrogateescape"))
+        return hasher.hexdigest()[: self.width]
+
+    def hash_many(self, texts):
+        """Hashes of texts, in order"""
+        if self._keyed is None:
+            return [utils.hash_string(text) for text in texts]
+        keyed_copy = self._keyed.copy
+        hashes = []
+        for text in texts:
+            hasher = keyed_copy()
+            hasher.update(text.encode("utf-8", errors="surrogateescape"))
+            hashes.append(hasher.hexdigest()[: self.width])
+        return hashes
+
+
+class CollisionRegistry:
+    """Detects two segments that got the same token
+
+    Remembers the segment of up to max_entries tokens: beyond that, new tokens are no longer
+    tracked - memory stays bounded - but tracked tokens keep being checked.
+    lib.shared serves one to all the workers of a run.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.collisions = 0
+        self.untracked = 0
+        self._segments = {}
+        self._lock = threading.Lock()
+
+    def add(self, token, segment):
+        """Register segment's token, return False on a collision"""
+        return not self.add_many([(token, segment)])
+
+    def add_many(self, pairs):
+        """Register (token, segment) pairs, return the tokens of the collisions: one call for many tokens"""
+        collisions = []
+        with self._lock:
+            for token, segment in pairs:
+                known = self._segments.get(token)
+                if known is None:
+                    if len(self._segments) < self.max_entries:
+                        self._segments[token] = segment
+                    else:
+                        self.untracked += 1
+                elif known != segment:
+                    self.collisions += 1
+                    collisions.append(token)
+        return collisions
+
+    def stats(self):
+        return f"{self.collisions} collisions, {len(self._segments)} tokens tracked, {self.untracked} untracked"
+
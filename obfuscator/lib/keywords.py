@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import re
+
+from . import patterns
+from .trie import trie_regex
+
+
+def load_keywords(path):
+    """Keywords of a file: one per line, blank lines and # comments are skipped"""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+def _groups(pattern):
+    """(start, end) of the content of every parenthesised group of pattern, innermost first"""
+    opened = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 1
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+            # A "]" right after "[" or "[^" is a member, not the end
+            if pattern[i + 1 : i + 2] == "^":
+                i += 1
+            if pattern[i + 1 : i + 2] == "]":
+                i += 1
+        elif char == "(":
+            opened.append(i + 1)
+        elif char == ")" and opened:
+            start = opened.pop()
+            if pattern[start : start + 2] == "?:":
+                start += 2
+            yield start, i
+        i += 1
+
+
+def keyword_group(pattern, keywords, flags=re.IGNORECASE):
+    """(start, end) of the smallest group of pattern that matches each of keywords as a whole, and only them"""
+    # Not a keyword: a value's group, e.g. [^\s]+, matches it too
+    other = "".join(keywords)
+    for start, end in sorted(_groups(pattern), key=lambda group: group[1] - group[0]):
+        try:
+            group = re.compile(pattern[start:end], flags)
+        except re.error:
+            continue  # Lookarounds, named groups: not an alternation of keywords
+        if all(group.fullmatch(keyword) for keyword in keywords) and not group.fullmatch(other):
+            return start, end
+    raise ValueError(f"No group of keywords {keywords} in credentials regex {pattern!r}")
+
+
+class CredentialsMatcher:
+    """Credentials regex, and regex_str, with more keywords: their keyword group is replaced by a trie of all of them
+
+    Only the keywords change: the separator and value parts of the regex are kept as they are.
+    Keywords are compiled into a trie regex - one branch per shared prefix - so the regex engine
+    walks a single path per position however many keywords there are.
+    regex is compiled from regex_str: plain groups, for the external searchers too (grep -E has no (?:...)).
+    """
+
+    def __init__(self, regex, regex_str, builtin_keywords, keywords=()):
+        flags = regex.flags
+        builtin_keywords = list(dict.fromkeys(keyword for keyword in builtin_keywords if keyword))
+        self.keywords = list(dict.fromkeys(builtin_keywords + [keyword for keyword in keywords if keyword]))
+        self.keyword_regex = re.compile(trie_regex(self.keywords), flags)
+        if len(self.keywords) == len(builtin_keywords):
+            # Nothing to add: the regex as it is
+            self.regex_str = regex_str
+            self.regex = regex
+            return
+        start, end = keyword_group(regex_str, builtin_keywords, flags)
+        self.regex_str = regex_str[:start] + trie_regex(self.keywords, posix=True) + regex_str[end:]
+        self.regex = re.compile(self.regex_str, flags)
+
+
+def credentials_matcher(keywords_file=None):
+    """CredentialsMatcher of the built-in keywords, and the keywords of keywords_file"""
+    from .detectors import CredentialFilth  # scrubadub on use, not on import
+
+    keywords = load_keywords(keywords_file) if keywords_file else []
+    return CredentialsMatcher(
+        CredentialFilth.regex, CredentialFilth.regex_str, CredentialFilth.CREDENTIALS_KEYWORDS, keywords
+    )
+
+
+def credentials_regex_str(keywords_file=None):
+    """Credentials regex_str of credentials_matcher, for the external searchers: scrubadub is not imported"""
+    regex_str = patterns.credentials_regex_str()
+    keywords = load_keywords(keywords_file) if keywords_file else []
+    regex = re.compile(regex_str, patterns.PATTERNS_FLAGS)
+    return CredentialsMatcher(regex, regex_str, patterns.credentials_keywords(), keywords).regex_str
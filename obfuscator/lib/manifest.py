@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from tempfile import mkstemp
+
+MANIFEST_NAME = ".obfuscator_manifest.jsonl"  # In the output folder
+COMPACT_MIN_RECORDS = 1024  # Compact once there are this many records, and at least twice as many as files
+
+
+def file_key(path, salt):
+    """A file is skipped while its key is the one of its last obfuscation: inode, size, mtime and salt"""
+    stat = os.stat(path)
+    return [stat.st_ino, stat.st_size, stat.st_mtime_ns, salt]
+
+
+class RunManifest:
+    """Files obfuscated by previous runs, and their outputs: JSON lines in the output folder
+
+    A record per obfuscated file: {"path", "key", "outputs"}, the last record of a path wins.
+    Records are appended under an exclusive lock of a side file: workers of any process record at once.
+    Compaction rewrites one record per existing path. Pickles without its records: workers only append.
+    """
+
+    def __init__(self, folder, salt):
+        self.folder = folder
+        self.salt = salt
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.lock_path = f"{self.path}.lock"
+        self.entries = {}  # path -> last record
+        self.records = 0
+
+    def __getstate__(self):
+        return {"folder": self.folder, "salt": self.salt}
+
+    def __setstate__(self, state):
+        self.__init__(state["folder"], state["salt"])
+
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self):
+        entries = {}
+        records = 0
+        try:
+            with open(self.path, encoding="utf-8", errors="surrogateescape") as reader:
+                for line in reader:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line of a killed run
+                    entries[record["path"]] = record
+                    records += 1
+        except FileNotFoundError:
+            pass
+        return entries, records
+
+    def load(self):
+        with self._locked():
+            self.entries, self.records = self._read()
+        return self
+
+    def is_done(self, path):
+        record = self.entries.get(path)
+        if record is None:
+            return False
+        try:
+            return record["key"] == file_key(path, self.salt)
+        except OSError:
+            return False
+
+    def changed(self, files):
+        """Files that previous runs did not obfuscate as they are now, with this salt: a lookup and a stat each"""
+        own_files = (self.path, self.lock_path)
+        return [f for f in files if f not in own_files and not self.is_done(f)]
+
+    def record(self, path, outputs=None, **fields):
+        """Record path as obfuscated into outputs, default: in place. fields: more of the record, e.g. checkpoints"""
+        try:
+            key = file_key(path, self.salt)
+        except FileNotFoundError:
+            return  # Removed original: nothing to skip next time
+        line = json.dumps({"path": path, "key": key, "outputs": outputs or [path], **fields}) + "\n"
+        with self._locked(), open(self.path, "a", encoding="utf-8", errors="surrogateescape") as writer:
+            writer.write(line)
+
+    def compact(self, min_records=COMPACT_MIN_RECORDS):
+        """Rewrite one record per existing path, once most records are overwritten ones. Return if it did"""
+        if self.records < max(min_records, 2 * len(self.entries)):
+            return False
+        with self._locked():
+            # Records appended since load are kept
+            entries, _ = self._read()
+            entries = {path: record for path, record in entries.items() if os.path.exists(path)}
+            tmp_fd, tmp_path = mkstemp(dir=self.folder, prefix=f"{MANIFEST_NAME}.", suffix=".tmp")
+            with open(tmp_fd, "w", encoding="utf-8", errors="surrogateescape") as writer:
+                writer.writelines(json.dumps(record) + "\n" for record in entries.values())
+            os.replace(tmp_path, self.path)
+        self.entries = entries
+        self.records = len(entries)
+        return True
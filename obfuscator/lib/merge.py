@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+import errno
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+MERGE_WORKERS = 4  # Concurrent part copies per merged file
+COPY_CHUNK_SIZE = 8 * 1024 * 1024  # Userspace fallback copy chunk
+
+# Kernel copy not supported for this pair of files: fall back to the next copy function
+_FALLBACK_ERRNOS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+
+
+def _copy_file_range(src_fd, dst_fd, src_pos, dst_pos, count):
+    return os.copy_file_range(src_fd, dst_fd, count, src_pos, dst_pos)
+
+
+def _sendfile(src_fd, dst_fd, src_pos, dst_pos, count):
+    os.lseek(dst_fd, dst_pos, os.SEEK_SET)
+    return os.sendfile(dst_fd, src_fd, src_pos, count)
+
+
+def _pread_pwrite(src_fd, dst_fd, src_pos, dst_pos, count):
+    return os.pwrite(dst_fd, os.pread(src_fd, min(count, COPY_CHUNK_SIZE), src_pos), dst_pos)
+
+
+# Zero-copy first
+COPY_FUNCS = [
+    func
+    for func, needed in (
+        (_copy_file_range, hasattr(os, "copy_file_range")),
+        (_sendfile, hasattr(os, "sendfile")),
+        (_pread_pwrite, True),
+    )
+    if needed
+]
+
+
+def copy_at(part, output_file, offset):
+    """Copy part into output_file at offset, using its own file descriptor: safe to run concurrently"""
+    funcs = iter(COPY_FUNCS)
+    copy = next(funcs)
+    with open(part, "rb", buffering=0) as src, open(output_file, "r+b", buffering=0) as dst:
+        size = os.fstat(src.fileno()).st_size
+        copied = 0
+        while copied < size:
+            try:
+                count = copy(src.fileno(), dst.fileno(), copied, offset + copied, size - copied)
+            except OSError as e:
+                if copy is _pread_pwrite or e.errno not in _FALLBACK_ERRNOS:
+                    raise
+                copy = next(funcs)
+                continue
+            if not count:
+                raise OSError(errno.EIO, f"Unexpected end of file after {copied}/{size} bytes", part)
+            copied += count
+    return size
+
+
+def _preallocate(fd, offset, size):
+    if not size:
+        return
+    try:
+        os.posix_fallocate(fd, offset, size)
+    except (AttributeError, OSError):
+        # Not supported by the file system: grow the file instead
+        if os.fstat(fd).st_size < offset + size:
+            os.ftruncate(fd, offset + size)
+
+
+class PartsMerger:
+    """Merge ordered parts into one output file
+
+    Every part is copied at its own offset, so copies run concurrently. Parts are added in order:
+    part N starts copying as soon as it is added, since the sizes of parts 0..N-1 give its offset.
+    """
+
+    def __init__(self, output_file, workers=MERGE_WORKERS, remove_parts=False):
+        self.output_file = output_file
+        self.remove_parts = remove_parts
+        self.size = 0
+        self._futures = []
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._fd = os.open(output_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def reserve(self, size):
+        """Preallocate the output up front, when the total size is known"""
+        _preallocate(self._fd, 0, size)
+
+    def add(self, part, size=None):
+        size = os.path.getsize(part) if size is None else size
+        _preallocate(self._fd, self.size, size)
+        self._futures.append(self._executor.submit(self._copy, part, self.size))
+        self.size += size
+
+    def _copy(self, part, offset):
+        copy_at(part, self.output_file, offset)
+        if self.remove_parts:
+            os.remove(part)
+
+    def close(self):
+        """Wait for all copies, raise the first failure"""
+        if self._fd is None:
+            return
+        try:
+            for future in self._futures:
+                future.result()
+            # Drop preallocated bytes beyond the merged size
+            os.ftruncate(self._fd, self.size)
+        finally:
+            self._executor.shutdown()
+            os.close(self._fd)
+            self._fd = None
+
+
+def combine_files(files, output_file, workers=MERGE_WORKERS):
+    """Merge files by order into output_file: preallocated once, parts copied concurrently"""
+    sizes = [os.path.getsize(f) for f in files]
+    with PartsMerger(output_file, workers=workers) as merger:
+        merger.reserve(sum(sizes))
+        for part, size in zip(files, sizes):
+            merger.add(part, size=size)
+    return output_file
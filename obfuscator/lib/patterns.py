@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+import ast
+import os
+import re
+from functools import lru_cache
+
+DETECTORS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "detectors.py")
+PATTERNS_FLAGS = re.IGNORECASE  # Flags the low level strategies search the patterns with
+
+
+@lru_cache(maxsize=None)
+def _class_constants(class_name):
+    """{name: value} of the literal attributes of a detectors class, read from the source: scrubadub is not imported"""
+    try:
+        with open(DETECTORS_FILE, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), DETECTORS_FILE)
+    except (OSError, SyntaxError):
+        return {}
+    constants = {}
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef) or node.name != class_name:
+            continue
+        for statement in node.body:
+            if not isinstance(statement, ast.Assign):
+                continue
+            try:
+                value = ast.literal_eval(statement.value)
+            except ValueError:
+                continue  # Computed: e.g. the compiled regex
+            for target in statement.targets:
+                if isinstance(target, ast.Name):
+                    constants[target.id] = value
+    return constants
+
+
+def detector_constant(class_name, name):
+    """Class attribute of lib.detectors, without importing scrubadub when it is a literal of the class"""
+    constants = _class_constants(class_name)
+    if name in constants:
+        return constants[name]
+    from . import detectors  # Inherited or computed: scrubadub after all
+
+    return getattr(getattr(detectors, class_name), name)
+
+
+def files_dir_regex_str():
+    return detector_constant("FilesDirFilth", "regex_str")
+
+
+def credentials_regex_str():
+    return detector_constant("CredentialFilth", "regex_str")
+
+
+def credentials_keywords():
+    return list(detector_constant("CredentialFilth", "CREDENTIALS_KEYWORDS"))
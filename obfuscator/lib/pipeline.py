@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+import multiprocessing
+import queue
+import time
+
+from . import utils
+
+BALANCE_INTERVAL = 1.0  # Seconds between stage widths decisions
+MIN_GAIN = 2  # Move a worker only if the busiest stage is this much busier than the donor
+RETIRE_POLL = 0.05  # Seconds an idle worker waits for an item before it checks its retire flag again
+
+
+class _Failure:
+    """Item that failed in a stage: passed through the following stages untouched"""
+
+    def __init__(self, stage, error):
+        self.stage = stage
+        self.error = error
+
+
+def _stage_name(func, stage):
+    return getattr(func, "__name__", str(stage))
+
+
+def _stage_worker(stage, func, in_queue, out_queue, started, done, busy, retire, initializer, initargs):
+    if initializer is not None:
+        initializer(*initargs)
+    # Retired: the controller moved this worker to another stage
+    while not retire.is_set():
+        try:
+            message = in_queue.get(timeout=RETIRE_POLL)
+        except queue.Empty:
+            continue
+        if message is None:
+            return
+        seq, item = message
+        with started.get_lock():
+            started[stage] += 1
+        if not isinstance(item, _Failure):
+            start = time.monotonic()
+            try:
+                item = func(item)
+            except Exception as e:
+                utils.logger.exception(f"Pipeline stage {_stage_name(func, stage)} failed")
+                item = _Failure(stage, repr(e))
+            with busy.get_lock():
+                busy[stage] += time.monotonic() - start
+        with done.get_lock():
+            done[stage] += 1
+        out_queue.put((seq, item))
+
+
+class AdaptivePipeline:
+    """Multi-process pipeline with autoscaling stage widths
+
+    pipeline: list of (stage function, initial width hint). Every item goes through all stages, in order.
+    All stages share a budget of worker processes. Every balance interval, each stage's queued work is
+    estimated from its backlog and its measured service time. A worker then moves from the least loaded
+    stage to the most loaded one, and finished stages give away all of their workers.
+
+    A moved worker is retired through its own flag: it leaves after its current item, not behind its stage's
+    backlog, and its replacement starts once it exited. Never more than budget worker processes are alive.
+
+    initializer(*initargs) runs once in every worker process, before its first item: state it sets up
+    (inherited on fork, pickled once per worker on spawn) never has to travel with the items.
+    """
+
+    def __init__(
+        self, pipeline, items, budget, interval=BALANCE_INTERVAL, name="Pipeline", initializer=None, initargs=()
+    ):
+        self.funcs = [func for func, _ in pipeline]
+        self.items = list(items)
+        self.budget = max(budget, len(self.funcs))
+        self.interval = interval
+        self.name = name
+        self.initializer = initializer
+        self.initargs = initargs
+
+        num_stages = len(self.funcs)
+        self._ctx = multiprocessing.get_context()
+        self._queues = [self._ctx.Queue() for _ in range(num_stages + 1)]
+        self._started = self._ctx.Array("q", num_stages)
+        self._done = self._ctx.Array("q", num_stages)
+        self._busy = self._ctx.Array("d", num_stages)
+        self._processes = [[] for _ in range(num_stages)]
+        self._retire_flags = {}  # process -> its retire Event
+        self._retiring = set()
+        self._pending = [0] * num_stages  # Spawns waiting for retired workers to exit
+        self.widths = self.initial_widths([width for _, width in pipeline], self.budget)
+
+    @staticmethod
+    def initial_widths(hints, budget):
+        """Split budget between stages in proportion to the hints, at least one worker each"""
+        total_hints = sum(hints) or 1
+        shares = [budget * hint / total_hints for hint in hints]
+        widths = [max(1, int(share)) for share in shares]
+        while sum(widths) < budget:
+            widths[max(range(len(hints)), key=lambda i: shares[i] - widths[i])] += 1
+        while sum(widths) > budget:
+            widths[max((i for i in range(len(hints)) if widths[i] > 1), key=lambda i: widths[i] - shares[i])] -= 1
+        return widths
+
+    def __str__(self):
+        return ", ".join(f"{_stage_name(func, stage)}={width}" for stage, func, width in self._stages())
+
+    def _stages(self):
+        return ((stage, func, width) for stage, (func, width) in enumerate(zip(self.funcs, self.widths)))
+
+    def __call__(self, ignore_results=False):
+        total = len(self.items)
+        if not total:
+            return []
+        for seq, item in enumerate(self.items):
+            self._queues[0].put((seq, item))
+
+        for stage, width in enumerate(self.widths):
+            for _ in range(width):
+                self._spawn(stage)
+        utils.logger.info(f"{self.name}: {self.budget} workers, stage widths: {self}")
+
+        results = {}
+        last_balance = time.monotonic()
+        try:
+            while len(results) < total:
+                try:
+                    seq, result = self._queues[-1].get(timeout=self.interval)
+                    results[seq] = None if isinstance(result, _Failure) else result
+                except queue.Empty:
+                    pass
+                if any(self._pending):
+                    self._reap()
+                if time.monotonic() - last_balance >= self.interval:
+                    self._reap()
+                    self._balance()
+                    last_balance = time.monotonic()
+        finally:
+            self._stop()
+        utils.logger.info(f"{self.name}: done, stage service times: {self._service_times()}")
+        if ignore_results:
+            return None
+        return [results[seq] for seq in range(total)]
+
+    def _live(self):
+        """Worker processes not reaped yet: retired ones count until they exited"""
+        return sum(len(processes) for processes in self._processes)
+
+    def _spawn(self, stage):
+        retire = self._ctx.Event()
+        process = self._ctx.Process(
+            target=_stage_worker,
+            args=(
+                stage,
+                self.funcs[stage],
+                self._queues[stage],
+                self._queues[stage + 1],
+                self._started,
+                self._done,
+                self._busy,
+                retire,
+                self.initializer,
+                self.initargs,
+            ),
+            name=f"{self.name}-{stage}",
+        )
+        # Not a daemon: stages may run pools of their own
+        process.start()
+        self._processes[stage].append(process)
+        self._retire_flags[process] = retire
+
+    def _spawn_pending(self):
+        for stage in range(len(self._pending)):
+            while self._pending[stage] and self._live() < self.budget:
+                self._pending[stage] -= 1
+                self._spawn(stage)
+
+    def _retire(self, stage):
+        if self._pending[stage]:
+            # Not started yet: nothing to retire
+            self._pending[stage] -= 1
+            return
+        process = next(p for p in reversed(self._processes[stage]) if p not in self._retiring)
+        self._retire_flags[process].set()
+        self._retiring.add(process)
+
+    def _reap(self):
+        """Forget retired workers and start the spawns waiting for them, fail on crashed ones"""
+        for processes in self._processes:
+            for process in [p for p in processes if p.exitcode is not None]:
+                if process.exitcode != 0:
+                    # Its items would never arrive
+                    raise RuntimeError(f"{self.name}: worker {process.name} died with exit code {process.exitcode}")
+                process.join()
+                processes.remove(process)
+                self._retiring.discard(process)
+                del self._retire_flags[process]
+        self._spawn_pending()
+
+    def _service_times(self):
+        return {
+            _stage_name(func, stage): round(self._busy[stage] / self._done[stage], 4)
+            for stage, func in enumerate(self.funcs)
+            if self._done[stage]
+        }
+
+    def _balance(self):
+        total = len(self.items)
+        done = list(self._done)
+        started = list(self._started)
+        busy = list(self._busy)
+        service_times = [busy[i] / done[i] for i in range(len(done)) if done[i]]
+        default_service_time = sum(service_times) / len(service_times) if service_times else self.interval
+
+        finished, loads = [], []
+        for stage in range(len(self.funcs)):
+            arrived = total if stage == 0 else done[stage - 1]
+            backlog = arrived - started[stage]
+            service_time = busy[stage] / done[stage] if done[stage] else default_service_time
+            finished.append(done[stage] == total)
+            # Seconds of queued work per worker
+            loads.append(backlog * service_time / max(self.widths[stage], 1))
+
+        moves = []
+        # Finished stages give away all of their workers
+        for stage in (s for s in range(len(self.funcs)) if finished[s]):
+            moves.extend([stage] * self.widths[stage])
+
+        if not moves:
+            donors = [s for s in range(len(self.funcs)) if self.widths[s] > 1]
+            if donors:
+                donor = min(donors, key=lambda s: loads[s])
+                receiver = max(range(len(self.funcs)), key=lambda s: loads[s])
+                if receiver != donor and loads[receiver] > max(MIN_GAIN * loads[donor], self.interval):
+                    moves.append(donor)
+
+        changed = False
+        for donor in moves:
+            candidates = [s for s in range(len(self.funcs)) if not finished[s] and s != donor]
+            if not candidates:
+                break
+            receiver = max(candidates, key=lambda s: loads[s])
+            self._retire(donor)
+            self.widths[donor] -= 1
+            # Started by _reap, once the retired worker exited
+            self._pending[receiver] += 1
+            self.widths[receiver] += 1
+            loads[receiver] = loads[receiver] * (self.widths[receiver] - 1) / self.widths[receiver]
+            changed = True
+
+        if changed:
+            utils.logger.info(f"{self.name}: stage widths: {self}")
+
+    def _stop(self):
+        for stage, processes in enumerate(self._processes):
+            for _ in range(len([p for p in processes if p not in self._retiring])):
+                self._queues[stage].put(None)
+        for processes in self._processes:
+            for process in processes:
+                process.join(timeout=self.interval)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
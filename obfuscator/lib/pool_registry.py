@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from multiprocessing.util import Finalize
+
+
+class RegisteredPool:
+    """A registry's pool, whatever its class: same map(func, items, chunksize=None) for all of them
+
+    Not every pool class's map takes a chunksize. Given one, items go out in chunks of that size, each chunk
+    a map of its own and up to workers of them at once: idle workers take the next chunk, none is assigned
+    a share of the items up front. Anything else is the pool's own.
+    """
+
+    def __init__(self, pool, workers):
+        self.pool = pool
+        self.workers = getattr(pool, "workers", None) or workers
+
+    def __getattr__(self, name):
+        if name == "pool":
+            raise AttributeError(name)
+        return getattr(self.pool, name)
+
+    def map(self, func, items, chunksize=None):
+        if chunksize is None:
+            return self.pool.map(func, items)
+        items = list(items)
+        chunks = [items[idx : idx + chunksize] for idx in range(0, len(items), chunksize)]
+        if self.workers <= 1 or len(chunks) <= 1:
+            return list(self.pool.map(func, items))
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks)), thread_name_prefix="map") as executor:
+            results = executor.map(lambda chunk: list(self.pool.map(func, chunk)), chunks)
+            return [result for chunk in results for result in chunk]
+
+
+class PoolRegistry:
+    """Process-wide warm pools that strategies borrow instead of opening a pool per call
+
+    One pool per pool class and purpose, sized by its first borrower and kept open until shutdown().
+    A forked child never reuses its parent's pools: it warms up its own, shut down when it exits.
+    A resident registry (a daemon's) keeps its pools across runs: only a forced shutdown closes them.
+    A pool borrowed with an initializer is started right after initializer(*initargs) ran in this process:
+    its forked workers inherit the state it set up, thread workers share it. Other initargs, new pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}  # (purpose, pool class): (context manager, entered pool, (initializer, initargs))
+        self._pid = None
+        self.resident = False
+
+    def get(self, pool_class, workers, purpose=None, initializer=None, initargs=()):
+        stale = None
+        with self._lock:
+            if self._pid != os.getpid():
+                # Inherited on fork: these pools belong to the parent
+                self._pools = {}
+                self._pid = os.getpid()
+                Finalize(self, self.shutdown, kwargs={"force": True}, exitpriority=10)
+            key = purpose, pool_class
+            init = (initializer, initargs) if initializer is not None else None
+            if key in self._pools and self._pools[key][2] != init:
+                # Its workers hold another initializer's state
+                stale = self._pools.pop(key)
+            if key not in self._pools:
+                if init is not None:
+                    initializer(*initargs)
+                manager = pool_class(workers=workers)
+                self._pools[key] = manager, RegisteredPool(manager.__enter__(), workers), init
+            pool = self._pools[key][1]
+        if stale is not None:
+            stale[0].__exit__(None, None, None)
+        return pool
+
+    @contextmanager
+    def borrow(self, pool_class, workers, purpose=None, initializer=None, initargs=()):
+        """Context of a warm pool: leaving it keeps the pool open"""
+        yield self.get(pool_class, workers, purpose=purpose, initializer=initializer, initargs=initargs)
+
+    def close(self, pool_class, purpose=None):
+        """Close the pool of one purpose: the others stay warm"""
+        with self._lock:
+            entry = self._pools.pop((purpose, pool_class), None) if self._pid == os.getpid() else None
+        if entry is not None:
+            entry[0].__exit__(None, None, None)
+
+    def shutdown(self, force=False):
+        if self.resident and not force:
+            return
+        with self._lock:
+            pools, self._pools = self._pools, {}
+            if self._pid != os.getpid():
+                return
+        for manager, *_ in pools.values():
+            manager.__exit__(None, None, None)
+
+
+registry = PoolRegistry()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+import re
+
+from .pruning import required_chars
+from .trie import trie_regex
+
+# Cheap signs of filth: each built-in detector's matches contain at least one of these
+CUES = [
+    r"\d\.\d",  # IPv4
+    r"[0-9a-f]:|:[0-9a-f:]",  # MAC, IPv6
+    "/",  # Paths
+]
+
+
+class LinePrefilter:
+    """Answers "could this line contain filth?" with a single search for cheap cues
+
+    Lines without any cue cannot contain filth: they are written through, the detectors never see them.
+    Keywords are one trie branch: hundreds of them cost about as much as a few.
+    """
+
+    def __init__(self, keywords=(), cues=CUES):
+        keywords = [keyword for keyword in keywords if keyword]
+        pattern = "|".join(list(cues) + ([trie_regex(keywords)] if keywords else []))
+        self.regex = re.compile(pattern, re.IGNORECASE)
+        self.bytes_regex = re.compile(pattern.encode("utf-8"), re.IGNORECASE)
+
+    def candidate_ranges(self, text):
+        """[start, end) ranges of consecutive lines of text that have a cue"""
+        if isinstance(text, bytes):
+            if not text.isascii():
+                # Bytes cues miss non-ASCII letters and digits that str detectors match
+                return [(0, len(text))] if text else []
+            regex, newline = self.bytes_regex, b"\n"
+        else:
+            regex, newline = self.regex, "\n"
+
+        ranges = []
+        match = regex.search(text)
+        while match is not None:
+            start = text.rfind(newline, 0, match.start()) + 1
+            end = text.find(newline, match.start())
+            end = len(text) if end == -1 else end + 1
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+            match = regex.search(text, end)
+        return ranges
+
+
+class PrefilteredScrubber:
+    """Scrubber that only cleans the lines that pass the prefilter, and counts them"""
+
+    def __init__(self, scrubber, prefilter):
+        self.scrubber = scrubber
+        self.prefilter = prefilter
+        self.hits = 0
+        self.skips = 0
+
+    @staticmethod
+    def _count_lines(text, start=0, end=None):
+        end = len(text) if end is None else end
+        if start >= end:
+            return 0
+        newline = b"\n" if isinstance(text, bytes) else "\n"
+        return text.count(newline, start, end) + (text[end - 1 : end] != newline)
+
+    def clean(self, text, **kwargs):
+        ranges = self.prefilter.candidate_ranges(text)
+        hits = sum(self._count_lines(text, start, end) for start, end in ranges)
+        self.hits += hits
+        self.skips += self._count_lines(text) - hits
+        if not ranges:
+            return text
+        if ranges == [(0, len(text))]:
+            return self.scrubber.clean(text=text, **kwargs)
+
+        chunks = []
+        pos = 0
+        for start, end in ranges:
+            chunks.append(text[pos:start])
+            chunks.append(self.scrubber.clean(text=text[start:end], **kwargs))
+            pos = end
+        chunks.append(text[pos:])
+        return text[:0].join(chunks)
+
+    def stats(self):
+        total = self.hits + self.skips
+        ratio = self.skips / total if total else 0
+        return f"{self.hits} lines scrubbed, {self.skips} skipped ({ratio:.0%})"
+
+
+def regex_cue(regex):
+    """Cue of a regex: a class of the fewest characters one of which every match has, None if there are none"""
+    requirements = required_chars(regex)
+    if not requirements:
+        return None
+    # Same cue in every process: sets of a size are ordered by their characters
+    chars = min(requirements, key=lambda required: (len(required), sorted(required)))
+    return "[" + "".join(re.escape(char) for char in sorted(chars)) + "]"
+
+
+def detectors_prefilter(detectors, builtin_filths, keywords=()):
+    """LinePrefilter of a scrubber's detectors, None if a detector has no cue: no line could be skipped
+
+    CUES and keywords cover the detectors of builtin_filths, configured ones too.
+    Any other detector gets the cue of its filth regex.
+    """
+    cues = list(CUES)
+    for detector in detectors:
+        filth_cls = detector.filth_cls
+        if getattr(filth_cls, "base_filth", filth_cls) in builtin_filths:
+            continue
+        regex = getattr(filth_cls, "regex", None)
+        cue = regex_cue(regex) if regex is not None else None
+        if cue is None:
+            return None
+        cues.append(cue)
+    return LinePrefilter(keywords=keywords, cues=list(dict.fromkeys(cues)))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+import re
+from collections import defaultdict
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+SAMPLE_SIZE = 1024 * 1024  # Bytes of a file to sample hit rates from
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT} | (
+    {sre_parse.POSSESSIVE_REPEAT} if hasattr(sre_parse, "POSSESSIVE_REPEAT") else set()
+)
+
+
+def _literal(code):
+    char = chr(code)
+    # Letters may match in another case: no cue
+    return None if char.isalpha() else char
+
+
+def _requirements(node):
+    required = set()
+    for op, av in node:
+        if op is sre_parse.LITERAL:
+            char = _literal(av)
+            if char is not None:
+                required.add(frozenset(char))
+        elif op is sre_parse.IN:
+            chars = [_literal(code) if kind is sre_parse.LITERAL else None for kind, code in av]
+            if chars and None not in chars:
+                required.add(frozenset(chars))
+        elif op is sre_parse.SUBPATTERN:
+            required |= _requirements(av[-1])
+        elif op in _REPEATS:
+            if av[0] >= 1:
+                required |= _requirements(av[2])
+        elif op is sre_parse.BRANCH:
+            # Only what every alternative requires
+            branches = [_requirements(branch) for branch in av[1]]
+            required |= set.intersection(*branches) if branches else set()
+    return required
+
+
+def required_chars(regex):
+    """Characters every match of regex contains: a set of char sets, a match has a char of each
+
+    Letters are left out, matching may ignore case. Empty when nothing is sure.
+    """
+    if isinstance(regex, str):
+        regex = re.compile(regex)
+    pattern = regex.pattern.decode("ascii") if isinstance(regex.pattern, bytes) else regex.pattern
+    try:
+        return frozenset(_requirements(sre_parse.parse(pattern, regex.flags & ~re.LOCALE)))
+    except re.error:
+        return frozenset()
+
+
+def can_match(requirements, text):
+    """False if text misses a character that every match requires"""
+    if isinstance(text, bytes):
+        return all(any(char.encode("utf-8") in text for char in chars) for chars in requirements)
+    return all(any(char in text for char in chars) for chars in requirements)
+
+
+def sample_file(path, requirements, sample_size=SAMPLE_SIZE):
+    """Head of a file, and whether the whole file meets each of requirements
+
+    Reads on only while a requirement is not met yet: usually the sample is enough.
+    """
+    met = [not required for required in requirements]
+    with open(path, "rb") as f:
+        sample = chunk = f.read(sample_size)
+        while chunk and not all(met):
+            met = [ok or can_match(required, chunk) for ok, required in zip(met, requirements)]
+            chunk = f.read(sample_size)
+    return sample, met
+
+
+def order_by_hit_rate(groups, hits, costs=None):
+    """Order the items of each precedence group by hits, most first, then cost: groups keep their order"""
+    costs = costs or {}
+    return [sorted(group, key=lambda item: (-hits.get(item, 0), costs.get(item, 0))) for group in groups]
+
+
+class DetectorStats:
+    """Per-detector hits, skips and time of a run, reported per detector"""
+
+    def __init__(self):
+        self.hits = defaultdict(int)
+        self.skips = defaultdict(int)
+        self.seconds = defaultdict(float)
+
+    def add(self, name, hits=0, skips=0, seconds=0.0):
+        self.hits[name] += hits
+        self.skips[name] += skips
+        self.seconds[name] += seconds
+
+    def update(self, other):
+        for mine, theirs in ((self.hits, other.hits), (self.skips, other.skips), (self.seconds, other.seconds)):
+            for name, value in theirs.items():
+                mine[name] += value
+
+    def report(self):
+        names = sorted(set(self.hits) | set(self.skips) | set(self.seconds), key=str)
+        return ", ".join(
+            f"{name}: {self.hits[name]} hits, {self.skips[name]} skips, {self.seconds[name]:.3f}s" for name in names
+        )
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+import io
+import mmap
+import os
+from dataclasses import dataclass
+
+SPLIT_COPY = "copy"  # Physically copy big files into part files
+SPLIT_MMAP = "mmap"  # Cut big files into virtual byte ranges, read in place
+
+
+@dataclass(frozen=True)
+class FileRange:
+    """Byte range [start, end) of a file, cut at newline boundaries: a virtual file part"""
+
+    path: str
+    start: int
+    end: int
+    index: int
+
+    @property
+    def size(self):
+        return self.end - self.start
+
+
+def split_ranges(path, num_parts):
+    """Cut path into up to num_parts byte ranges that start at a line beginning
+
+    The file is memory-mapped once to find the newlines - no data is copied.
+    """
+    size = os.path.getsize(path)
+    bounds = [0]
+    if size and num_parts > 1:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for idx in range(1, num_parts):
+                # Search from one byte before the estimated cut: it may fall right after a newline
+                newline = mm.find(b"\n", max(size * idx // num_parts - 1, bounds[-1]))
+                if newline == -1 or newline + 1 >= size:
+                    break
+                bounds.append(newline + 1)
+    bounds.append(size)
+    return [FileRange(path, start, end, idx) for idx, (start, end) in enumerate(zip(bounds, bounds[1:]))]
+
+
+class _RangeIO(io.RawIOBase):
+    """Raw reader of a FileRange over a memory map"""
+
+    def __init__(self, file_range: FileRange):
+        super().__init__()
+        self._pos = file_range.start
+        self._end = file_range.end
+        self._file = open(file_range.path, "rb")
+        # mmap refuses empty files
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if file_range.size else None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._end - self._pos)
+        if size <= 0:
+            return 0
+        buffer[:size] = self._mm[self._pos : self._pos + size]
+        self._pos += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            if self._mm is not None:
+                self._mm.close()
+            self._file.close()
+        super().close()
+
+
+def open_range(file_range: FileRange, buffering=io.DEFAULT_BUFFER_SIZE, encoding="utf-8", errors=None, binary=False):
+    """Open a FileRange for reading as text, like open(path, "r") of a physical part would
+
+    binary: read raw bytes instead, like open(path, "rb")
+    """
+    reader = io.BufferedReader(_RangeIO(file_range), buffer_size=buffering)
+    if binary:
+        return reader
+    return io.TextIOWrapper(reader, encoding=encoding, errors=errors)
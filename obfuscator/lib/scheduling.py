@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+DISPATCH_ORDER = "order"  # Files are handed out in discovery order
+DISPATCH_LARGEST_FIRST = "largest-first"  # Costliest files first: no long tail of one big file
+MAX_SEGMENTS_PER_PASS = 50  # The sed replacer rewrites a file once per chunk of up to 50 segments
+
+
+def segments_per_pass(threshold):
+    """Segments the sed replacer rewrites a file for at once: fewer under a low --threshold"""
+    return max(1, min(MAX_SEGMENTS_PER_PASS, int(threshold / 5)))
+
+
+def file_cost(path, segments=None, per_pass=None):
+    """Estimated cost of obfuscating path, in bytes to process
+
+    Size-based. When the number of segments is known and the replacer rewrites the file once per per_pass
+    of them, each chunk of segments is another pass over the file. per_pass None: a single pass, e.g. builtin.
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+    if not segments or per_pass is None:
+        return size
+    return size * (1 + (segments - 1) // per_pass)
+
+
+def largest_first(items, cost=file_cost):
+    return sorted(items, key=cost, reverse=True)
+
+
+def run_pipelined(func, items, window):
+    """Call func on every item, with up to window items in flight at once
+
+    Each item gets a driver thread that runs its whole flow (split, scrub, merge) on a shared workers pool,
+    so one item's split or merge overlaps other items' scrubbing. Raises the first failure, in items order,
+    and cancels the items that did not start yet.
+    """
+    executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix="in-flight")
+    try:
+        futures = [executor.submit(func, item) for item in items]
+        for future in futures:
+            future.result()
+    finally:
+        executor.shutdown(cancel_futures=True)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+import os
+import re
+import shutil
+from collections import defaultdict
+from tempfile import mkstemp
+
+from .pruning import can_match, required_chars
+from .trie import trie_regex
+
+BUILTIN = "builtin"  # --searcher/--replacer value: use the in-process engines below
+SCAN_BLOCK_SIZE = 4 * 1024 * 1024  # 4 MB of whole lines per regex scan
+
+
+def iter_line_blocks(reader, block_size=SCAN_BLOCK_SIZE):
+    """Yield chunks of whole lines, about block_size long each"""
+    while True:
+        lines = reader.readlines(block_size)
+        if not lines:
+            return
+        # str or bytes, by the reader's mode
+        yield lines[0][:0].join(lines)
+
+
+class SegmentScanner:
+    """Find the segments of all low-level filths in a single pass over a file
+
+    All filth regexes are compiled into one alternation of named groups, in filths order,
+    so a path that contains an ip is reported as a path - the same precedence obfuscate_one applies.
+    Matching is case-insensitive and line based, like `rg -io`.
+    A classifier (e.g. AddressClassifier) may stand for several filths: its regex finds candidates,
+    and its classify method tells which filth a candidate is.
+    """
+
+    def __init__(self, filths):
+        entries = list(filths)
+        self.filths = [filth for entry in entries for filth in getattr(entry, "filths", [entry])]
+        self._group_to_entry = {f"f{idx}": entry for idx, entry in enumerate(entries)}
+        # Blocks that miss a character every match of an entry has are scanned without it
+        self._requirements = {group: required_chars(entry.regex) for group, entry in self._group_to_entry.items()}
+        self._regexes = {}
+        self.regex = self._regex(tuple(self._group_to_entry))
+
+    def _regex(self, groups):
+        regex = self._regexes.get(groups)
+        if regex is None:
+            regex = self._regexes[groups] = re.compile(
+                "|".join(f"(?P<{group}>{self._group_to_entry[group].regex})" for group in groups),
+                re.IGNORECASE | re.MULTILINE,
+            )
+        return regex
+
+    def _block_regex(self, block, stats=None):
+        """Alternation of the entries that can match in block, None if none can"""
+        groups = tuple(group for group, required in self._requirements.items() if can_match(required, block))
+        if stats is not None:
+            for group in self._group_to_entry.keys() - set(groups):
+                entry = self._group_to_entry[group]
+                for filth in getattr(entry, "filths", [entry]):
+                    stats.add(str(filth), skips=1)
+        return self._regex(groups) if groups else None
+
+    @staticmethod
+    def _iter_line_matches(regex, block, start, end):
+        for line in block[start:end].split("\n"):
+            for match in regex.finditer(line):
+                yield match
+
+    def _iter_matches(self, regex, block):
+        pos = 0
+        while True:
+            match = regex.search(block, pos)
+            if match is None:
+                return
+            if "\n" not in match.group().strip():
+                yield match
+                pos = match.end() if match.end() > match.start() else match.end() + 1
+                continue
+            # Match crosses a line boundary (e.g. a trailing \s): rescan the lines it spans one by one
+            line_start = block.rfind("\n", 0, match.start()) + 1
+            line_end = block.find("\n", match.end())
+            line_end = len(block) if line_end == -1 else line_end
+            yield from self._iter_line_matches(regex, block, line_start, line_end)
+            pos = line_end
+
+    def iter_block_segments(self, block, stats=None):
+        """Yield (filth, segment) for every match in a block of whole lines
+
+        :param stats: DetectorStats, counts the blocks each filth skipped
+        """
+        regex = self._block_regex(block, stats)
+        if regex is None:
+            return
+        for match in self._iter_matches(regex, block):
+            segment = match.group()
+            if not segment:
+                continue
+            entry = self._group_to_entry[match.lastgroup]
+            classify = getattr(entry, "classify", None)
+            if classify is None:
+                yield entry, segment
+                continue
+            address = classify(segment)
+            if address is not None:
+                yield address
+
+    def iter_segments(self, src_file, stats=None):
+        """Yield (filth, segment) for every match in src_file, duplicates included"""
+        with open(src_file, "r", encoding="utf-8", errors="surrogateescape", newline="") as reader:
+            for block in iter_line_blocks(reader):
+                yield from self.iter_block_segments(block, stats=stats)
+
+    def scan(self, src_file, limit=None, stats=None):
+        """Collect unique segments per filth
+
+        :param src_file: file to scan
+        :param limit: stop once this number of unique segments is found
+        :param stats: DetectorStats, counts the unique segments and skipped blocks of each filth
+        :return: tuple of (filth -> set of segments, total unique segments)
+        """
+        filth_to_segment = defaultdict(set)
+        total_segments = 0
+        for filth, segment in self.iter_segments(src_file, stats=stats):
+            segments = filth_to_segment[filth]
+            if segment in segments:
+                continue
+            segments.add(segment)
+            total_segments += 1
+            if limit is not None and total_segments >= limit:
+                break
+        if stats is not None:
+            for filth, segments in filth_to_segment.items():
+                stats.add(str(filth), hits=len(segments))
+        # Keep filths order: it is the replacement precedence
+        return {f: filth_to_segment[f] for f in self.filths if f in filth_to_segment}, total_segments
+
+
+class SegmentReplacer:
+    """Replace the segments of a file with their filth tokens in a single streaming pass
+
+    All segments are compiled into one trie regex, so the longest segment wins at each position.
+    A segment found by more than one filth gets the token of the first one, like the sed chain does.
+    """
+
+    def __init__(self, filth_to_segment):
+        self.tokens = {}
+        for filth, segments in filth_to_segment.items():
+            new_segments = [segment for segment in dict.fromkeys(segments) if segment and segment not in self.tokens]
+            # Filths with a batch API hash all their segments at once
+            replace_many = getattr(filth, "replace_many", None)
+            if replace_many is not None:
+                self.tokens.update(zip(new_segments, replace_many(new_segments)))
+            else:
+                self.tokens.update((segment, filth.replace_with(segment)) for segment in new_segments)
+        self.regex = re.compile(trie_regex(self.tokens)) if self.tokens else None
+
+    def _token(self, match):
+        return self.tokens[match.group()]
+
+    def replace(self, text):
+        if self.regex is None:
+            return text
+        return self.regex.sub(self._token, text)
+
+    def replace_file(self, src_file):
+        """Rewrite src_file in place: stream into a temp file next to it, then rename over it"""
+        if self.regex is None:
+            return src_file
+        dirname, basename = os.path.split(src_file)
+        tmp_fd, tmp_path = mkstemp(dir=dirname or None, prefix=f"{basename}.", suffix=".tmp")
+        try:
+            with open(tmp_fd, "w", encoding="utf-8", errors="surrogateescape", newline="") as writer, open(
+                src_file, "r", encoding="utf-8", errors="surrogateescape", newline=""
+            ) as reader:
+                for block in iter_line_blocks(reader):
+                    writer.write(self.replace(block))
+            shutil.copymode(src_file, tmp_path)
+            os.replace(tmp_path, src_file)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return src_file
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+from multiprocessing import pool
+from multiprocessing.managers import BaseManager, PoolProxy
+
+from .hashing import CollisionRegistry
+
+
+class _SharedManager(BaseManager):
+    """Serves objects to all the workers of a run: their proxies pickle to the workers"""
+
+
+_SharedManager.register("CollisionRegistry", CollisionRegistry, exposed=("add", "add_many", "stats"))
+_SharedManager.register("Pool", pool.Pool, PoolProxy)
+_manager = None
+_registries = {}  # (max_entries, serially) -> the run's CollisionRegistry
+
+
+def _shared_manager():
+    global _manager
+    if _manager is None:
+        _manager = _SharedManager()
+        _manager.start()
+    return _manager
+
+
+def shared_collision_registry(max_entries):
+    """CollisionRegistry of all the workers: segments of different workers with the same token are detected too
+
+    A call per method: workers register the tokens of a file at once, with add_many.
+    """
+    return _shared_manager().CollisionRegistry(max_entries)
+
+
+def collision_registry(max_entries, serially):
+    """CollisionRegistry of the run, None if max_entries is 0: the strategies of a hybrid share it
+
+    Local when serially, shared by the workers otherwise.
+    """
+    if not max_entries:
+        return None
+    key = (max_entries, serially)
+    if key not in _registries:
+        _registries[key] = CollisionRegistry(max_entries) if serially else shared_collision_registry(max_entries)
+    return _registries[key]
+
+
+def shared_pool(workers):
+    """Pool of workers processes served by the run's manager: its proxy pickles to any process of the run
+
+    Leaving its context terminates it.
+    """
+    return _shared_manager().Pool(workers)
+
+
+class BorrowedPool:
+    """Pool class over a shared_pool proxy: processes that are not its owner map onto the same workers
+
+    Its owner closes it: leaving a borrower's context leaves it open. A borrower's proxy has no manager to
+    build iterator proxies with: imap and imap_unordered return the results of map, in order.
+    """
+
+    def __init__(self, proxy, workers=None):
+        self.proxy = proxy
+        self.workers = workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return None
+
+    def map(self, func, items, chunksize=None):
+        return self.proxy.map(func, items, chunksize)
+
+    def imap(self, func, items, chunksize=1):
+        return iter(self.proxy.map(func, items, chunksize))
+
+    imap_unordered = imap
+
+    def apply(self, func, args=(), kwds=None):
+        return self.proxy.apply(func, args, kwds or {})
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+import logging
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import utils
+
+STDIN = "-"  # --input value: read stdin, write stdout
+STREAM_BATCH_LINES = 1024  # Lines per scrubbed batch, at most
+FLUSH_INTERVAL = 0.5  # Seconds a line may wait for its batch to fill
+REPORT_INTERVAL = 60  # Seconds between lines/s reports
+_EOF = None
+
+
+def logs_to_stderr(logger):
+    """stdout is the data stream: the logger's stdout handlers write to stderr instead"""
+    for handler in logger.handlers:
+        if isinstance(handler, logging.StreamHandler) and handler.stream is sys.stdout:
+            handler.setStream(sys.stderr)
+
+
+class LineStream:
+    """Scrub a stream of lines into a writer: in batches, in order, with bounded memory and latency
+
+    A reader thread queues lines. A batch closes at batch_lines lines, or flush_interval seconds
+    after its first line: a quiet `tail -F` does not hold lines back. Up to in_flight batches are
+    scrubbed at once by scrub_batch (e.g. on a workers pool), then written and flushed in input order.
+    Only queued lines and in-flight batches are held in memory.
+    """
+
+    def __init__(self, scrub_batch, batch_lines=STREAM_BATCH_LINES, flush_interval=FLUSH_INTERVAL, in_flight=2):
+        self.scrub_batch = scrub_batch
+        self.batch_lines = batch_lines
+        self.flush_interval = flush_interval
+        self.in_flight = in_flight
+        self.lines = 0
+        self._start = None
+
+    @staticmethod
+    def _read(reader, lines):
+        try:
+            # readline, not iteration: no read-ahead, a line is queued as soon as it arrives.
+            # read(0) is the empty bytes or str that ends the stream, by the reader's mode
+            for line in iter(reader.readline, reader.read(0)):
+                lines.put(line)
+        finally:
+            lines.put(_EOF)
+
+    def _batches(self, lines):
+        while True:
+            line = lines.get()
+            if line is _EOF:
+                return
+            batch = [line]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_lines:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    line = lines.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if line is _EOF:
+                    yield batch
+                    return
+                batch.append(line)
+            yield batch
+
+    def _submit(self, lines, results, executor):
+        try:
+            for batch in self._batches(lines):
+                results.put((len(batch), executor.submit(self.scrub_batch, batch)))
+        finally:
+            results.put(_EOF)
+
+    def rate(self):
+        elapsed = time.monotonic() - self._start if self._start is not None else 0
+        return f"{self.lines} lines, {self.lines / elapsed if elapsed else 0:.0f} lines/s"
+
+    def run(self, reader, writer):
+        """Scrub reader's lines into writer until reader ends, return the number of lines"""
+        self._start = last_report = time.monotonic()
+        lines = queue.Queue(maxsize=self.batch_lines * self.in_flight)
+        results = queue.Queue(maxsize=self.in_flight)
+        executor = ThreadPoolExecutor(max_workers=self.in_flight, thread_name_prefix="stream")
+        # Daemons: a failed write must not wait for stdin
+        threading.Thread(target=self._read, args=(reader, lines), name="stream-reader", daemon=True).start()
+        threading.Thread(
+            target=self._submit, args=(lines, results, executor), name="stream-batcher", daemon=True
+        ).start()
+        try:
+            while True:
+                item = results.get()
+                if item is _EOF:
+                    break
+                num_lines, future = item
+                writer.write(future.result())
+                writer.flush()
+                self.lines += num_lines
+                if time.monotonic() - last_report >= REPORT_INTERVAL:
+                    last_report = time.monotonic()
+                    utils.logger.info(f"Stream: {self.rate()}")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return self.lines
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+import hashlib
+import os
+from dataclasses import dataclass
+
+FINGERPRINT_SIZE = 1024  # Head bytes that tell a file from the one that replaced it at its path
+TAIL_READ_SIZE = 4 * 1024 * 1024  # Bytes read at once from a file's tail
+PARTIAL_MAX = 1024 * 1024  # A longer line without newline is obfuscated as is, not held back
+
+
+@dataclass(frozen=True)
+class TailPlan:
+    """Obfuscate path from offset into output: appended to it if resume, else output is rewritten
+
+    partial is the line the previous run left without newline: it starts the bytes at offset.
+    final: path was rotated out, it is not written anymore - its last line is obfuscated even without newline.
+    output_size: output is first truncated to it, the size it had at the checkpoint. A run that failed after
+    writing and before recording its checkpoint wrote more: the next one obfuscates these bytes again.
+    """
+
+    path: str
+    output: str
+    offset: int = 0
+    partial: bytes = b""
+    resume: bool = False
+    final: bool = False
+    output_size: int = None
+
+
+def fingerprint(path, size=FINGERPRINT_SIZE):
+    """Digest of the first size bytes of path"""
+    with open(path, "rb") as reader:
+        return hashlib.blake2b(reader.read(size), digest_size=16).hexdigest()
+
+
+def checkpoint(path, offset, partial, output_size=None):
+    """Checkpoint fields of a manifest record: where the next run resumes path, and its output"""
+    size = min(FINGERPRINT_SIZE, offset)
+    return {
+        "offset": offset,
+        "partial": partial.decode("latin-1"),  # Any bytes, JSON safe
+        "fingerprint": fingerprint(path, size),
+        "fingerprint_size": size,
+        "output_size": output_size,
+    }
+
+
+def _resumable(path, stat, record, salt):
+    """path is still the file of record, with the bytes before its checkpoint unchanged, and so is its output
+
+    Its output was obfuscated with salt: tokens of another salt are not appended to.
+    """
+    if stat.st_size < record["offset"] or record["key"][3] != salt:
+        return False
+    try:
+        if os.path.getsize(record["outputs"][0]) < (record.get("output_size") or 0):
+            return False
+    except OSError:
+        return False
+    return fingerprint(path, record["fingerprint_size"]) == record["fingerprint"]
+
+
+def _resume(path, output, record, final=False):
+    partial = record["partial"].encode("latin-1")
+    output_size = record.get("output_size")
+    return TailPlan(path, output, record["offset"], partial, resume=True, final=final, output_size=output_size)
+
+
+def plan_tail(files, records, output_of, salt):
+    """Plans of files, from the checkpoint records of previous runs: {path: manifest record}
+
+    Return the plans, and the (output, new output) moves to make before running them.
+    - Same inode at the same path: resume it, unless it was truncated (copytruncate) or rewritten.
+      Then it starts over, and so does its output. So does it after a run of another salt.
+    - Inode renamed to another path (logrotate's create): the rotated file's tail goes to its output,
+      which moves along to the output of its new path. A new file at the old path starts over.
+    - No checkpoint: from the start. Files with no new bytes are left out.
+    """
+    stats = {path: os.stat(path) for path in files}
+    path_of_inode = {stat.st_ino: path for path, stat in stats.items()}
+    checkpoints = {path: record for path, record in records.items() if "offset" in record}
+    plans = {}
+    moves = []
+
+    # Checkpoints of files still at their path claim their inode: records left at an older path are stale
+    claimed = set()
+    for path, record in checkpoints.items():
+        stat = stats.get(path)
+        if stat is None or stat.st_ino != record["key"][0]:
+            continue
+        claimed.add(stat.st_ino)
+        if _resumable(path, stat, record, salt):
+            if stat.st_size > record["offset"]:
+                plans[path] = _resume(path, record["outputs"][0], record)
+        else:
+            plans[path] = TailPlan(path, output_of(path))
+
+    for path, record in checkpoints.items():
+        inode = record["key"][0]
+        new_path = path_of_inode.get(inode)
+        if inode in claimed or new_path is None or new_path == path or new_path in plans:
+            continue
+        if _resumable(new_path, stats[new_path], record, salt):
+            claimed.add(inode)
+            output = output_of(new_path)
+            moves.append((record["outputs"][0], output))
+            plans[new_path] = _resume(new_path, output, record, final=True)
+
+    for path, stat in stats.items():
+        if path not in plans and stat.st_ino not in claimed:
+            plans[path] = TailPlan(path, output_of(path))
+    return list(plans.values()), moves
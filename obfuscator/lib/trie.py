@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+import re
+
+_END = ""  # Trie node key marking the end of a word
+# Metacharacters of both Python and POSIX extended regexes: escaping only these keeps a word literal in both
+_SPECIAL = re.compile(r"([.^$*+?()\[\]{}|\\])")
+
+
+def escape(text):
+    """text as a literal of both Python and grep -E regexes: re.escape's escapes of "-" or "#" are undefined in EREs"""
+    return _SPECIAL.sub(r"\\\1", text)
+
+
+def build_trie(words):
+    """Build a nested-dict character trie of words"""
+    root = {}
+    for word in words:
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[_END] = {}
+    return root
+
+
+def trie_regex(words, posix=False):
+    """Regex string matching any of words
+
+    Words sharing a prefix share a branch, so the regex engine follows one path per position
+    instead of trying every word. Optional suffixes are greedy: the longest word wins at each position.
+    posix: plain groups instead of (?:...), for grep -E
+    """
+    words = [w for w in words if w]
+    if not words:
+        raise ValueError("No words to build regex from")
+    return _node_regex(build_trie(words), "(" if posix else "(?:")
+
+
+def _node_regex(node, group):
+    # Collapse single-child chains into one literal to keep recursion depth at branch points only
+    prefix = []
+    while len(node) == 1 and _END not in node:
+        (char, node), = node.items()
+        prefix.append(char)
+    prefix = escape("".join(prefix))
+
+    branches = [escape(char) + _node_regex(child, group) for char, child in sorted(node.items()) if char != _END]
+    if not branches:
+        return prefix
+    body = branches[0] if len(branches) == 1 else f"{group}{'|'.join(branches)})"
+    if _END in node:
+        # Word may end here: try the longer words first
+        return f"{prefix}{group}{body})?"
+    return f"{prefix}{body}"
@@ -1,35 +1,63 @@
 #!/usr/bin/env python3
 import argparse
+import importlib
+import os
 import sys
 
 from .lib import utils
+from .lib.blocks import BLOCK_SIZE, IO_BYTES, IO_TEXT, LINE_MODE
+from .lib.cache import LINE_CACHE_SIZE, TOKEN_CACHE_SIZE
+from .lib.density import DENSITY_SAMPLES
+from .lib.engine import ENGINE_NATIVE, ENGINE_SCRUBADUB
 from .lib.enums import StrategyTypesEnum
+from .lib.hashing import HASH_BLAKE2B, HASH_LEGACY, MAX_TOKEN_WIDTH, TOKEN_WIDTH
+from .lib.manifest import MANIFEST_NAME
+from .lib.pruning import SAMPLE_SIZE
+from .lib.ranges import SPLIT_COPY, SPLIT_MMAP
+from .lib.scheduling import DISPATCH_LARGEST_FIRST, DISPATCH_ORDER
+from .lib.stream import FLUSH_INTERVAL, STDIN, STREAM_BATCH_LINES, logs_to_stderr
 from .lib.workers_pool import WorkersPool
-from .strategy.hybrids import ObfuscateHybrid, ObfuscateHybridSplit
-from .strategy.low_level import ObfuscateLowLevel, ObfuscateUsingRipGrep
-from .strategy.split_and_merge import ObfuscateSplitAndMerge
-from .strategy.split_in_place import ObfuscateInplace, ObfuscateSplitInPlace
 
+# Strategies by "module:class" name, under obfuscator.strategy: imported on use, with their dependencies
 OBFUSCATION_METHODS_FACTORY = {
-    StrategyTypesEnum.IN_PLACE: ObfuscateInplace,
-    StrategyTypesEnum.SAM: ObfuscateSplitAndMerge,
-    StrategyTypesEnum.SIP: ObfuscateSplitInPlace,
-    StrategyTypesEnum.LOW_LEVEL: ObfuscateLowLevel,
-    StrategyTypesEnum.HYBRID: ObfuscateHybrid,
-    StrategyTypesEnum.HYBRID_SPLIT: ObfuscateHybridSplit,
-    StrategyTypesEnum.RIPGREP: ObfuscateUsingRipGrep,
+    StrategyTypesEnum.IN_PLACE: "split_in_place:ObfuscateInplace",
+    StrategyTypesEnum.SAM: "split_and_merge:ObfuscateSplitAndMerge",
+    StrategyTypesEnum.SIP: "split_in_place:ObfuscateSplitInPlace",
+    StrategyTypesEnum.LOW_LEVEL: "low_level:ObfuscateLowLevel",
+    StrategyTypesEnum.HYBRID: "hybrids:ObfuscateHybrid",
+    StrategyTypesEnum.HYBRID_SPLIT: "hybrids:ObfuscateHybridSplit",
+    StrategyTypesEnum.RIPGREP: "low_level:ObfuscateUsingRipGrep",
 }
+STREAM_STRATEGY = "stream:ObfuscateStream"
+TAIL_STRATEGY = "tail:ObfuscateTail"
 
 SIZE_TO_SPLIT_IN_BYTES = 5 * 1024 * 1024  # 5 MB
 
 
+def load_strategy(name):
+    """Import and return the strategy class of a "module:class" name"""
+    module_name, class_name = name.split(":")
+    return getattr(importlib.import_module(f".strategy.{module_name}", __package__), class_name)
+
+
+def create_strategy(args):
+    if args.input_folder == STDIN:
+        return load_strategy(STREAM_STRATEGY)(args=args)
+    if args.follow:
+        return load_strategy(TAIL_STRATEGY)(args=args)
+    return load_strategy(OBFUSCATION_METHODS_FACTORY[StrategyTypesEnum(args.strategy)])(args=args)
+
+
 class ObfuscateManager:
     """obfuscator facade"""
 
     def __init__(self, args):
         utils.init_logger(args)
+        if args.input_folder == STDIN:
+            # Before anything logs: not a line may go to the data stream
+            logs_to_stderr(utils.logger)
         utils.logger.debug(f"args: {args.__dict__}")
-        strategy_obj = OBFUSCATION_METHODS_FACTORY[StrategyTypesEnum(args.strategy)](args=args)
+        strategy_obj = create_strategy(args)
         utils.logger.info(strategy_obj)
 
         self._strategy = strategy_obj.run
@@ -42,6 +70,24 @@ class ObfuscateManager:
         return self._strategy()
 
 
+def input_path(value):
+    """--input: an existing path, or stdin"""
+    if value == STDIN:
+        return value
+    return utils.PathType(verify_exist=True, create=False)(value)
+
+
+def non_negative_float(value):
+    """A float, 0 or more"""
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value!r} is not a number")
+    if not number >= 0:
+        raise argparse.ArgumentTypeError(f"{value!r} is not 0 or more")
+    return number
+
+
 def get_args_parser(test=False):
     thread_pool_choices = WorkersPool.choices()
     default_pool = WorkersPool.get_default_pool_class().__name__
@@ -60,9 +106,9 @@ def get_args_parser(test=False):
         "-i",
         "--input",
         dest="input_folder",
-        type=utils.PathType(verify_exist=True, create=False),
-        required=True,
-        help="Input folder of file to obfuscate",
+        type=input_path,
+        required=False,
+        help=f"Input folder of file to obfuscate. '{STDIN}': obfuscate stdin into stdout",
     )
     parser.add_argument(
         "-o",
@@ -99,6 +145,128 @@ def get_args_parser(test=False):
         default=SIZE_TO_SPLIT_IN_BYTES,
         help="Minimum file size to split, in bytes",
     )
+    parser.add_argument(
+        "--engine",
+        dest="engine",
+        choices=[ENGINE_SCRUBADUB, ENGINE_NATIVE],
+        default=ENGINE_SCRUBADUB,
+        required=False,
+        help=f"Detection engine of scrubber strategies. {ENGINE_NATIVE}: compiled regexes, same tokens as scrubadub",
+    )
+    parser.add_argument(
+        "--io-mode",
+        dest="io_mode",
+        choices=[IO_TEXT, IO_BYTES],
+        default=IO_TEXT,
+        required=False,
+        help=f"How scrubber strategies read files. {IO_BYTES}: raw bytes, no decoding, safe for invalid UTF-8",
+    )
+    parser.add_argument(
+        "--no-prefilter",
+        dest="prefilter",
+        default=True,
+        required=False,
+        action="store_false",
+        help="Run the detectors on every line, also lines with no sign of filth (ip, mac, path, credentials)",
+    )
+    parser.add_argument(
+        "--credentials-keywords-file",
+        dest="credentials_keywords_file",
+        type=utils.PathType(verify_exist=True, create=False),
+        required=False,
+        default=None,
+        help="File of more credentials keywords (e.g. vendor secret names): one per line, # for comments",
+    )
+    parser.add_argument(
+        "--line-cache-size",
+        dest="line_cache_size",
+        type=utils.IntRange(imin=0),
+        required=False,
+        default=LINE_CACHE_SIZE,
+        help=f"Scrubbed lines to remember per worker, repeated lines are scrubbed once. 0: no cache. "
+        f"No effect unless --block-size-in-bytes {LINE_MODE} is set (or detectors need line by line scrubbing)",
+    )
+    parser.add_argument(
+        "--token-cache-size",
+        dest="token_cache_size",
+        type=utils.IntRange(imin=0),
+        required=False,
+        default=TOKEN_CACHE_SIZE,
+        help="Segment tokens to remember per worker and detector, repeated segments are hashed once. 0: no cache",
+    )
+    parser.add_argument(
+        "--hash",
+        dest="hash",
+        choices=[HASH_LEGACY, HASH_BLAKE2B],
+        default=HASH_LEGACY,
+        required=False,
+        help=f"Hash of tokens, of all strategies. {HASH_BLAKE2B}: faster, keyed with the salt, --token-width wide",
+    )
+    parser.add_argument(
+        "--token-width",
+        dest="token_width",
+        type=utils.IntRange(imin=1, imax=MAX_TOKEN_WIDTH),
+        required=False,
+        default=TOKEN_WIDTH,
+        help=f"Hex chars of a {HASH_BLAKE2B} token hash: wider tokens collide less",
+    )
+    parser.add_argument(
+        "--collision-registry-size",
+        dest="collision_registry_size",
+        type=utils.IntRange(imin=0),
+        required=False,
+        default=0,
+        help="Tokens to check for 2 segments with the same token, across the workers of a run. 0: no check",
+    )
+    parser.add_argument(
+        "--block-size-in-bytes",
+        dest="block_size_in_bytes",
+        type=utils.IntRange(imin=LINE_MODE),
+        required=False,
+        default=BLOCK_SIZE,
+        help=f"Scrub files in blocks of whole lines of about this size, in bytes. {LINE_MODE}: line by line",
+    )
+    parser.add_argument(
+        "--stream-batch-lines",
+        dest="stream_batch_lines",
+        type=utils.IntRange(imin=1),
+        required=False,
+        default=STREAM_BATCH_LINES,
+        help=f"'-i {STDIN}': lines scrubbed together on a worker, at most",
+    )
+    parser.add_argument(
+        "--flush-interval",
+        dest="flush_interval",
+        type=non_negative_float,
+        required=False,
+        default=FLUSH_INTERVAL,
+        help=f"'-i {STDIN}': seconds a line may wait for its batch to fill before it is scrubbed and flushed",
+    )
+    parser.add_argument(
+        "--dispatch",
+        dest="dispatch",
+        choices=(DISPATCH_ORDER, DISPATCH_LARGEST_FIRST),
+        default=DISPATCH_ORDER,
+        required=False,
+        help="Files dispatch order: discovery order, or costliest first by size and segments",
+    )
+    parser.add_argument(
+        "--in-flight-files",
+        dest="in_flight_files",
+        type=utils.IntRange(imin=1),
+        required=False,
+        default=2,
+        help="Split&Merge strategies: files split, scrubbed and merged at once. Caps the temp disk usage",
+    )
+    parser.add_argument(
+        "--split-mode",
+        dest="split_mode",
+        choices=(SPLIT_COPY, SPLIT_MMAP),
+        default=SPLIT_COPY,
+        required=False,
+        help=f"How Split&Merge splits big files: '{SPLIT_COPY}' into part files, "
+        f"'{SPLIT_MMAP}' into byte ranges of the memory-mapped file, without writing parts",
+    )
     parser.add_argument(
         "-rm",
         "--remove-original",
@@ -107,6 +275,22 @@ def get_args_parser(test=False):
         required=False,
         help="Remove original file after obfuscation",
     )
+    parser.add_argument(
+        "--incremental",
+        dest="incremental",
+        action="store_true",
+        required=False,
+        help=f"Skip files unchanged since a previous run obfuscated them with the same salt. "
+        f"Obfuscated files are recorded in the output folder's {MANIFEST_NAME}",
+    )
+    parser.add_argument(
+        "--follow",
+        dest="follow",
+        action="store_true",
+        required=False,
+        help=f"Obfuscate only the bytes appended to the input files since the last --follow run, and append them "
+        f"to their outputs. Follows logrotate truncations and renames. Checkpoints are kept in {MANIFEST_NAME}",
+    )
     parser.add_argument(
         "-log",
         "--log-folder",
@@ -168,16 +352,90 @@ def get_args_parser(test=False):
         action="store_true",
         help="Debug mode: Add debug prints",
     )
-    parser.add_argument("--replacer", default="sed -i", required=False, help="sed argument: sed -i, perl -pi.bak -e")
-    parser.add_argument("--searcher", default="rg -ioe", required=False, help="grep argument: grep -Ewo, grep -Pwo")
+    parser.add_argument(
+        "--replacer",
+        default="sed -i",
+        required=False,
+        help="sed argument: sed -i, perl -pi.bak -e. 'builtin': replace all segments in a single in-process pass",
+    )
+    parser.add_argument(
+        "--searcher",
+        default="rg -ioe",
+        required=False,
+        help="grep argument: grep -Ewo, grep -Pwo. 'builtin': find all segments in a single in-process pass",
+    )
+    parser.add_argument(
+        "--sample-size-in-bytes",
+        dest="sample_size_in_bytes",
+        type=utils.IntRange(imin=1),
+        required=False,
+        default=SAMPLE_SIZE,
+        help="LowLevel strategies: head of a file that orders the searchers by hit rate, and of density samples",
+    )
+    parser.add_argument(
+        "--density-samples",
+        dest="density_samples",
+        type=utils.IntRange(imin=0),
+        required=False,
+        default=DENSITY_SAMPLES,
+        help="Hybrid routing: byte ranges of a big file to sample, files estimated over --threshold are not scanned",
+    )
+    parser.add_argument(
+        "--daemon",
+        dest="daemon_socket",
+        default=None,
+        required=False,
+        help="Run resident: take jobs on this Unix socket. The other options are the jobs' defaults",
+    )
+    parser.add_argument(
+        "--connect",
+        dest="connect_socket",
+        default=None,
+        required=False,
+        help="Send the job (-i, -o, --salt, --strategy) to the daemon on this Unix socket, and show its progress",
+    )
+    parser.add_argument(
+        "--priority",
+        dest="priority",
+        type=int,
+        default=0,
+        required=False,
+        help="--connect: job priority, lower runs first",
+    )
     parser.add_argument("--sorter", default="sort -u", required=False, help="sort argument: sort -u")
     parser.add_argument("--ripgrep-path", default=None, required=False, help="path to ripgrep. Default use default rg")
     return parser
 
 
+def job_request(args):
+    """--connect job: paths are absolute, the daemon has its own working directory"""
+    return {
+        "input": os.path.abspath(args.input_folder),
+        "output": os.path.abspath(args.output_folder) if args.output_folder else None,
+        "salt": args.salt,
+        "strategy": args.strategy,
+        "priority": args.priority,
+    }
+
+
 def main():
     parser = get_args_parser()
     args = parser.parse_args()
+    if args.daemon_socket:
+        from .daemon import ObfuscatorDaemon
+
+        utils.init_logger(args)
+        return ObfuscatorDaemon(args, args.daemon_socket).serve_forever()
+    if args.input_folder is None:
+        parser.error("the following arguments are required: -i/--input")
+    if args.follow and not args.output_folder:
+        parser.error("--follow: outputs are appended to, -o/--output-folder is required")
+    if args.connect_socket:
+        from .daemon import submit_job
+
+        if args.input_folder == STDIN:
+            parser.error("--connect: the daemon cannot read this process's stdin")
+        return submit_job(args.connect_socket, job_request(args))
     return ObfuscateManager(args).run()
 
 
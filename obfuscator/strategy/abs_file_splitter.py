@@ -2,15 +2,49 @@
 import os
 import random
 from abc import ABC
+from contextlib import nullcontext
 from functools import lru_cache, partial
 
 from ..lib.exceptions import NoTextFilesFoundError
 from ..lib import utils
 from ..lib.enums import RCEnum
-from ..lib.workers_pool import WorkersPool, MultiProcessPipeline
+from ..lib.manifest import RunManifest
+from ..lib.pipeline import AdaptivePipeline
+from ..lib.pool_registry import registry
+from ..lib.scheduling import DISPATCH_LARGEST_FIRST, largest_first, run_pipelined
+from ..lib.shared import BorrowedPool, shared_pool
+from ..lib.workers_pool import WorkersPool
+
+
+_worker_hybrid = None  # Hybrid strategy of the current pipeline worker process
+
+
+def _init_hybrid_worker(hybrid, pool_proxy):
+    global _worker_hybrid
+    if pool_proxy is not None:
+        # No pool of its own: the parts of its files go to the run's shared pool, --workers processes in all
+        borrowed_pool = partial(BorrowedPool, pool_proxy)
+        for strategy in hybrid.strategies.values():
+            strategy.pool_function = borrowed_pool
+    _worker_hybrid = hybrid
+
+
+class _HybridStage:
+    """Pipeline stage that runs on the worker's own hybrid: only the items cross process boundaries"""
+
+    def __init__(self, stage, name):
+        self.stage = stage
+        self.__name__ = name
+
+    def __call__(self, item):
+        func, _ = _worker_hybrid.pipeline[self.stage]
+        return func(item)
 
 
 class FileSplitters(ABC):
+    # Strategy supports obfuscating several files at once on the shared pool
+    pipelined = False
+
     def __init__(self, args, name):
         self.args = args
         self.name = name
@@ -28,11 +62,19 @@ class FileSplitters(ABC):
                 if os.path.isdir(self.args.input_folder)
                 else os.path.dirname(self.args.input_folder)
             )
+        # Files obfuscated by previous runs: skipped while unchanged
+        self.manifest = RunManifest(self.args.output_folder, self.args.salt) if self.args.incremental else None
 
     @property
     def management_pool(self):
         return WorkersPool.pool_factory(serially=self.args.serially, pool_type=None, mgmt=True)
 
+    def borrow_pool(self, mgmt=False):
+        """Warm process-wide pool, sized once: strategies share it instead of opening a pool per call"""
+        if mgmt:
+            return registry.borrow(self.management_pool, self.args.workers, purpose="mgmt")
+        return registry.borrow(self.pool_function, self.args.workers)
+
     def __str__(self):
         return self.name
 
@@ -48,8 +90,7 @@ class FileSplitters(ABC):
         utils.logger.info(f"Working with pool {self.pool_function.__name__} with {self.args.workers} workers")
         # Template
         try:
-            utils.create_folder(self.args.output_folder)
-            self.raw_files = utils.get_text_files(self.args)
+            self.collect_files()
             self.pre_all()
             self.obfuscate()
             utils.logger.info(f"SUCCESS: Results can be found in '{self.args.output_folder}'")
@@ -65,8 +106,31 @@ class FileSplitters(ABC):
             rc = RCEnum.FAILURE
         finally:
             self.post_all()
+            registry.shutdown()
         return rc.value
 
+    def collect_files(self):
+        """Create the output folder, and list the files to obfuscate"""
+        utils.create_folder(self.args.output_folder)
+        files = utils.get_text_files(self.args)
+        if self.manifest:
+            self.manifest.load().compact()
+            changed = self.manifest.changed(files)
+            utils.logger.info(f"{self}: skip {len(files) - len(changed)} files unchanged since their last obfuscation")
+            files = changed
+        self.raw_files = self.order_files(files)
+
+    def mark_done(self, src_file, outputs=None):
+        """Record src_file, obfuscated into outputs: the next incremental run skips it while it is unchanged"""
+        if self.manifest:
+            self.manifest.record(src_file, outputs)
+
+    def order_files(self, files):
+        """Dispatch order of files to obfuscate"""
+        if self.args.dispatch == DISPATCH_LARGEST_FIRST:
+            return largest_first(files)
+        return files
+
     def pre_all(self) -> None:
         """Pre operations"""
         return None
@@ -83,9 +147,10 @@ class FileSplitters(ABC):
 
     def single_obfuscate(self, abs_file, *args, **__):
         files_to_obfuscate = self.pre_one(abs_file)
-        with self.pool_function(len(files_to_obfuscate)) as pool:
+        with self.borrow_pool() as pool:
             obfuscated_files = self.obfuscate_all(pool, files_to_obfuscate, *args)
-            self.post_one(pool=pool, obfuscated_files=obfuscated_files)
+            outputs = self.post_one(pool=pool, obfuscated_files=obfuscated_files, src_file=abs_file)
+        self.mark_done(abs_file, outputs)
         utils.logger.debug(f"Done obfuscate '{abs_file}'")
 
     def obfuscate(self):
@@ -96,12 +161,20 @@ class FileSplitters(ABC):
         if not self.raw_files:
             raise NoTextFilesFoundError(f"{self} No files to obfuscate")
 
-        with self.pool_function(self.args.workers) as pool:
-            for src_file in self.raw_files:
-                files_to_obfuscate = self.pre_one(src_file)
-                obfuscated_files = self.obfuscate_all(pool, files_to_obfuscate)
-                self.post_one(pool=pool, obfuscated_files=obfuscated_files)
-                utils.logger.debug(f"Done obfuscate '{src_file}'")
+        with self.borrow_pool() as pool:
+            if self.pipelined and not self.args.serially and self.args.in_flight_files > 1:
+                # Keep the pool busy across files: split and merge some while others are scrubbed
+                run_pipelined(partial(self._obfuscate_file, pool), self.raw_files, window=self.args.in_flight_files)
+            else:
+                for src_file in self.raw_files:
+                    self._obfuscate_file(pool, src_file)
+
+    def _obfuscate_file(self, pool, src_file):
+        files_to_obfuscate = self.pre_one(src_file)
+        obfuscated_files = self.obfuscate_all(pool, files_to_obfuscate)
+        outputs = self.post_one(pool=pool, obfuscated_files=obfuscated_files, src_file=src_file)
+        self.mark_done(src_file, outputs)
+        utils.logger.debug(f"Done obfuscate '{src_file}'")
 
     def obfuscate_all(self, pool, files_to_obfuscate, *args):
         # If 1 worker or one file to handle: run single process
@@ -115,6 +188,7 @@ class FileSplitters(ABC):
         raise NotImplementedError()
 
     def post_one(self, *_, **__):
+        """Return the output files of src_file, None if it was obfuscated in place"""
         return None
 
 
@@ -125,7 +199,7 @@ class ObfuscateGenericHybrid(FileSplitters):
 
     def pre_all(self):
         super().pre_all()
-        with self.management_pool(len(self.hybrid.strategies)) as pool:
+        with self.borrow_pool(mgmt=True) as pool:
             pool.map(utils.dummy, (o.pre_all for o in self.hybrid.strategies.values()))
 
     def single_obfuscate(self, *args, **kwargs):
@@ -139,15 +213,14 @@ class ObfuscateGenericHybrid(FileSplitters):
 
     def post_all(self):
         super().post_all()
-        with self.management_pool(self.args.workers) as pool:
+        with self.borrow_pool(mgmt=True) as pool:
             pool.map(utils.dummy, (o.post_all for o in self.hybrid.strategies.values()))
 
 
 class AbsHybrid(FileSplitters):
     def __init__(self, args, name, strategies, main_strategy):
         super().__init__(args, name)
-        self.default_process_num = 5
-        self.pipeline = None
+        self.pipeline = None  # [(stage function, initial width hint)]
         self.strategies = strategies
         self.main_strategy = main_strategy
         self.strategy_to_worker = {flag: strategy.single_obfuscate for flag, strategy in strategies.items()}
@@ -180,7 +253,21 @@ class AbsHybrid(FileSplitters):
         return self.generic.post_all()
 
     def orchestrate_run(self):
-        MultiProcessPipeline(self.pipeline, self.raw_files, self.default_process_num)(ignore_results=True)
+        """Pipeline of the files' stages, and one shared pool that scrubs the parts of all of them
+
+        Workers get the strategies once, at start. Stage widths adapt at runtime, within --workers processes.
+        A big file is still split and scrubbed on --workers cores: its stage worker waits for the shared pool.
+        """
+        stages = [(_HybridStage(idx, func.__name__), width) for idx, (func, width) in enumerate(self.pipeline)]
+        with nullcontext() if self.args.serially else shared_pool(self.args.workers) as pool_proxy:
+            AdaptivePipeline(
+                stages,
+                self.raw_files,
+                budget=self.args.workers,
+                name=self.name,
+                initializer=_init_hybrid_worker,
+                initargs=(self, pool_proxy),
+            )(ignore_results=True)
 
     @property
     @lru_cache(1)
@@ -199,11 +286,14 @@ class AbsHybrid(FileSplitters):
                 future_args = tuple()
             if move_to_main_strategy is None:
                 utils.logger.info(f"{self.hybrid.main_strategy}: ignore file {src_file}")
+                # Nothing to obfuscate in it: done, the next incremental run skips it too
+                self.hybrid.mark_done(src_file)
                 return None
-            return partial(self.hybrid.strategy_to_worker[move_to_main_strategy])(src_file, future_args)
+            # Compact work item: the obfuscate stage looks the strategy up in its own process
+            return move_to_main_strategy, src_file, future_args
 
-        @staticmethod
-        def obfuscate_file(obf_func):
-            if obf_func:
-                return obf_func()
+        def obfuscate_file(self, work):
+            if work:
+                move_to_main_strategy, src_file, future_args = work
+                return self.hybrid.strategy_to_worker[move_to_main_strategy](src_file, future_args)
             return None
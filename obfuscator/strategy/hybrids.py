@@ -10,6 +10,7 @@ class ObfuscateHybrid(AbsHybrid):
 
         super().__init__(args, name=name, strategies=strategies, main_strategy=strategies[True])
 
+        # Initial stage widths ratio: AdaptivePipeline rebalances them at runtime
         self.pipeline = [
             (self.main_strategy.orchestrate_iterator, 5),
             (self.orchestrator.decide, 2),
@@ -1,13 +1,25 @@
 import os
 import platform
+import re
+import time
 from collections import defaultdict
 from functools import lru_cache
+from itertools import chain
 
+from ..lib.addresses import AddressClassifier
+from ..lib.density import DensityEstimator
+from ..lib.cache import TOKEN_CACHE_SIZE, LRUCache
 from ..lib.exceptions import NoTextFilesFoundError
-from ..lib.detectors import CredentialFilth, FilesDirFilth
+from ..lib.keywords import credentials_regex_str
+from ..lib.hashing import HASH_LEGACY, CollisionRegistry, Hasher, format_token, token_key
+from ..lib.shared import collision_registry
 from ..lib import utils
 from .abs_file_splitter import FileSplitters
 from ..lib.enums import SegmentsEnum
+from ..lib.scheduling import DISPATCH_LARGEST_FIRST, file_cost, largest_first, segments_per_pass
+from ..lib.patterns import files_dir_regex_str
+from ..lib.pruning import DetectorStats, order_by_hit_rate, required_chars, sample_file
+from ..lib.segments import BUILTIN, SegmentReplacer, SegmentScanner
 
 SED_SEPARATOR = "@"
 SED_FORBIDDEN_CHARS = f"[]*^{SED_SEPARATOR}"
@@ -17,6 +29,8 @@ class ObfuscateLowLevel(FileSplitters):
     def __init__(self, args, name: str = "LowLevel"):
         super().__init__(args, name)
         self.low_level_filths = []
+        self.scanner = None
+        self.density = None  # Routing by sampled density, before scanning for the threshold
         self.file_to_filth_segment = {}
         self.threshold = args.threshold
         self._log_kwargs = {"log_output": self.args.debug, "log_input": self.args.debug}
@@ -29,11 +43,17 @@ class ObfuscateLowLevel(FileSplitters):
         super().pre_all()
         ipv4_regex = r"(25[0-5]|2[0-4][0-9]|[0-1]?[0-9]?[0-9])(\.(25[0-5]|2[0-4][0-9]|[0-1]?[0-9]?[0-9])){3}"
         ipv6_regex = r"(([0-9a-fA-F]{1,4}:){7,7}[0-9a-fA-F]{1,4}|([0-9a-fA-F]{1,4}:){1,7}:|([0-9a-fA-F]{1,4}:){1,6}:[0-9a-fA-F]{1,4}|([0-9a-fA-F]{1,4}:){1,5}(:[0-9a-fA-F]{1,4}){1,2}|([0-9a-fA-F]{1,4}:){1,4}(:[0-9a-fA-F]{1,4}){1,3}|([0-9a-fA-F]{1,4}:){1,3}(:[0-9a-fA-F]{1,4}){1,4}|([0-9a-fA-F]{1,4}:){1,2}(:[0-9a-fA-F]{1,4}){1,5}|[0-9a-fA-F]{1,4}:((:[0-9a-fA-F]{1,4}){1,6})|:((:[0-9a-fA-F]{1,4}){1,7}|:)|fe80:(:[0-9a-fA-F]{0,4}){0,4}%[0-9a-zA-Z]{1,}|::(ffff(:0{1,4}){0,1}:){0,1}((25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])\.){3,3}(25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])|([0-9a-fA-F]{1,4}:){1,4}:((25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])\.){3,3}(25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9]))"
-        file_regex = FilesDirFilth.regex_str
-        credentials_regex = CredentialFilth.regex_str
+        file_regex = files_dir_regex_str()
+        credentials_regex = credentials_regex_str(self.args.credentials_keywords_file)
         mac_addr_regex = r"([a-f0-9A-F]{2}:){5}[a-f0-9A-F]{2}"
 
-        kwargs = {"salt": self.args.salt}
+        kwargs = {
+            "salt": self.args.salt,
+            "cache_size": self.args.token_cache_size,
+            "hasher": Hasher(self.args.hash, salt=self.args.salt, width=self.args.token_width),
+            # Shared by the workers: collisions of segments of different files are detected too
+            "registry": collision_registry(self.args.collision_registry_size, self.args.serially),
+        }
 
         # Order is important! ip can be inside a file dir but not vise-versa
         self.low_level_filths = [
@@ -47,16 +67,74 @@ class ObfuscateLowLevel(FileSplitters):
                 LowLevelFilth(placeholder=SegmentsEnum.IPv6.value, regex=ipv6_regex, **kwargs),
             ],
         ]
+        # The builtin scanner validates address candidates instead of running the address regexes
+        file_dir, credentials, mac_addr = self.low_level_filths[0]
+        ipv4, ipv6 = self.low_level_filths[1]
+        self.scanner = SegmentScanner([file_dir, credentials, AddressClassifier(mac=mac_addr, ipv4=ipv4, ipv6=ipv6)])
+        if self.args.density_samples:
+            self.density = DensityEstimator(
+                self.scanner, samples=self.args.density_samples, sample_size=self.args.sample_size_in_bytes
+            )
 
     def pre_one(self, src_file):
         src_file, _, filth_to_segment = self.orchestrate_iterator(src_file, check_with_threshold=False)
         self.file_to_filth_segment[src_file] = filth_to_segment
         return [src_file]
 
+    def obfuscate(self):
+        """Obfuscate input files in two phases on the pool
+
+        Find the segments of all files, then rewrite them: costliest first, by size and segments number
+        """
+        if not self.raw_files:
+            raise NoTextFilesFoundError(f"{self} No files to obfuscate")
+
+        with self.borrow_pool() as pool:
+            found = pool.map(self._find_segments, self.raw_files, chunksize=1)
+            stats = DetectorStats()
+            for _, file_stats in found:
+                stats.update(file_stats)
+            utils.logger.info(f"{self} detectors: {stats.report()}")
+            files_to_obfuscate = [(src_file, segments) for (src_file, _, segments), _ in found if segments]
+            if self.args.dispatch == DISPATCH_LARGEST_FIRST:
+                files_to_obfuscate = largest_first(files_to_obfuscate, cost=self._cost)
+            pool.map(self.obfuscate_one, files_to_obfuscate, chunksize=1)
+        # Files without segments are done too: nothing to replace in them
+        for src_file in self.raw_files:
+            self.mark_done(src_file)
+
+    def _find_segments(self, src_file):
+        """Phase one of a file: orchestrate_iterator's result, and the file's detector stats"""
+        stats = DetectorStats()
+        return self.orchestrate_iterator(src_file, check_with_threshold=False, stats=stats), stats
+
+    def _cost(self, file_to_obfuscate):
+        src_file, filth_to_segment = file_to_obfuscate
+        # The builtin replacer rewrites a file in one pass, sed once per chunk of segments
+        per_pass = None if self.args.replacer == BUILTIN else segments_per_pass(self.args.threshold)
+        segments = sum(len(segments) for segments in filth_to_segment.values())
+        return file_cost(src_file, segments=segments, per_pass=per_pass)
+
     def obfuscate_one(self, *args, **__):
         abs_file, filth_to_segment = args[0]
         self._print(abs_file)
-        filth_to_segment = filth_to_segment or self.file_to_filth_segment[abs_file]
+        filth_to_segment = self.resolve_filths(filth_to_segment or self.file_to_filth_segment[abs_file])
+        if self.args.replacer == BUILTIN:
+            SegmentReplacer(filth_to_segment).replace_file(abs_file)
+        else:
+            self._sed_replace(abs_file, filth_to_segment)
+        for filth in filth_to_segment:
+            filth.check_collisions()
+            utils.logger.debug(f"Token cache {filth}: {filth.tokens.stats()}")
+        return abs_file
+
+    def post_all(self):
+        super().post_all()
+        registry = self.low_level_filths[0][0].registry if self.low_level_filths else None
+        if registry is not None:
+            utils.logger.info(f"{self} collision registry: {registry.stats()}")
+
+    def _sed_replace(self, abs_file, filth_to_segment):
         cmds = []
         for filth, segments in filth_to_segment.items():
             for segment in segments:
@@ -65,28 +143,38 @@ class ObfuscateLowLevel(FileSplitters):
                     segment = segment.replace(t, rf"\{t}")
                 cmds.append(f"s{SED_SEPARATOR}{segment}{SED_SEPARATOR}{obf_segment}{SED_SEPARATOR}g")
         # Cannot run in parallel: will have missing obfuscated segments
-        for chunk in utils.chunkify(cmds, size=min(50, int(self.args.threshold / 5))):
+        for chunk in utils.chunkify(cmds, size=segments_per_pass(self.args.threshold)):
             cmd = f"""{self.args.replacer} '{" ; ".join(chunk)}' {abs_file}"""
             utils.run_local_cmd(cmd=cmd, **self._log_kwargs)
-        return abs_file
 
-    def orchestrate_iterator(self, src_file, *_, check_with_threshold=True, **__):
+    def resolve_filths(self, placeholder_to_segment):
+        """Map placeholders back to this process's filths"""
+        filths = {filth.placeholder: filth for filth in chain.from_iterable(self.low_level_filths)}
+        return {filths[placeholder]: segments for placeholder, segments in placeholder_to_segment.items()}
+
+    def orchestrate_iterator(self, src_file, *_, check_with_threshold=True, stats=None, **__):
         if not self.low_level_filths:
             raise AssertionError()
-        grep = f'{self.args.searcher} "{{r}}" {src_file} | {self.args.sorter}'
 
-        filth_to_segment = defaultdict(list)
-        total_segments = 0
-        for filths in self.low_level_filths:
-            for filth in filths:
-                res = utils.run_local_cmd(grep.format(r=filth.regex), **self._log_kwargs)
-                segments = set(s for s in res.stdout.split("\n") if s)
-                total_segments += len(segments)
-                filth_to_segment[filth] += segments
-
-                if check_with_threshold and total_segments >= self.threshold:
-                    utils.logger.info(f"LowLevel: Exclude {src_file}: {total_segments} segments")
-                    return src_file, False, {}
+        limit = self.threshold if check_with_threshold else None
+        stats = DetectorStats() if stats is None else stats
+        if limit is not None and self.density is not None:
+            estimate = self.density.estimate(src_file)
+            if estimate is not None and estimate[1] >= limit:
+                # Routed by its samples: the file itself is not scanned
+                utils.logger.info(f"LowLevel: Exclude {src_file}: about {estimate[1]} segments ({estimate[0]} sampled)")
+                return src_file, False, {}
+        if self.args.searcher == BUILTIN:
+            # One pass for all filths: no per-filth time
+            start = time.perf_counter()
+            filth_to_segment, total_segments = self.scanner.scan(src_file, limit=limit, stats=stats)
+            stats.add(BUILTIN, seconds=time.perf_counter() - start)
+        else:
+            filth_to_segment, total_segments = self._search(src_file, limit=limit, stats=stats)
+
+        if limit is not None and total_segments >= limit:
+            utils.logger.info(f"LowLevel: Exclude {src_file}: {total_segments} segments")
+            return src_file, False, {}
 
         # Finished all checks - we can return True
         if total_segments:
@@ -95,11 +183,53 @@ class ObfuscateLowLevel(FileSplitters):
                 segments = sorted(set(self.clean_suffix(seg, "'") for seg in segments), key=lambda x: -len(x))
                 filth_to_segment[filth] = segments
 
-            return src_file, True, dict(filth_to_segment)
+            # Keyed by placeholder: items stay small when passed between processes
+            return src_file, True, {filth.placeholder: segments for filth, segments in filth_to_segment.items()}
 
         # No segments - no need to handle
         return src_file, None, {}
 
+    def _search(self, src_file, limit=None, stats=None):
+        """Search each filth with an external searcher: one process per filth
+
+        Filths that cannot match anywhere in the file are skipped. The others run by their hit rate
+        in the head of the file, most first, within their precedence group: the threshold is reached sooner.
+        With a limit, the searcher stops as soon as the limit is crossed: its unique lines go through
+        awk, not the sorter, and head closes the pipe.
+        """
+        grep = f'{self.args.searcher} "{{r}}" {src_file} | {self.args.sorter}'
+        early_stop = f"{self.args.searcher} \"{{r}}\" {src_file} | awk '!seen[$0]++' | head -n {{n}}"
+        stats = DetectorStats() if stats is None else stats
+        filths = list(chain.from_iterable(self.low_level_filths))
+        sample, met = sample_file(src_file, [filth.requirements for filth in filths], self.args.sample_size_in_bytes)
+        sample = sample.decode("utf-8", errors="surrogateescape")
+        hits = {filth: filth.count(sample) for filth, ok in zip(filths, met) if ok}
+
+        # Regex length stands for the cost: the long IPv6 alternation runs last of its group
+        ordered = order_by_hit_rate(self.low_level_filths, hits, costs={filth: len(filth.regex) for filth in filths})
+
+        filth_to_segment = defaultdict(list)
+        total_segments = 0
+        for filth in chain.from_iterable(ordered):
+            if filth not in hits:
+                stats.add(str(filth), skips=1)
+                continue
+            start = time.perf_counter()
+            if limit is None:
+                cmd = grep.format(r=filth.regex)
+            else:
+                cmd = early_stop.format(r=filth.regex, n=limit - total_segments)
+            res = utils.run_local_cmd(cmd, **self._log_kwargs)
+            segments = set(s for s in res.stdout.split("\n") if s)
+            stats.add(str(filth), hits=len(segments), seconds=time.perf_counter() - start)
+            total_segments += len(segments)
+            filth_to_segment[filth] += segments
+
+            if limit is not None and total_segments >= limit:
+                break
+        # Keep filths order: it is the replacement precedence
+        return {filth: filth_to_segment[filth] for filth in filths if filth in filth_to_segment}, total_segments
+
 
 class ObfuscateUsingRipGrep(ObfuscateLowLevel):
     """Obfuscate all files in place but not giving them IDs:
@@ -136,8 +266,10 @@ class ObfuscateUsingRipGrep(ObfuscateLowLevel):
         if not self.raw_files:
             raise NoTextFilesFoundError(f"{self} No files to obfuscate")
 
-        with self.pool_function(self.args.workers) as pool:
-            pool.map(self.obfuscate_one, self.raw_files)
+        with self.borrow_pool() as pool:
+            pool.map(self.obfuscate_one, self.raw_files, chunksize=1)
+        for src_file in self.raw_files:
+            self.mark_done(src_file)
 
     def obfuscate_one(self, *args, **kwargs):
         src_file = args[0]
@@ -149,23 +281,46 @@ class ObfuscateUsingRipGrep(ObfuscateLowLevel):
             f"2>&1 | sudo tee {{t}} > /dev/null && sudo mv {{t}} {src_file}"
         )
 
-        for filths in self.low_level_filths:
-            for filth in filths:
-                utils.logger.debug(f"Obfuscate {filth.placeholder} segments of '{src_file}'")
-                tmp_file = os.path.join(dirname, f"{src_file}__{filth.placeholder.lower().replace('-', '_')}.tmp")
-                cmd = replace_cmd.format(r=filth.regex, p="{{" + filth.placeholder, t=tmp_file)
-                utils.run_local_cmd(cmd=cmd, **self._log_kwargs)
-                utils.logger.debug(f"Done obfuscate {filth.placeholder}: '{src_file}'")
+        filths = list(chain.from_iterable(self.low_level_filths))
+        _, met = sample_file(src_file, [filth.requirements for filth in filths], self.args.sample_size_in_bytes)
+        for filth, ok in zip(filths, met):
+            if not ok:
+                utils.logger.debug(f"Skip {filth.placeholder}: cannot match in '{src_file}'")
+                continue
+            utils.logger.debug(f"Obfuscate {filth.placeholder} segments of '{src_file}'")
+            tmp_file = os.path.join(dirname, f"{src_file}__{filth.placeholder.lower().replace('-', '_')}.tmp")
+            cmd = replace_cmd.format(r=filth.regex, p="{{" + filth.placeholder, t=tmp_file)
+            utils.run_local_cmd(cmd=cmd, **self._log_kwargs)
+            utils.logger.debug(f"Done obfuscate {filth.placeholder}: '{src_file}'")
 
         return src_file
 
 
 class LowLevelFilth:
-    def __init__(self, salt: str, placeholder: str, regex: str):
+    def __init__(
+        self,
+        salt: str,
+        placeholder: str,
+        regex: str,
+        cache_size: int = TOKEN_CACHE_SIZE,
+        hasher: Hasher = None,
+        registry: CollisionRegistry = None,
+    ):
         self.salt = salt
         self.placeholder = placeholder
         self.regex = regex
-        self._const_hash = utils.hash_string("".join((str(x) for x in (self.placeholder, self.salt))))
+        self.hasher = hasher or Hasher(HASH_LEGACY)
+        self.registry = registry
+        self._new_tokens = []  # (token, segment) made since the last check_collisions
+        self._const_hash = token_key(self.placeholder, self.salt)
+        # segment -> token: repeated segments are hashed once
+        self.tokens = LRUCache(cache_size)
+        # Characters every match has, and the regex that counts matches in a sample
+        self.requirements = required_chars(regex)
+        try:
+            self._sample_regex = re.compile(regex, re.IGNORECASE)
+        except re.error:
+            self._sample_regex = None
 
     def __str__(self):
         return self.placeholder
@@ -173,5 +328,34 @@ class LowLevelFilth:
     def __repr__(self):
         return self.__str__()
 
+    def count(self, text):
+        """Matches in text, 0 if the regex is not a Python one"""
+        return sum(1 for _ in self._sample_regex.finditer(text)) if self._sample_regex is not None else 0
+
     def replace_with(self, text):
-        return "{{" + "%s-%s" % (self.placeholder, utils.hash_string(f"{self._const_hash}{text}")) + "}}"
+        return self.tokens.get(text, lambda: self._replace_with(text))
+
+    def replace_many(self, texts):
+        """Tokens of texts, in order: the uncached ones are hashed in one batch"""
+        return self.tokens.get_many(texts, self._replace_many)
+
+    def _replace_many(self, texts):
+        hashes = self.hasher.hash_many([f"{self._const_hash}{text}" for text in texts])
+        return [self._token(text, text_hash) for text, text_hash in zip(texts, hashes)]
+
+    def _replace_with(self, text):
+        return self._token(text, self.hasher.hash(f"{self._const_hash}{text}"))
+
+    def _token(self, text, text_hash):
+        token = format_token(self.placeholder, text_hash)
+        if self.registry is not None:
+            self._new_tokens.append((token, text))
+        return token
+
+    def check_collisions(self):
+        """Register the tokens made since the last check: one call to a shared registry, not one per token"""
+        if not self._new_tokens:
+            return
+        new_tokens, self._new_tokens = self._new_tokens, []
+        for token in self.registry.add_many(new_tokens):
+            utils.logger.warning(f"Token collision: {token} is used for 2 different segments")
@@ -7,9 +7,19 @@ from datetime import datetime
 from functools import partial
 from tempfile import mkstemp
 
+from ..lib.blocks import IO_BYTES, LINE_MODE, LineCounter, block_safe, scrub_stream
+from ..lib.cache import CachedScrubber
 from ..lib.exceptions import NoTextFilesFoundError
-from ..lib.detectors import ObfuscatorDetectors
+from ..lib.filths import check_collisions, configure_detector
+from ..lib.hashing import Hasher
+from ..lib.detectors import CredentialFilth, ObfuscatorDetectors
+from ..lib.engine import ENGINE_NATIVE, BytesScrubber, NativeScrubber
+from ..lib.keywords import credentials_matcher
+from ..lib.merge import PartsMerger, combine_files
+from ..lib.prefilter import PrefilteredScrubber, detectors_prefilter
+from ..lib.ranges import SPLIT_MMAP, FileRange, open_range, split_ranges
 from ..lib.scrubber import ObfuscatorScrubber
+from ..lib.shared import collision_registry
 from ..lib import utils
 from .abs_file_splitter import FileSplitters
 
@@ -20,6 +30,8 @@ class ObfuscateSplitAndMerge(FileSplitters):
     Suitable for big files with no limited disk space
     """
 
+    pipelined = True
+
     def __init__(self, args, name: str = "Split&Merge"):
         super().__init__(args=args, name=name)
         # Folder to save file splits in
@@ -27,6 +39,19 @@ class ObfuscateSplitAndMerge(FileSplitters):
         self._tmp_folder = None
         self.num_parts = self.args.workers
         self.sort_func = utils.sort_split_file_func
+        # Split big files into virtual byte ranges instead of part files
+        self.virtual_split = self.args.split_mode == SPLIT_MMAP
+        # Bytes of whole lines per scrubber.clean call, LINE_MODE to scrub line by line
+        self.block_size = LINE_MODE
+        # Stream raw bytes: no transcoding, invalid UTF-8 passes through
+        self.binary = self.args.io_mode == IO_BYTES
+        # Skip lines with no sign of filth
+        self.prefilter = None
+        self.token_cache = None
+        self.detector_stats = None
+        # Configured filth classes of the scrubber, and the run's collision registry
+        self.filth_classes = []
+        self.registry = None
 
     def pre_all(self):
         super().pre_all()
@@ -41,14 +66,77 @@ class ObfuscateSplitAndMerge(FileSplitters):
         if self.scrubber:
             return
         scrubber = ObfuscatorScrubber()
+        credentials = credentials_matcher(self.args.credentials_keywords_file)
+        # Same hasher and registry as the low level filths: a segment gets one token whatever the strategy
+        hasher = Hasher(self.args.hash, salt=self.args.salt, width=self.args.token_width)
+        self.registry = collision_registry(self.args.collision_registry_size, self.args.serially)
         for detector in ObfuscatorDetectors:
-            detector.filth_cls.salt = self.args.salt
             utils.logger.debug(f"Add Detector: {detector}")
             scrubber.add_detector(detector)
+            # On the scrubber's detector, not the class: scrubbers of other salts or keywords are left as they are
+            regex = credentials.regex if issubclass(detector.filth_cls, CredentialFilth) else None
+            configured = configure_detector(
+                scrubber._detectors[detector.filth_cls.type],
+                self.args.salt,
+                regex,
+                hasher,
+                self.registry,
+                cache_size=self.args.token_cache_size,
+            )
+            self.filth_classes.append(configured.filth_cls)
         self.scrubber = scrubber
 
+        self.block_size = self.args.block_size_in_bytes
+        if self.block_size != LINE_MODE and not block_safe(scrubber):
+            utils.logger.warning(f"{self}: detectors depend on line boundaries, scrub line by line")
+            self.block_size = LINE_MODE
+
+        if self.args.engine == ENGINE_NATIVE:
+            native = NativeScrubber.from_scrubber(scrubber, token_cache_size=self.args.token_cache_size)
+            if native is None:
+                utils.logger.warning(f"{self}: detectors are not all plain regexes, use scrubadub engine")
+            else:
+                self.scrubber = native
+                self.token_cache = native.tokens
+                self.detector_stats = native.stats
+        if self.binary:
+            self.scrubber = BytesScrubber(self.scrubber)
+        if self.args.line_cache_size and self.block_size == LINE_MODE:
+            # Blocks are never repeated: only line by line scrubbing has lines to remember
+            self.scrubber = CachedScrubber(self.scrubber, maxsize=self.args.line_cache_size)
+        if self.args.prefilter:
+            builtin_filths = {detector.filth_cls for detector in ObfuscatorDetectors}
+            self.prefilter = detectors_prefilter(scrubber._detectors.values(), builtin_filths, credentials.keywords)
+            if self.prefilter is None:
+                utils.logger.warning(f"{self}: a detector has no cheap cue, scrub every line")
+
+    def file_scrubber(self):
+        """Scrubber of one file: a prefiltered one counts the file's lines"""
+        if self.prefilter is None:
+            return self.scrubber
+        return PrefilteredScrubber(self.scrubber, self.prefilter)
+
+    def check_collisions(self):
+        """After a file or a batch: register the tokens it made, warn of collisions"""
+        check_collisions(self.filth_classes)
+
+    def log_scrubber_stats(self, scrubber, abs_file):
+        if isinstance(scrubber, PrefilteredScrubber):
+            utils.logger.debug(f"Prefilter '{abs_file}': {scrubber.stats()}")
+        # Caches are per worker: their stats add up over the files it scrubbed
+        if isinstance(self.scrubber, CachedScrubber):
+            utils.logger.debug(f"Line cache: {self.scrubber.lines.stats()}")
+        if self.token_cache is not None:
+            utils.logger.debug(f"Token cache: {self.token_cache.stats()}")
+        for filth_cls in self.filth_classes:
+            utils.logger.debug(f"Token cache {filth_cls.__name__}: {filth_cls.tokens.stats()}")
+        if self.detector_stats is not None:
+            utils.logger.debug(f"Detectors: {self.detector_stats.report()}")
+
     def post_all(self):
         """Post operations"""
+        if self.registry is not None:
+            utils.logger.info(f"{self} collision registry: {self.registry.stats()}")
         if self._tmp_folder:
             utils.logger.debug(f"Remove temp folder: {self._tmp_folder}")
             # Remove temporary folder
@@ -58,6 +146,8 @@ class ObfuscateSplitAndMerge(FileSplitters):
                 utils.logger.error(f"Error: {e.filename} - {e.strerror}.")
 
     def pre_one(self, src_file):
+        if self.virtual_split and os.path.getsize(src_file) >= self.args.min_split_size_in_bytes:
+            return split_ranges(src_file, num_parts=self.num_parts)
         return utils.get_extended_file(
             filename=src_file,
             size_limit=self.args.min_split_size_in_bytes,
@@ -69,34 +159,74 @@ class ObfuscateSplitAndMerge(FileSplitters):
     def post_one(self, *_, **kwargs):
         pool = kwargs['pool']
         obfuscated_files = kwargs['obfuscated_files']
-        files_to_merge = self._prepare_merge_files(obfuscated_files=obfuscated_files)
+        moved_files, files_to_merge = self._prepare_merge_files(obfuscated_files=obfuscated_files)
         if files_to_merge:
             pool.map(self._merge, files_to_merge.items())
 
+        # Byte ranges are read from the original: it can be removed only once all of them are done
+        src_file = kwargs.get("src_file")
+        if self.virtual_split and self.args.remove_original and src_file and os.path.exists(src_file):
+            utils.logger.debug(f"Remove file: {src_file}")
+            utils.remove_files([src_file])
+        return moved_files + list(files_to_merge)
+
+    def obfuscate_all(self, pool, files_to_obfuscate, *args):
+        if not (self.virtual_split and len(files_to_obfuscate) > 1 and hasattr(pool, "imap")):
+            return super().obfuscate_all(pool, files_to_obfuscate, *args)
+
+        # Ranges are done in order: merge range N as soon as ranges 0..N-1 are done, while the rest are scrubbed
+        args = [(f, utils.itemgetter(args, 0, dict)) for f in files_to_obfuscate]
+        merger = None
+        try:
+            for obfuscated_file in pool.imap(self.obfuscate_one, args):
+                if merger is None:
+                    merger = PartsMerger(self._mkstemp_merged(obfuscated_file), remove_parts=True)
+                merger.add(obfuscated_file)
+        finally:
+            if merger:
+                merger.close()
+        # Looks like a single obfuscated file: post_one moves it into the output folder
+        return [merger.output_file]
+
+    @staticmethod
+    def _mkstemp_merged(obfuscated_file):
+        orig_basename, _, _ = os.path.basename(obfuscated_file).partition(utils.FILE_PREFIX)
+        tmp_fd, abs_tmp_path = mkstemp(
+            dir=os.path.dirname(obfuscated_file),
+            prefix=f"{orig_basename}{utils.FILE_PREFIX}",
+            suffix=utils.NEW_FILE_SUFFIX,
+        )
+        os.close(tmp_fd)
+        return abs_tmp_path
+
     def obfuscate_one(self, *args, **kwargs):
         """Worker function: Takes a filename and obfuscate it
 
         Opens a new temp file to write obfuscated line to it
         Copy temp file to a new file with same name in target dir
         """
-        abs_file = utils.itemgetter(args, 0, type_needed=str)
+        file_range = self._get_file_range(args)
+        abs_file = file_range.path if file_range else utils.itemgetter(args, 0, type_needed=str)
         self._print(abs_file)
 
         # Create temp file, return fs and abs_tmp_path
-        prefix = f"{os.path.basename(abs_file)}{utils.FILE_PREFIX}"
+        basename = self._range_part_name(file_range) if file_range else os.path.basename(abs_file)
+        prefix = f"{basename}{utils.FILE_PREFIX}"
         new_folder_name = utils.get_folders_difference(filename=abs_file, folder=self._tmp_folder)
         obf_mkstemp = partial(mkstemp, dir=new_folder_name, text=True, prefix=prefix)
         tmp_fd, abs_tmp_path = obf_mkstemp(suffix=utils.NEW_FILE_SUFFIX)
-        line_idx = 0
+        scrubber = self.file_scrubber()
+        counter = LineCounter()
         try:
-            with open(tmp_fd, "w", buffering=utils.DEFAULT_BUFFER_SIZE) as writer, open(
-                abs_file, "r", buffering=utils.DEFAULT_BUFFER_SIZE, encoding="utf-8"
+            with open(tmp_fd, "wb" if self.binary else "w", buffering=utils.DEFAULT_BUFFER_SIZE) as writer, (
+                self._open_source(file_range or abs_file, binary=self.binary)
             ) as reader:
-                for line_idx, line in enumerate(reader):
-                    # clean file and write to new_logs file
-                    writer.write(self.scrubber.clean(text=line))
+                # clean file and write to new_logs file
+                scrub_stream(scrubber, reader, writer, block_size=self.block_size, counter=counter)
+            self.check_collisions()
+            self.log_scrubber_stats(scrubber, abs_file)
 
-        except OSError:
+        except (OSError, UnicodeDecodeError):
             utils.logger.exception("Exception in obfuscate_sam._obfuscate_worker")
             # remove failed temp file
             utils.remove_files([abs_tmp_path])
@@ -106,11 +236,11 @@ class ObfuscateSplitAndMerge(FileSplitters):
             err_tmp_fd, abs_tmp_path = obf_mkstemp(suffix=".err.tmp")
 
             with open(err_tmp_fd, "w") as writer:
-                line = f"Line {line_idx}: " if line_idx else ""
+                line = f"Line {counter.line}: " if counter.line else ""
                 writer.write(f"{line}{traceback.format_exc().strip()}")
         finally:
             internal = utils.PART_SUFFIX in abs_file
-            if self.args.remove_original or internal:
+            if not file_range and (self.args.remove_original or internal):
                 if not internal:
                     utils.logger.debug(f"Remove file: {abs_file}")
                 utils.remove_files([abs_file])
@@ -120,14 +250,37 @@ class ObfuscateSplitAndMerge(FileSplitters):
         utils.logger.info(f"Done obfuscate '{abs_file}'")
         return abs_tmp_path
 
+    @staticmethod
+    def _get_file_range(args):
+        item = args[0][0] if args and isinstance(args[0], tuple) and args[0] else None
+        return item if isinstance(item, FileRange) else None
+
+    @staticmethod
+    def _range_part_name(file_range):
+        """Name a byte range like split_file names a part file, so sort_func orders it the same way"""
+        basename = os.path.basename(file_range.path)
+        return f"{basename}{utils.FILE_PREFIX}{file_range.index}{utils.FILE_PREFIX}{utils.PART_SUFFIX}"
+
+    @staticmethod
+    def _open_source(source, binary=False):
+        if isinstance(source, FileRange):
+            return open_range(source, buffering=utils.DEFAULT_BUFFER_SIZE, encoding="utf-8", binary=binary)
+        if binary:
+            return open(source, "rb", buffering=utils.DEFAULT_BUFFER_SIZE)
+        return open(source, "r", buffering=utils.DEFAULT_BUFFER_SIZE, encoding="utf-8")
+
     def _prepare_merge_files(self, obfuscated_files):
-        """Merge all file splits into one new obfuscated file"""
+        """Merge all file splits into one new obfuscated file
+
+        Return the obfuscated files moved to the output folder, and the parts to merge of each output file
+        """
         if not obfuscated_files:
             raise NoTextFilesFoundError("No files to merge!")
 
         # Get all file parts, sort them by index, merge them one-by-one into a new file.
         obfuscated_files = list(obfuscated_files)
         dict_files = defaultdict(list)
+        moved_files = []
 
         if len(obfuscated_files) == 1:
             # move to output_folder
@@ -136,7 +289,9 @@ class ObfuscateSplitAndMerge(FileSplitters):
             target_dir = os.path.dirname(obfuscated_abs_path.replace(self._tmp_folder, ""))
             target_dir = self.args.output_folder + target_dir.strip("/")
             utils.create_folder(target_dir)
-            shutil.move(obfuscated_abs_path, os.path.join(target_dir, orig_basename))
+            target_file = os.path.join(target_dir, orig_basename)
+            shutil.move(obfuscated_abs_path, target_file)
+            moved_files.append(target_file)
         else:
             # Sort parts by initial index to merge them by order
             obfuscated_files = sorted(obfuscated_files, key=self.sort_func)
@@ -147,10 +302,10 @@ class ObfuscateSplitAndMerge(FileSplitters):
                 utils.create_folder(target_dir)
                 target_file = os.path.join(target_dir, orig_basename)
                 dict_files[target_file].append(obfuscated_abs_path)
-        return dict_files
+        return moved_files, dict_files
 
     @staticmethod
     def _merge(one_tuple: tuple[str, list[str]]):
         output_file, list_files = one_tuple
         utils.logger.debug(f"Merge {output_file}")
-        utils.combine_files(files=list_files, output_file=output_file)
+        combine_files(files=list_files, output_file=output_file)
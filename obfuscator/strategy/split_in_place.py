@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 from ..lib import utils
+from ..lib.blocks import LINE_MODE, scrub_in_place
 from .abs_file_splitter import FileSplitters
 from .split_and_merge import ObfuscateSplitAndMerge
 
@@ -14,12 +15,27 @@ class ObfuscateSplitInPlace(ObfuscateSplitAndMerge):
     def __init__(self, args, name: str = "SplitInPlace"):
         super().__init__(args=args, name=name)
         self.sort_func = utils.sort_func
+        # Parts are obfuscated in place: they must be physical files
+        self.virtual_split = False
 
     def obfuscate_one(self, *args, **__):
         """Worker function: Takes a filename and obfuscate it inplace"""
         abs_file, _ = args[0]
         self._print(abs_file)
-        return utils.obfuscate_in_place(abs_file, scrubber=self.scrubber)
+        scrubber = self.file_scrubber()
+        if self.block_size == LINE_MODE and not self.binary:
+            result = utils.obfuscate_in_place(abs_file, scrubber=scrubber)
+        else:
+            result = scrub_in_place(
+                abs_file,
+                scrubber=scrubber,
+                block_size=self.block_size,
+                buffering=utils.DEFAULT_BUFFER_SIZE,
+                binary=self.binary,
+            )
+        self.check_collisions()
+        self.log_scrubber_stats(scrubber, abs_file)
+        return result
 
 
 class ObfuscateInplace(ObfuscateSplitInPlace):
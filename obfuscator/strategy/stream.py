@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import sys
+
+from ..lib import utils
+from ..lib.blocks import LINE_MODE, iter_lines, scrub_block
+from ..lib.pool_registry import registry
+from ..lib.stream import LineStream
+from .split_and_merge import ObfuscateSplitAndMerge
+
+_worker_stream = None  # Stream strategy of the current pool worker process
+
+
+def _init_stream_worker(stream):
+    """Run before the stream's pool starts: its workers inherit the strategy"""
+    global _worker_stream
+    _worker_stream = stream
+
+
+def _scrub_batch(batch):
+    """Worker function: scrub a batch on the worker's own strategy, only the lines cross process boundaries"""
+    return _worker_stream.scrub_batch(batch)
+
+
+class ObfuscateStream(ObfuscateSplitAndMerge):
+    """Obfuscate stdin into stdout: `tail -F app.log | obfuscator -i - | shipper`
+
+    Same scrubber, detectors and salt as the file strategies. Batches of lines are scrubbed on the workers pool,
+    and written in order.
+    """
+
+    def __init__(self, args, name: str = "Stream"):
+        super().__init__(args=args, name=name)
+
+    def collect_files(self):
+        """No files: lines come from stdin"""
+        return None
+
+    def pre_all(self):
+        self.customise_scrubber()
+
+    def scrub_batch(self, batch):
+        """Worker function: scrub a batch of raw lines, bytes in and out"""
+        data = b"".join(batch)
+        if not self.binary:
+            data = data.decode("utf-8", errors="surrogateescape")
+        scrubber = self.file_scrubber()
+        if self.block_size == LINE_MODE:
+            cleaned = data[:0].join(scrubber.clean(text=line) for line in iter_lines(data))
+        else:
+            cleaned = scrub_block(scrubber, data)
+        self.check_collisions()
+        return cleaned if self.binary else cleaned.encode("utf-8", errors="surrogateescape")
+
+    def _stream(self, scrub_batch):
+        stream = LineStream(
+            scrub_batch,
+            batch_lines=self.args.stream_batch_lines,
+            flush_interval=self.args.flush_interval,
+            # One batch per worker, and one being written
+            in_flight=self.args.workers + 1,
+        )
+        try:
+            stream.run(sys.stdin.buffer, sys.stdout.buffer)
+        finally:
+            utils.logger.info(f"{self}: {stream.rate()}")
+
+    def obfuscate(self):
+        if self.args.serially:
+            self._stream(self.scrub_batch)
+            return
+        # The --pool workers pool of the registry. The strategy and its scrubber reach each worker once,
+        # not with every batch
+        with registry.borrow(
+            self.pool_function, self.args.workers, purpose="stream", initializer=_init_stream_worker, initargs=(self,)
+        ) as pool:
+            self._stream(lambda batch: pool.map(_scrub_batch, [batch])[0])
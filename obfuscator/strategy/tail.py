@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import os
+
+from ..lib import utils
+from ..lib.exceptions import NoTextFilesFoundError
+from ..lib.manifest import RunManifest
+from ..lib.tail import PARTIAL_MAX, TAIL_READ_SIZE, checkpoint, plan_tail
+from .abs_file_splitter import FileSplitters
+from .stream import ObfuscateStream
+
+
+class ObfuscateTail(ObfuscateStream):
+    """Obfuscate only the bytes appended to growing files since the last run, appended to their outputs
+
+    Outputs mirror the input tree in the output folder. Checkpoints - offset, head fingerprint and the last
+    line without newline - are kept in the output folder's manifest. Rotations are followed: see plan_tail.
+    """
+
+    def __init__(self, args, name: str = "Tail"):
+        super().__init__(args=args, name=name)
+        self.manifest = RunManifest(self.args.output_folder, self.args.salt)
+        self.plans = []
+        self.moves = []
+
+    @property
+    def input_root(self):
+        if os.path.isdir(self.args.input_folder):
+            return self.args.input_folder
+        return os.path.dirname(self.args.input_folder)
+
+    def output_of(self, src_file):
+        return os.path.join(self.args.output_folder, os.path.relpath(src_file, self.input_root))
+
+    def collect_files(self):
+        if os.path.realpath(self.args.output_folder) == os.path.realpath(self.input_root):
+            raise ValueError(f"{self}: outputs are appended to, the output folder must not be the input folder")
+        utils.create_folder(self.args.output_folder)
+        self.manifest.load()
+        files = utils.get_text_files(self.args)
+        self.plans, self.moves = plan_tail(files, self.manifest.entries, self.output_of, self.args.salt)
+        self.raw_files = [plan.path for plan in self.plans]
+
+    def pre_all(self):
+        FileSplitters.pre_all(self)
+        self.customise_scrubber()
+
+    def _move_outputs(self):
+        # Through temp names: the output of a rotated file may take the place of another one's
+        staged = []
+        for output, new_output in self.moves:
+            utils.logger.info(f"{self}: rotated, move '{output}' to '{new_output}'")
+            tmp_output = f"{output}.rotating"
+            os.replace(output, tmp_output)
+            staged.append((tmp_output, new_output))
+        for tmp_output, new_output in staged:
+            utils.create_folder(os.path.dirname(new_output))
+            os.replace(tmp_output, new_output)
+
+    def tail_one(self, plan):
+        """Worker function: obfuscate a file from its plan's offset, then record its new checkpoint"""
+        self._print(plan.path)
+        utils.create_folder(os.path.dirname(plan.output))
+        offset = plan.offset
+        partial = plan.partial
+        with open(plan.path, "rb") as reader, open(plan.output, "ab" if plan.resume else "wb") as writer:
+            if plan.output_size is not None:
+                writer.truncate(plan.output_size)
+            reader.seek(offset)
+            for data in iter(lambda: reader.read(TAIL_READ_SIZE), b""):
+                offset += len(data)
+                data = partial + data
+                # Whole lines only: the last one may still be being written
+                end = data.rfind(b"\n") + 1
+                if len(data) - end > PARTIAL_MAX:
+                    end = len(data)
+                partial = data[end:]
+                if end:
+                    writer.write(self.scrub_batch([data[:end]]))
+            if plan.final and partial:
+                writer.write(self.scrub_batch([partial]))
+                partial = b""
+            writer.flush()
+            output_size = os.fstat(writer.fileno()).st_size
+        # As soon as its output is written: a failure of another file does not make the next run write it twice
+        self.manifest.record(plan.path, [plan.output], **checkpoint(plan.path, offset, partial, output_size))
+        return plan.path
+
+    def obfuscate(self):
+        self._move_outputs()
+        if not self.plans:
+            raise NoTextFilesFoundError(f"{self} No new bytes to obfuscate")
+
+        with self.borrow_pool() as pool:
+            pool.map(self.tail_one, self.plans)
+        # With the workers' records
+        self.manifest.load().compact()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+from ..lib.addresses import AddressClassifier, is_ipv4, is_ipv6
+from ..lib.segments import SegmentScanner
+
+CLASSIFIER = AddressClassifier(mac="MAC", ipv4="IP", ipv6="IPv6")
+
+
+def _addresses(text):
+    return list(CLASSIFIER.iter_addresses(text))
+
+
+def test_ipv4_success():
+    # Same cases as test_regex's IPv4Filth ones
+    cases = [
+        ("10.20.30.40", "10.20.30.40"),
+        ("10.20.30.40:8080", "10.20.30.40"),
+        ("\t10.20.32.34", "10.20.32.34"),
+        ("        10.20.32.34           ", "10.20.32.34"),
+        ("        1.2.32.34:56:78:90", "1.2.32.34"),
+        ("from 10.0.0.1.", "10.0.0.1"),
+    ]
+    for text, address in cases:
+        assert _addresses(text) == [("IP", address)], text
+
+
+def test_key_value_addresses():
+    # Keys stuck to the address, as the rg and grep regexes find them
+    cases = [
+        ("ip:10.0.0.1", ("IP", "10.0.0.1")),
+        ("ip:10.0.0.1:8080", ("IP", "10.0.0.1")),
+        ("addr:2001:db8::1", ("IPv6", "2001:db8::1")),
+        ("mac:00:1a:2b:3c:4d:5e", ("MAC", "00:1a:2b:3c:4d:5e")),
+        ("host_10.0.0.1", ("IP", "10.0.0.1")),
+        ("host.10.0.0.1", ("IP", "10.0.0.1")),
+    ]
+    for text, address in cases:
+        assert _addresses(text) == [address], text
+    assert _addresses("src=10.0.0.1,dst=fe80::1%eth0") == [("IP", "10.0.0.1"), ("IPv6", "fe80::1%eth0")]
+
+
+def test_ipv4_failure():
+    cases = ["502.1410.30.40.5.651.7.8", "10.20:30.40::56", "1.2..3.4.", "1.2.3.4port123", "1.2.3.4port 123", "1-2-3-4"]
+    for text in cases:
+        assert _addresses(text) == [], text
+
+
+def test_ipv6_and_mac():
+    text = "a 2001:db8::1 b ::ffff:10.0.0.1 c [::1]:8080 d 00:1A:2b:3c:4d:5e e fe80::1%eth0"
+    assert _addresses(text) == [
+        ("IPv6", "2001:db8::1"),
+        ("IPv6", "::ffff:10.0.0.1"),
+        ("IPv6", "::1"),
+        ("MAC", "00:1A:2b:3c:4d:5e"),
+        ("IPv6", "fe80::1%eth0"),
+    ]
+    # Times, C++ scopes and versions are not addresses
+    assert _addresses("12:30:45 std::vector 1.2.3 aa:bb:cc:dd:ee") == []
+
+
+def test_ipv6_zone_id():
+    text = "ping fe80::1%eth0. ssh [fe80::2%br-lan.10]:22 10.0.0.1%eth0 fe80::3%"
+    assert _addresses(text) == [
+        ("IPv6", "fe80::1%eth0"),
+        ("IPv6", "fe80::2%br-lan.10"),
+        ("IP", "10.0.0.1"),
+        ("IPv6", "fe80::3"),
+    ]
+
+
+def test_validators():
+    assert is_ipv4("255.0.00.1") and not is_ipv4("256.0.0.1") and not is_ipv4("1.2.3")
+    assert is_ipv6("1:2:3:4:5:6:7:8") and not is_ipv6("1:2:3:4:5:6:7:8:9") and not is_ipv6("1::2::3")
+
+
+def test_scanner_with_classifier():
+    fd, path = tempfile.mkstemp()
+    with os.fdopen(fd, "w") as f:
+        f.write("ip 10.0.0.1 mac 00:1a:2b:3c:4d:5e ipv6 2001:db8::1\n")
+    try:
+        filth_to_segment, total = SegmentScanner([CLASSIFIER]).scan(path)
+        assert list(filth_to_segment) == ["MAC", "IP", "IPv6"]
+        assert filth_to_segment["IP"] == {"10.0.0.1"}
+        assert total == 3
+    finally:
+        os.remove(path)
@@ -0,0 +1,52 @@
+from ..api import Obfuscator
+
+RECORDS = [f"connect from 10.0.{i % 7}.{i % 5} mac 00:1a:2b:3c:4d:{i % 9:02x}\n" for i in range(100)]
+
+
+def test_obfuscate_text_and_bytes():
+    with Obfuscator(salt="1234", serially=True) as obfuscator:
+        text = obfuscator.obfuscate_text(RECORDS[1])
+        assert "10.0.1.1" not in text and "00:1a:2b:3c:4d:01" not in text
+        assert text.startswith("connect from ")
+        # Same scrubber, same tokens
+        assert obfuscator.obfuscate_bytes(RECORDS[1].encode()) == text.encode()
+        assert list(obfuscator.obfuscate_lines(RECORDS[:3])) == [obfuscator.obfuscate_text(r) for r in RECORDS[:3]]
+
+
+def test_obfuscate_batch_in_order():
+    with Obfuscator(salt="1234", workers=2) as obfuscator:
+        expected = [obfuscator.obfuscate_text(record) for record in RECORDS]
+        assert obfuscator.obfuscate_batch(RECORDS) == expected
+        assert obfuscator.obfuscate_batch([r.encode() for r in RECORDS]) == [r.encode() for r in expected]
+
+
+def test_unknown_option():
+    try:
+        Obfuscator(no_such_option=1)
+    except TypeError:
+        return
+    assert False, "unknown option accepted"
+
+
+def test_option_values_are_checked():
+    # Parsed the way the command line is: types and checks included
+    with Obfuscator(serially=True, flush_interval="2.5") as obfuscator:
+        assert obfuscator.args.flush_interval == 2.5 and obfuscator.args.serially
+    for options in ({"flush_interval": -1}, {"engine": "no_such_engine"}):
+        try:
+            Obfuscator(**options)
+        except ValueError:
+            continue
+        assert False, f"invalid option accepted: {options}"
+
+
+def test_instances_of_other_salts():
+    first = Obfuscator(salt="1111", workers=2)
+    expected = first.obfuscate_batch(RECORDS)
+    with Obfuscator(salt="2222", workers=2) as second:
+        other = second.obfuscate_batch(RECORDS)
+        assert other != expected
+    # The second salt and close left the first instance as it was: same tokens, its pool still works
+    assert first.obfuscate_batch(RECORDS) == expected
+    assert [first.obfuscate_text(record) for record in RECORDS] == expected
+    first.close()
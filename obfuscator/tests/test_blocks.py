@@ -0,0 +1,131 @@
+import io
+import os
+import re
+from tempfile import mkstemp
+
+from ..lib.blocks import (
+    LINE_MODE,
+    LineCounter,
+    block_safe,
+    iter_lines,
+    scrub_block,
+    scrub_in_place,
+    scrub_stream,
+)
+
+LINES = ["ip 10.0.0.1 up\n", "\n", "password: 1234\n", "user 10.0.0.2\n", "last line 10.0.0.3"]
+
+
+class RegexScrubber:
+    """Scrubber-like: replaces every match of its detectors' regexes"""
+
+    def __init__(self, *patterns):
+        self._detectors = {
+            idx: type("Detector", (), {"filth_cls": type("Filth", (), {"regex": re.compile(pattern)})})
+            for idx, pattern in enumerate(patterns)
+        }
+
+    def clean(self, text):
+        for detector in self._detectors.values():
+            text = detector.filth_cls.regex.sub(lambda m: "{{X-%d}}" % len(m.group()), text)
+        return text
+
+
+def _scrub_lines(scrubber, lines):
+    return "".join(scrubber.clean(text=line) for line in lines)
+
+
+def test_iter_lines():
+    assert list(iter_lines("".join(LINES))) == LINES
+    assert list(iter_lines("")) == []
+
+
+def test_block_safe():
+    assert block_safe(RegexScrubber(r"\d+(\.\d+){3}", r"password:\s*\d+"))
+    assert not block_safe(RegexScrubber(r"\d+", r"^user"))
+    assert not block_safe(RegexScrubber(r"(?<=\s)\d+"))
+    assert not block_safe(object())
+
+
+def test_block_safe_lookarounds():
+    # Lookarounds that may see a newline: the next or previous line in a block, nothing line by line
+    for pattern in [r"\d+(?=\s*\d)", r"user(?!\s*foo)", r"(?s)a(?=.)", r"a(?=[^b])", r"a(?=\D)", r"(?<=\W)a"]:
+        assert not block_safe(RegexScrubber(pattern)), pattern
+    # Those that cannot match a newline see the same either way
+    for pattern in [r"foo(?=bar)", r"a(?=.)", r"a(?![\d.])", r"(?<!\S)\d+", r"(?<=[a-z])\d", r"(?<=ab|c:)d"]:
+        assert block_safe(RegexScrubber(pattern)), pattern
+
+
+def test_lookahead_sees_next_line_in_block():
+    # \s* of a lookahead crosses the newline in a block: why such a regex is scrubbed line by line
+    scrubber = RegexScrubber(r"up(?=\s*\d)")
+    lines = ["link up\n", "10 ms\n"]
+    assert not block_safe(scrubber)
+    assert scrubber.clean(text="".join(lines)) != _scrub_lines(scrubber, lines)
+
+
+def test_scrub_block_same_as_lines():
+    scrubber = RegexScrubber(r"\d+(\.\d+){3}", r"password:\s*\d+")
+    block = "".join(LINES)
+    assert scrub_block(scrubber, block) == _scrub_lines(scrubber, LINES)
+
+
+def test_scrub_block_match_across_lines():
+    # \s* swallows the newline after "up": per line it cannot reach the next line
+    scrubber = RegexScrubber(r"up\s*\d*")
+    block = "".join(LINES)
+    assert scrub_block(scrubber, block) == _scrub_lines(scrubber, LINES)
+
+
+def test_scrub_stream_modes():
+    scrubber = RegexScrubber(r"\d+(\.\d+){3}")
+    expected = _scrub_lines(scrubber, LINES)
+    for block_size in (LINE_MODE, 1, 20, 1024):
+        writer = io.StringIO()
+        scrub_stream(scrubber, io.StringIO("".join(LINES)), writer, block_size=block_size)
+        assert writer.getvalue() == expected
+
+
+def test_scrub_stream_counter():
+    class FailingScrubber:
+        def clean(self, text):
+            if "10.0.0.3" in text:
+                raise UnicodeDecodeError("utf-8", b"", 0, 1, "bad line")
+            return text
+
+    lines = [f"line 10.0.0.{idx}\n" for idx in range(6)]
+    # Line by line: the failing line. In blocks: the first line of the failing block
+    for block_size, line in ((LINE_MODE, 3), (1, 3), (len(lines[0]) + 1, 2)):
+        counter = LineCounter()
+        try:
+            scrub_stream(FailingScrubber(), io.StringIO("".join(lines)), io.StringIO(), block_size, counter=counter)
+        except UnicodeDecodeError:
+            pass
+        assert counter.line == line, block_size
+
+
+def test_scrub_in_place():
+    scrubber = RegexScrubber(r"\d+(\.\d+){3}")
+    fd, path = mkstemp()
+    try:
+        with open(fd, "w") as f:
+            f.writelines(LINES)
+        os.chmod(path, 0o640)
+        assert scrub_in_place(path, scrubber, block_size=16) == path
+        with open(path) as f:
+            assert f.read() == _scrub_lines(scrubber, LINES)
+        assert os.stat(path).st_mode & 0o777 == 0o640
+        assert not [f for f in os.listdir(os.path.dirname(path)) if f.startswith(os.path.basename(path) + ".")]
+    finally:
+        os.remove(path)
+
+
+def test_scrub_block_bytes():
+    class BytesRegexScrubber:
+        def clean(self, text):
+            return re.sub(rb"up\s*\d*", b"{{X}}", text)
+
+    lines = [line.encode() for line in LINES]
+    block = b"".join(lines)
+    assert list(iter_lines(block)) == lines
+    assert scrub_block(BytesRegexScrubber(), block) == b"".join(BytesRegexScrubber().clean(line) for line in lines)
@@ -0,0 +1,78 @@
+import multiprocessing
+import pickle
+
+from ..lib.cache import CachedScrubber, LRUCache
+
+
+class CountingScrubber:
+    def __init__(self):
+        self.calls = 0
+
+    def clean(self, text):
+        self.calls += 1
+        return text.upper()
+
+
+def test_lru_cache_eviction_and_stats():
+    cache = LRUCache(maxsize=2)
+    assert cache.get("a", lambda: 1) == 1
+    assert cache.get("b", lambda: 2) == 2
+    assert cache.get("a", lambda: 0) == 1  # hit: "a" is now the most recent
+    assert cache.get("c", lambda: 3) == 3  # evicts "b"
+    assert len(cache) == 2
+    assert cache.get("b", lambda: 4) == 4
+    assert (cache.hits, cache.misses) == (1, 4)
+    assert cache.stats() == "1 hits, 4 misses (20%), 2/2 entries"
+
+
+def test_lru_cache_disabled():
+    cache = LRUCache(maxsize=0)
+    assert cache.get("a", lambda: 1) == 1
+    assert cache.get("a", lambda: 2) == 2
+    assert len(cache) == 0
+
+
+def _get_a(cache):
+    cache.get("a", lambda: 1)
+    return cache.hits
+
+
+def test_lru_cache_pickles_as_handle():
+    cache = LRUCache(maxsize=8)
+    assert pickle.loads(pickle.dumps(cache)) is cache
+    # A worker keeps its cache of the handle across tasks
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        assert pool.map(_get_a, [cache] * 3, chunksize=1) == [0, 1, 2]
+        # Another cache, e.g. of another salt's scrubber, is another one in the worker too
+        assert pool.map(_get_a, [LRUCache(maxsize=8)], chunksize=1) == [0]
+    assert len(cache) == 0
+
+
+def test_cached_scrubber():
+    scrubber = CountingScrubber()
+    cached = CachedScrubber(scrubber, maxsize=4, max_length=10)
+    for _ in range(3):
+        assert cached.clean(text="line\n") == "LINE\n"
+    assert scrubber.calls == 1
+    assert cached.lines.hits == 2
+
+    # Long texts bypass the cache
+    assert cached.clean(text="a long block\n") == "A LONG BLOCK\n"
+    assert cached.clean(text="a long block\n") == "A LONG BLOCK\n"
+    assert scrubber.calls == 3
+
+
+def test_lru_cache_get_many():
+    cache = LRUCache(maxsize=3)
+    cache.get("a", lambda: "A")
+    computed = []
+
+    def compute_many(keys):
+        computed.append(keys)
+        return [key.upper() for key in keys]
+
+    assert cache.get_many(["a", "b", "b", "c"], compute_many) == ["A", "B", "B", "C"]
+    assert computed == [["b", "c"]]
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert cache.get_many(["d"], compute_many) == ["D"]
+    assert len(cache) == 3
@@ -0,0 +1,105 @@
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+import time
+
+from ..daemon import DONE, ERROR, STARTED, ObfuscatorDaemon, submit_job
+from ..lib.enums import RCEnum, StrategyTypesEnum
+from ..main import get_args_parser
+
+dir_name = os.path.dirname(__file__)
+log_file = os.path.join(dir_name, "logs_dir", "ip_addr.log")
+
+
+def _start_daemon(folder, *options):
+    socket_path = os.path.join(folder, "obfuscator.sock")
+    args = get_args_parser().parse_args(["--daemon", socket_path, "--salt", "1234", *(options or ["--serially"])])
+    threading.Thread(target=ObfuscatorDaemon(args, socket_path).serve_forever, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        # Listening: a stale socket file may be there before the daemon is
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            if not sock.connect_ex(socket_path):
+                break
+        time.sleep(0.01)
+    return socket_path
+
+
+def test_daemon_runs_jobs():
+    folder = tempfile.mkdtemp()
+    try:
+        socket_path = _start_daemon(folder)
+        events = []
+        for idx in range(2):
+            # The second job reuses the warm daemon
+            src_file = os.path.join(folder, f"ip_addr_{idx}.log")
+            shutil.copyfile(log_file, src_file)
+            request = {"input": src_file, "strategy": StrategyTypesEnum.IN_PLACE.value, "salt": "1234"}
+            assert submit_job(socket_path, request, on_event=events.append) == RCEnum.SUCCESS.value
+            with open(log_file) as original, open(src_file) as obfuscated:
+                assert original.read() != obfuscated.read()
+        assert [e["event"] for e in events].count(STARTED) == 2
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+
+        events = []
+        assert submit_job(socket_path, {"input": "/_no_such_folder"}, on_event=events.append) != 0
+        assert [e["event"] for e in events] == [ERROR, DONE]
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_daemon_jobs_of_other_salts():
+    folder = tempfile.mkdtemp()
+    try:
+        # Warm workers pools: a job must not get the tokens of the previous job's salt
+        socket_path = _start_daemon(folder, "--workers", "2")
+        outputs = []
+        for salt in ("1111", "2222", "1111"):
+            src_file = os.path.join(folder, f"ip_addr_{len(outputs)}.log")
+            shutil.copyfile(log_file, src_file)
+            request = {"input": src_file, "strategy": StrategyTypesEnum.IN_PLACE.value, "salt": salt}
+            assert submit_job(socket_path, request, on_event=lambda _: None) == RCEnum.SUCCESS.value
+            with open(src_file) as obfuscated:
+                outputs.append(obfuscated.read())
+        assert outputs[0] != outputs[1]
+        assert outputs[0] == outputs[2]
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_daemon_socket_path_in_use():
+    folder = tempfile.mkdtemp()
+    try:
+        socket_path = os.path.join(folder, "obfuscator.sock")
+        daemon = ObfuscatorDaemon(get_args_parser().parse_args(["--daemon", socket_path, "--serially"]), socket_path)
+        # Not a socket: left as it is
+        with open(socket_path, "w") as f:
+            f.write("data")
+        try:
+            daemon.serve_forever()
+            raise AssertionError("served on a regular file")
+        except FileExistsError:
+            pass
+        assert os.path.isfile(socket_path)
+        os.remove(socket_path)
+
+        # A live daemon's socket: left as it is
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as live:
+            live.bind(socket_path)
+            live.listen(1)
+            try:
+                daemon.serve_forever()
+                raise AssertionError("served on a live socket")
+            except FileExistsError:
+                pass
+            assert stat.S_ISSOCK(os.lstat(socket_path).st_mode)
+
+        # The stale socket of a dead daemon: replaced
+        assert _start_daemon(folder) == socket_path
+        request = {"input": "/_no_such_folder"}
+        assert submit_job(socket_path, request, on_event=lambda _: None) == RCEnum.FAILURE.value
+    finally:
+        shutil.rmtree(folder)
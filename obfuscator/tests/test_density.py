@@ -0,0 +1,53 @@
+import os
+from tempfile import mkstemp
+
+from ..lib.density import DensityEstimator
+from ..lib.segments import SegmentScanner
+
+
+class Filth:
+    def __init__(self, placeholder, regex):
+        self.placeholder = placeholder
+        self.regex = regex
+
+    def __repr__(self):
+        return self.placeholder
+
+
+IPV4 = Filth("IPV4", r"(25[0-5]|2[0-4][0-9]|[0-1]?[0-9]?[0-9])(\.(25[0-5]|2[0-4][0-9]|[0-1]?[0-9]?[0-9])){3}")
+
+
+def _write(lines):
+    fd, path = mkstemp()
+    with os.fdopen(fd, "w") as f:
+        f.writelines(lines)
+    return path
+
+
+def test_repeated_segments_are_not_extrapolated():
+    path = _write(f"connect from 10.0.0.{i % 3}\n" for i in range(20000))
+    try:
+        estimator = DensityEstimator(SegmentScanner([IPV4]), samples=4, sample_size=1024)
+        assert estimator.estimate(path) == (3, 3)
+    finally:
+        os.remove(path)
+
+
+def test_new_segments_are_extrapolated():
+    path = _write(f"connect from 10.{i // 65536}.{i // 256 % 256}.{i % 256}\n" for i in range(20000))
+    try:
+        sampled, estimate = DensityEstimator(SegmentScanner([IPV4]), samples=4, sample_size=1024).estimate(path)
+        assert 100 < sampled < 250
+        # Every line has a new ip
+        assert 15000 < estimate < 25000
+    finally:
+        os.remove(path)
+
+
+def test_small_files_are_not_sampled():
+    path = _write(["10.0.0.1\n"] * 10)
+    try:
+        assert DensityEstimator(SegmentScanner([IPV4]), samples=4, sample_size=1024).estimate(path) is None
+        assert DensityEstimator(SegmentScanner([IPV4]), samples=0).estimate(path) is None
+    finally:
+        os.remove(path)
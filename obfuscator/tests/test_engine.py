@@ -0,0 +1,117 @@
+import os
+import re
+
+from scrubadub.detectors.base import RegexDetector
+from scrubadub.filth.base import RegexFilth
+
+from ..lib.detectors import ObfuscatorDetectors
+from ..lib.engine import BytesScrubber, NativeScrubber
+from ..lib.scrubber import ObfuscatorScrubber
+
+dir_name = os.path.dirname(__file__)
+logs_dir = f"{dir_name}/logs_dir"
+
+
+class WordFilth(RegexFilth):
+    type = "word"
+    regex = re.compile(r"secret\w*")
+
+
+class NumberFilth(RegexFilth):
+    type = "number"
+    regex = re.compile(r"\w*\d+")
+
+
+class WordDetector(RegexDetector):
+    filth_cls = WordFilth
+
+
+class NumberDetector(RegexDetector):
+    filth_cls = NumberFilth
+
+
+def _scrubber(detectors):
+    scrubber = ObfuscatorScrubber()
+    for name in list(scrubber._detectors):
+        scrubber.remove_detector(name)
+    for detector in detectors:
+        scrubber.add_detector(detector)
+    return scrubber
+
+
+def test_native_merges_like_scrubadub():
+    scrubber = _scrubber([WordDetector, NumberDetector])
+    native = NativeScrubber.from_scrubber(scrubber)
+    assert native is not None
+    for text in [
+        "",
+        "nothing here\n",
+        "secret and 42\n",
+        "secret42 overlaps\n",
+        "secretsecret 1 2 3 secret\n",
+        "touching:secret123secret\n",
+    ]:
+        assert native.clean(text=text) == scrubber.clean(text=text), text
+    # Lone filths' tokens are rendered once per segment
+    assert native.clean(text="secret and 42\n") == scrubber.clean(text="secret and 42\n")
+    assert native.tokens.hits >= 2
+
+
+def test_native_unsupported_detector():
+    class CustomDetector(RegexDetector):
+        filth_cls = WordFilth
+
+        def iter_filth(self, text):
+            return iter(())
+
+    assert NativeScrubber.from_scrubber(_scrubber([CustomDetector])) is None
+
+
+def test_native_parity_logs_dir():
+    for detector in ObfuscatorDetectors:
+        detector.filth_cls.salt = "1234"
+    scrubber = _scrubber(ObfuscatorDetectors)
+    native = NativeScrubber.from_scrubber(scrubber)
+    assert native is not None
+
+    for root, _, files in os.walk(logs_dir):
+        for name in files:
+            with open(os.path.join(root, name), errors="surrogateescape") as f:
+                for line in f:
+                    assert native.clean(text=line) == scrubber.clean(text=line), line
+
+
+def test_bytes_scrubber_same_tokens():
+    scrubber = _scrubber([WordDetector, NumberDetector])
+    for wrapped in (scrubber, NativeScrubber.from_scrubber(scrubber)):
+        bytes_scrubber = BytesScrubber(wrapped)
+        assert bytes_scrubber.native is not None
+        for text in ["nothing here\n", "secret42 and 7\n", "café secret 1\n"]:
+            data = text.encode("utf-8")
+            assert bytes_scrubber.clean(text=data) == scrubber.clean(text=text).encode("utf-8"), text
+
+
+def test_bytes_scrubber_invalid_utf8():
+    bytes_scrubber = BytesScrubber(_scrubber([WordDetector, NumberDetector]))
+    data = b"\xff\xfe secret 42 \xc3\n"
+    cleaned = bytes_scrubber.clean(text=data)
+    assert cleaned.startswith(b"\xff\xfe ")
+    assert cleaned.endswith(b" \xc3\n")
+    assert b"secret" not in cleaned and b"42" not in cleaned
+
+
+def test_bytes_scrubber_str_only_spaces():
+    class KeyFilth(RegexFilth):
+        type = "key"
+        regex = re.compile(r"key\s+\d+")
+
+    class KeyDetector(RegexDetector):
+        filth_cls = KeyFilth
+
+    scrubber = _scrubber([KeyDetector, NumberDetector])
+    bytes_scrubber = BytesScrubber(scrubber)
+    assert bytes_scrubber.native is not None
+    # str \s matches the ASCII separators \x1c-\x1f, bytes \s does not
+    for separator in "\x1c\x1d\x1e\x1f ":
+        text = f"key{separator}42\n"
+        assert bytes_scrubber.clean(text=text.encode()) == scrubber.clean(text=text).encode(), repr(text)
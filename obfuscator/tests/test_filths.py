@@ -0,0 +1,82 @@
+import pickle
+import re
+
+from ..lib import utils
+from ..lib.filths import check_collisions, configured_filth
+from ..lib.hashing import HASH_BLAKE2B, HASH_LEGACY, CollisionRegistry, Hasher
+from ..strategy.low_level import LowLevelFilth
+
+
+class Filth:
+    salt = None
+    regex = re.compile("a")
+
+
+class IPFilth:
+    """Renders tokens the way the detectors' filths do"""
+
+    salt = None
+    regex = re.compile(r"\d+\.\d+\.\d+\.\d+")
+
+    def __init__(self, text):
+        self.text = text
+
+    def replace_with(self, **kwargs):
+        if kwargs:
+            return "{{%s}}" % kwargs
+        return "{{IPV4-" + utils.hash_string(f"{self.salt}{self.text}") + "}}"
+
+
+def test_configured_filth():
+    first = configured_filth(Filth, "s1")
+    second = configured_filth(Filth, "s2", re.compile("b", re.IGNORECASE))
+    assert (first.salt, first.regex.pattern) == ("s1", "a")
+    assert (second.salt, second.regex.pattern) == ("s2", "b")
+    # The class itself is left as it is
+    assert Filth.salt is None and Filth.regex.pattern == "a"
+    assert issubclass(second, Filth) and configured_filth(second, "s2", second.regex) is second
+    assert configured_filth(Filth, "s1") is first
+
+
+def test_configured_filth_pickles_its_configuration():
+    configured = configured_filth(Filth, "s3", re.compile("c"))
+    # Its configuration, not a reference by name that a worker would resolve to another class
+    assert b"s3" in pickle.dumps(configured)
+    assert pickle.loads(pickle.dumps(configured)) is configured
+
+
+def test_configured_filth_hasher():
+    hasher = Hasher(HASH_BLAKE2B, salt="1234", width=12)
+    configured = configured_filth(IPFilth, "1234", hasher=hasher)
+    low_level = LowLevelFilth(salt="1234", placeholder="IPV4", regex=IPFilth.regex.pattern, hasher=hasher)
+    # A segment gets the same token from both strategies of a hybrid
+    assert configured("10.0.0.1").replace_with() == low_level.replace_with("10.0.0.1")
+    assert configured("10.0.0.1").replace_with() != configured("10.0.0.2").replace_with()
+    # Equal hashers, same class: a worker builds it once
+    assert configured_filth(IPFilth, "1234", hasher=pickle.loads(pickle.dumps(hasher))) is configured
+    # Legacy tokens are the filth's own
+    legacy = configured_filth(IPFilth, "1234", hasher=Hasher(HASH_LEGACY))
+    assert legacy("10.0.0.1").replace_with() == "{{IPV4-" + utils.hash_string("123410.0.0.1") + "}}"
+    assert legacy("10.0.0.1").replace_with(replace_with="type") == "{{{'replace_with': 'type'}}}"
+
+
+def test_configured_filth_registry():
+    registry = CollisionRegistry(16)
+    configured = configured_filth(IPFilth, "5678", hasher=Hasher(HASH_BLAKE2B, salt="5678", width=1), registry=registry)
+    tokens = {configured(f"10.0.0.{idx}").replace_with() for idx in range(40)}
+    assert registry.stats().startswith("0 collisions")
+    check_collisions([configured, Filth])
+    # 40 segments, at most 16 tokens of 1 hex char
+    assert len(tokens) <= 16 and registry.collisions == 40 - len(tokens)
+    assert configured.new_tokens == []
+
+
+def test_configured_filth_token_cache():
+    configured = configured_filth(IPFilth, "9999", cache_size=2)
+    texts = ["10.0.0.1", "10.0.0.1", "10.0.0.2", "10.0.0.1"]
+    tokens = [configured(text).replace_with() for text in texts]
+    assert tokens == [IPFilth.replace_with(configured(text)) for text in texts]
+    assert (configured.tokens.hits, configured.tokens.misses) == (2, 2)
+    # Its size is part of its configuration, in the workers too
+    assert pickle.loads(pickle.dumps(configured)).tokens.maxsize == 2
+    assert configured_filth(IPFilth, "9999").tokens.maxsize == 0
@@ -0,0 +1,70 @@
+import multiprocessing
+import pickle
+
+from ..lib import utils
+from ..lib.hashing import HASH_BLAKE2B, HASH_LEGACY, CollisionRegistry, Hasher
+from ..lib.shared import shared_collision_registry
+
+utils.init_logger()
+
+
+def test_blake2b_keyed_width():
+    hasher = Hasher(HASH_BLAKE2B, salt="1234", width=8)
+    token_hash = hasher.hash("10.0.0.1")
+    assert len(token_hash) == 8
+    assert token_hash == hasher.hash("10.0.0.1")
+    assert token_hash != Hasher(HASH_BLAKE2B, salt="4321", width=8).hash("10.0.0.1")
+    assert len(Hasher(HASH_BLAKE2B, salt="1234", width=5).hash("10.0.0.1")) == 5
+    assert len(Hasher(HASH_BLAKE2B, salt="x" * 100, width=5).hash("10.0.0.1")) == 5
+
+
+def test_hash_many_same_as_hash():
+    for hasher in (Hasher(HASH_BLAKE2B, salt="1234", width=12), Hasher(HASH_LEGACY)):
+        texts = ["10.0.0.1", "/var/log", "", "10.0.0.1"]
+        assert hasher.hash_many(texts) == [hasher.hash(text) for text in texts]
+
+
+def test_hasher_pickles():
+    hasher = Hasher(HASH_BLAKE2B, salt="1234", width=6)
+    assert pickle.loads(pickle.dumps(hasher)).hash("a") == hasher.hash("a")
+
+
+def test_hasher_bad_arguments():
+    for kwargs in ({"algorithm": "md4"}, {"algorithm": HASH_BLAKE2B, "width": 0}, {"width": 1000}):
+        try:
+            Hasher(**kwargs)
+        except ValueError:
+            pass
+        else:
+            assert False, kwargs
+
+
+def test_collision_registry():
+    registry = CollisionRegistry(max_entries=2)
+    assert registry.add("{{IP-1}}", "10.0.0.1")
+    assert registry.add("{{IP-1}}", "10.0.0.1")
+    assert not registry.add("{{IP-1}}", "10.0.0.2")
+    assert registry.add("{{IP-2}}", "10.0.0.3")
+    # Full: new tokens are not tracked
+    assert registry.add("{{IP-3}}", "10.0.0.4")
+    assert (registry.collisions, registry.untracked) == (1, 1)
+    assert registry.stats() == "1 collisions, 2 tokens tracked, 1 untracked"
+    assert registry.add_many([("{{IP-2}}", "10.0.0.3"), ("{{IP-2}}", "10.0.0.5"), ("{{IP-1}}", "x")]) == [
+        "{{IP-2}}",
+        "{{IP-1}}",
+    ]
+
+
+def _add_many(registry_and_pairs):
+    registry, pairs = registry_and_pairs
+    return registry.add_many(pairs)
+
+
+def test_shared_collision_registry():
+    registry = shared_collision_registry(max_entries=10)
+    # Same token for segments of two files, on two workers
+    tasks = [(registry, [("{{IP-1}}", "10.0.0.1")]), (registry, [("{{IP-1}}", "10.0.0.2")])]
+    with multiprocessing.get_context().Pool(2) as pool:
+        collisions = pool.map(_add_many, tasks, chunksize=1)
+    assert sorted(collisions) == [[], ["{{IP-1}}"]]
+    assert registry.stats() == "1 collisions, 1 tokens tracked, 0 untracked"
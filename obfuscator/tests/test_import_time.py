@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+from ..main import OBFUSCATION_METHODS_FACTORY, STREAM_STRATEGY, load_strategy
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+IMPORT_TIME_BUDGET_US = 500_000  # Cumulative import time of obfuscator.main, generous for slow CI machines
+HEAVY_MODULES = ("scrubadub", "obfuscator.lib.detectors", "obfuscator.lib.scrubber")
+
+
+def import_times(module):
+    """Return {imported module: cumulative import time in us} of a fresh interpreter importing module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root_dir,
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_main_imports_no_strategy():
+    times = import_times("obfuscator.main")
+    assert not [name for name in times if name.startswith("obfuscator.strategy")]
+    assert not [name for name in times if name.startswith(HEAVY_MODULES)]
+    assert times["obfuscator.main"] < IMPORT_TIME_BUDGET_US
+
+
+def test_low_level_imports_no_scrubadub():
+    times = import_times("obfuscator.strategy.low_level")
+    assert not [name for name in times if name.startswith(HEAVY_MODULES)]
+
+
+def test_low_level_pre_all_imports_no_scrubadub():
+    # The regexes of the external searchers are ready without scrubadub too
+    code = (
+        "import sys, tempfile\n"
+        "from obfuscator.main import get_args_parser\n"
+        "from obfuscator.strategy.low_level import ObfuscateLowLevel\n"
+        "with tempfile.TemporaryDirectory() as folder:\n"
+        "    ObfuscateLowLevel(get_args_parser().parse_args(['-i', folder, '--serially'])).pre_all()\n"
+        f"print(sorted(name for name in sys.modules if name.startswith({HEAVY_MODULES!r})))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=root_dir, stdout=subprocess.PIPE, check=True, universal_newlines=True
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_strategies_resolve():
+    for name in OBFUSCATION_METHODS_FACTORY.values():
+        assert load_strategy(name).__name__ == name.split(":")[1]
+    assert load_strategy(STREAM_STRATEGY).__name__ == "ObfuscateStream"
@@ -25,6 +25,16 @@ def get_args():
     args.serially = True
     args.ignore_hint = None
     args.min_split_size_in_bytes = 1 * 1024 ** 2
+    args.split_mode = "copy"
+    args.block_size_in_bytes = 4 * 1024 ** 2
+    args.engine = "scrubadub"
+    args.io_mode = "text"
+    args.prefilter = True
+    args.credentials_keywords_file = None
+    args.incremental = False
+    args.line_cache_size = 1024
+    args.token_cache_size = 1024
+    args.dispatch = "largest-first"
     args.output_folder = os.path.join(obfuscate_folder, "after")
     args.input_folder = os.path.join(obfuscate_folder, "ip_addr.log")
     args.verbose = True
@@ -0,0 +1,79 @@
+import os
+import re
+from tempfile import mkstemp
+
+from ..lib import patterns
+from ..lib.detectors import CredentialFilth, FilesDirFilth
+from ..lib.keywords import (
+    CredentialsMatcher,
+    credentials_matcher,
+    credentials_regex_str,
+    keyword_group,
+    load_keywords,
+)
+
+# A credentials regex of the same shape: keyword group, separator, value
+TEMPLATE = r"(?<![\w])(user(name)?|pass(word)?)(\s*[:=]\s*|\s+)([^\s\[\]()]+)"
+TEMPLATE_KEYWORDS = ["user", "username", "pass", "password"]
+
+
+def _matcher(keywords=()):
+    return CredentialsMatcher(re.compile(TEMPLATE, re.IGNORECASE), TEMPLATE, TEMPLATE_KEYWORDS, keywords)
+
+
+def test_keyword_group():
+    start, end = keyword_group(TEMPLATE, TEMPLATE_KEYWORDS)
+    assert TEMPLATE[start:end] == "user(name)?|pass(word)?"
+    # Character classes and escapes are not groups
+    assert keyword_group(r"[(]\((a|b)\)", ["a", "b"]) == (6, 9)
+
+
+def test_builtin_keywords_unchanged():
+    matcher = credentials_matcher()
+    assert matcher.regex is CredentialFilth.regex
+    assert matcher.regex_str == CredentialFilth.regex_str
+    # Same cases as test_regex's CredentialFilth ones
+    for text in ["usernameadmin", "username-admin", "username(admin)"]:
+        assert matcher.regex.search(text) is None, text
+
+
+def test_many_keywords():
+    keywords = [f"vendor_{i}_secret" for i in range(500)] + ["Token", "token_id"]
+    matcher = _matcher(keywords)
+    text = "a VENDOR_42_secret=abc b token_id: 1 c token 2 d vendor_9_secrets=x e username: me"
+    assert [m.group() for m in matcher.regex.finditer(text)] == [
+        "VENDOR_42_secret=abc",
+        "token_id: 1",
+        "token 2",
+        "username: me",
+    ]
+    # Only the keyword group changed: the separator and value are the template's
+    assert matcher.regex.search("password [x]") is None
+    assert matcher.regex.search("user=me").group(matcher.regex.groups) == "me"
+    # One source: plain groups, for grep -E too
+    assert matcher.regex.pattern == matcher.regex_str
+    assert "(?:" not in matcher.regex_str
+
+
+def test_keywords_file():
+    fd, path = mkstemp()
+    with os.fdopen(fd, "w") as f:
+        f.write("# vendor secrets\nacme_api_key\n\n  Stripe.Secret-Key  \n")
+    try:
+        assert load_keywords(path) == ["acme_api_key", "Stripe.Secret-Key"]
+        matcher = credentials_matcher(path)
+        assert matcher.regex.search("stripe.secret-key=42").group().startswith("stripe.secret-key=42")
+        # Keywords are literals, escaped the same for Python and grep -E: no "\-"
+        assert matcher.keyword_regex.fullmatch("stripeXsecret-key") is None
+        assert r"\-" not in matcher.regex_str
+        assert set(CredentialFilth.CREDENTIALS_KEYWORDS) <= set(matcher.keywords)
+        assert credentials_regex_str(path) == matcher.regex_str
+    finally:
+        os.remove(path)
+
+
+def test_patterns_are_the_detectors():
+    assert patterns.files_dir_regex_str() == FilesDirFilth.regex_str
+    assert patterns.credentials_regex_str() == CredentialFilth.regex_str
+    assert patterns.credentials_keywords() == list(CredentialFilth.CREDENTIALS_KEYWORDS)
+    assert credentials_regex_str() == credentials_matcher().regex_str
@@ -20,6 +20,7 @@ def test_args_default():
         "ignore_hint": None,
         "measure_time": True,
         "pool_type": None,
+        "dispatch": "order",
     }
     args_cmd = f"{MINIMUM_GOOD_CMD} --log-folder {TEMP_DIR}"
     parsed_args = parser.parse_args(args_cmd.split(" "))
@@ -47,6 +48,8 @@ def test_args_must_fail():
         f"{MINIMUM_GOOD_CMD} --strategy popo",  # no such strategy
         f"{MINIMUM_GOOD_CMD} -m 0",  # invalid min_split
         f"{MINIMUM_GOOD_CMD} -m -4",  # invalid min_split
+        f"{MINIMUM_GOOD_CMD} --flush-interval -1",  # invalid flush interval
+        f"{MINIMUM_GOOD_CMD} --flush-interval nan",  # invalid flush interval
     ]:
         try:
             parser.parse_args(args.split(" "))
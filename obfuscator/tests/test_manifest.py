@@ -0,0 +1,91 @@
+import os
+import pickle
+import tempfile
+from multiprocessing import Pool
+
+from ..lib.manifest import MANIFEST_NAME, RunManifest
+from ..strategy.abs_file_splitter import AbsHybrid
+
+
+def _write(path, text):
+    with open(path, "w") as writer:
+        writer.write(text)
+
+
+def _record_many(args):
+    folder, paths = args
+    manifest = RunManifest(folder, salt="1234")
+    for path in paths:
+        manifest.record(path)
+
+
+def test_skips_unchanged_files():
+    with tempfile.TemporaryDirectory() as folder:
+        files = [os.path.join(folder, f"{idx}.log") for idx in range(3)]
+        for path in files:
+            _write(path, "ip 1.1.1.1\n")
+        manifest = RunManifest(folder, salt="1234")
+        manifest.record(files[0])
+        manifest.record(files[1], outputs=["/out/1.log"])
+
+        manifest = RunManifest(folder, salt="1234").load()
+        assert manifest.changed(files + [manifest.path, manifest.lock_path]) == [files[2]]
+        assert manifest.entries[files[1]]["outputs"] == ["/out/1.log"]
+
+        _write(files[0], "ip 1.1.1.1\nip 2.2.2.2\n")
+        assert manifest.changed(files) == [files[0], files[2]]
+        # Another salt: another obfuscation
+        assert RunManifest(folder, salt="5678").load().changed(files) == files
+
+
+def test_concurrent_records_and_compaction():
+    with tempfile.TemporaryDirectory() as folder:
+        files = [os.path.join(folder, f"{idx}.log") for idx in range(8)]
+        for path in files:
+            _write(path, "user=admin\n")
+        # Every worker records every file: 4 records per path
+        with Pool(4) as pool:
+            pool.map(_record_many, [(folder, files)] * 4)
+        os.remove(files[-1])
+
+        manifest = RunManifest(folder, salt="1234").load()
+        assert manifest.records == 4 * len(files)
+        assert not manifest.compact(min_records=64)
+        assert manifest.compact(min_records=1)
+        assert manifest.records == len(files) - 1
+        with open(os.path.join(folder, MANIFEST_NAME)) as reader:
+            assert len(reader.readlines()) == len(files) - 1
+        assert RunManifest(folder, salt="1234").load().changed(files[:-1]) == []
+
+
+def test_pickles_without_records():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "a.log")
+        _write(path, "a\n")
+        manifest = RunManifest(folder, salt="1234")
+        manifest.record(path)
+        manifest.load()
+        clone = pickle.loads(pickle.dumps(manifest))
+        assert (clone.path, clone.salt, clone.entries) == (manifest.path, "1234", {})
+
+
+class _Hybrid:
+    main_strategy = "LowLevel"
+
+    def __init__(self, folder):
+        self.manifest = RunManifest(folder, salt="1234")
+
+    def mark_done(self, src_file, outputs=None):
+        self.manifest.record(src_file, outputs)
+
+
+def test_hybrid_records_ignored_files():
+    with tempfile.TemporaryDirectory() as folder:
+        clean, dirty = os.path.join(folder, "clean.log"), os.path.join(folder, "dirty.log")
+        _write(clean, "nothing to obfuscate\n")
+        _write(dirty, "ip 1.1.1.1\n")
+        orchestrator = AbsHybrid.Orchestrator(_Hybrid(folder))
+        assert orchestrator.decide((clean, None, None)) is None
+        assert orchestrator.decide((dirty, "low_level", None)) == ("low_level", dirty, ())
+        # The ignored file is done: an incremental run does not look for segments in it again
+        assert RunManifest(folder, salt="1234").load().changed([clean, dirty]) == [dirty]
@@ -0,0 +1,54 @@
+import os
+import shutil
+from tempfile import mkdtemp
+
+from ..lib.merge import PartsMerger, combine_files
+
+
+def _make_parts(folder, num_parts=5):
+    parts = []
+    for idx in range(num_parts):
+        part = os.path.join(folder, f"part{idx}")
+        with open(part, "w") as f:
+            f.write(f"line {idx}\n" * (idx * 1000 + 1))
+        parts.append(part)
+    return parts
+
+
+def _read(*files):
+    content = []
+    for f in files:
+        with open(f) as fd:
+            content.append(fd.read())
+    return "".join(content)
+
+
+def test_combine_files():
+    folder = mkdtemp()
+    try:
+        parts = _make_parts(folder)
+        output_file = os.path.join(folder, "combined")
+        expected = _read(*parts)
+
+        combine_files(files=parts, output_file=output_file)
+        assert _read(output_file) == expected
+        assert all(os.path.exists(p) for p in parts)
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_parts_merger_streaming():
+    folder = mkdtemp()
+    try:
+        parts = _make_parts(folder)
+        output_file = os.path.join(folder, "combined")
+        expected = _read(*parts)
+
+        with PartsMerger(output_file, workers=2, remove_parts=True) as merger:
+            for part in parts:
+                merger.add(part)
+        assert _read(output_file) == expected
+        assert merger.size == len(expected)
+        assert not any(os.path.exists(p) for p in parts)
+    finally:
+        shutil.rmtree(folder)
@@ -0,0 +1,101 @@
+import multiprocessing
+import time
+
+from ..lib.pipeline import AdaptivePipeline
+from ..lib import utils
+
+utils.init_logger()
+
+
+def add_one(x):
+    return x + 1
+
+
+def slow_double(x):
+    time.sleep(0.01)
+    return x * 2
+
+
+def fail_on_eight(x):
+    if x == 8:
+        raise ValueError(x)
+    return x
+
+
+_offset = 0
+
+
+def _init_offset(offset):
+    global _offset
+    _offset = offset
+
+
+def add_offset(x):
+    return x + _offset
+
+
+_gate = None
+
+
+def _init_gate(gate):
+    global _gate
+    _gate = gate
+
+
+def gated_double(x):
+    # Bounded: a pipeline that never gets the expected widths fails the test instead of hanging it
+    _gate.wait(timeout=60)
+    return x * 2
+
+
+class GatedPipeline(AdaptivePipeline):
+    """Opens the gate once the widths are the expected ones, counts the worker processes alive at once"""
+
+    def __init__(self, *args, expected_widths, **kwargs):
+        self.gate = multiprocessing.Event()
+        super().__init__(*args, initializer=_init_gate, initargs=(self.gate,), **kwargs)
+        self.expected_widths = expected_widths
+        self.peak = 0
+
+    def _spawn(self, stage):
+        super()._spawn(stage)
+        self.peak = max(self.peak, self._live())
+
+    def _balance(self):
+        super()._balance()
+        if self.widths == self.expected_widths:
+            self.gate.set()
+
+
+def test_initial_widths():
+    assert AdaptivePipeline.initial_widths([5, 2, 8], budget=15) == [5, 2, 8]
+    assert AdaptivePipeline.initial_widths([5, 2, 8], budget=3) == [1, 1, 1]
+    widths = AdaptivePipeline.initial_widths([1, 1, 10], budget=8)
+    assert sum(widths) == 8
+    assert widths[2] == max(widths)
+
+
+def test_pipeline_results():
+    pipeline = [(add_one, 1), (slow_double, 1), (fail_on_eight, 1)]
+    results = AdaptivePipeline(pipeline, range(50), budget=4, interval=0.1)()
+    expected = [(x + 1) * 2 for x in range(50)]
+    expected[3] = None  # (3 + 1) * 2 fails
+    assert results == expected
+
+
+def test_pipeline_moves_workers_to_busy_stage():
+    stages = [(add_one, 3), (gated_double, 1)]
+    pipeline = GatedPipeline(stages, range(100), budget=4, interval=0.05, expected_widths=[0, 4])
+    results = pipeline()
+    # add_one finishes while gated_double waits: its workers move to gated_double, which only then goes on
+    assert pipeline.gate.is_set()
+    assert pipeline.widths == [0, 4]
+    assert results == [(x + 1) * 2 for x in range(100)]
+    # Retired workers count until they exited
+    assert pipeline.peak <= 4
+
+
+def test_pipeline_initializer():
+    pipeline = [(add_offset, 1), (add_offset, 1)]
+    results = AdaptivePipeline(pipeline, range(10), budget=2, interval=0.1, initializer=_init_offset, initargs=(5,))()
+    assert results == [x + 10 for x in range(10)]
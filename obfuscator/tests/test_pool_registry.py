@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+from functools import partial
+
+from ..lib.pool_registry import PoolRegistry
+from ..lib.shared import BorrowedPool, shared_pool
+
+
+class FakePool:
+    opened = []
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.closed = False
+
+    def __enter__(self):
+        FakePool.opened.append(self)
+        return self
+
+    def __exit__(self, *_):
+        self.closed = True
+
+
+def test_borrow_reuses_warm_pool():
+    registry = PoolRegistry()
+    with registry.borrow(FakePool, workers=4) as first:
+        pass
+    with registry.borrow(FakePool, workers=2) as second:
+        pass
+    assert first is second
+    assert first.workers == 4
+    assert not first.closed
+
+    with registry.borrow(FakePool, workers=2, purpose="mgmt") as mgmt:
+        assert mgmt is not first
+
+    registry.close(FakePool, purpose="mgmt")
+    assert mgmt.closed and not first.closed
+    with registry.borrow(FakePool, workers=2, purpose="mgmt") as new_mgmt:
+        assert new_mgmt is not mgmt
+
+    registry.shutdown()
+    assert first.closed and new_mgmt.closed
+    with registry.borrow(FakePool, workers=4) as third:
+        assert third is not first
+    registry.shutdown()
+
+
+def test_forked_child_gets_own_pool():
+    registry = PoolRegistry()
+    parent_pool = registry.get(FakePool, workers=4)
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if not pid:
+        child_pool = registry.get(FakePool, workers=4)
+        os.write(write_fd, b"1" if child_pool is not parent_pool else b"0")
+        registry.shutdown()
+        os._exit(0)
+    os.close(write_fd)
+    assert os.read(read_fd, 1) == b"1"
+    os.waitpid(pid, 0)
+    os.close(read_fd)
+    # The child's shutdown did not touch the parent's pool
+    assert not parent_pool.closed
+    registry.shutdown()
+    assert parent_pool.closed
+
+
+def test_resident_keeps_pools_until_forced():
+    registry = PoolRegistry()
+    registry.resident = True
+    pool = registry.get(FakePool, workers=4)
+    registry.shutdown()
+    assert not pool.closed and registry.get(FakePool, workers=4) is pool
+    registry.shutdown(force=True)
+    assert pool.closed
+
+
+def test_initializer_runs_before_the_pool():
+    registry = PoolRegistry()
+    calls = []
+
+    def initializer(value):
+        # Before the pool starts: its workers see the state
+        calls.append((value, len(FakePool.opened)))
+
+    opened = len(FakePool.opened)
+    first = registry.get(FakePool, workers=2, purpose="stream", initializer=initializer, initargs=(1,))
+    assert registry.get(FakePool, workers=2, purpose="stream", initializer=initializer, initargs=(1,)) is first
+    assert calls == [(1, opened)]
+    # Other initargs: the workers of the warm pool hold stale state
+    second = registry.get(FakePool, workers=2, purpose="stream", initializer=initializer, initargs=(2,))
+    assert second is not first and first.closed
+    assert calls == [(1, opened), (2, opened + 1)]
+    registry.shutdown()
+    assert second.closed
+
+
+class MapPool(FakePool):
+    """map without a chunksize, like some pool classes"""
+
+    calls = []
+
+    def map(self, func, items):
+        items = list(items)
+        MapPool.calls.append(len(items))
+        return [func(item) for item in items]
+
+
+def test_uniform_map():
+    registry = PoolRegistry()
+    pool = registry.get(MapPool, workers=3)
+    assert pool.map(abs, [-1, -2, -3]) == [1, 2, 3] and MapPool.calls == [3]
+    # One item at a time, results in order
+    MapPool.calls = []
+    assert pool.map(abs, range(-20, 0), chunksize=1) == list(range(20, 0, -1))
+    assert MapPool.calls == [1] * 20
+    assert pool.workers == 3 and not pool.closed
+    registry.shutdown()
+    assert pool.closed
+
+
+def worker_pid(_):
+    return os.getpid()
+
+
+def _borrow_and_map(pool_class, results):
+    # A process of its own, the way a hybrid pipeline worker borrows the run's pool
+    with PoolRegistry().borrow(pool_class, workers=2) as pool:
+        results.put(sorted(set(pool.map(worker_pid, range(8), chunksize=1))) + list(pool.imap(worker_pid, [0])))
+
+
+def test_borrowed_pool_is_the_owners():
+    with shared_pool(2) as proxy:
+        owner_pids = set(proxy.map(worker_pid, range(8), 1))
+        results = multiprocessing.Queue()
+        borrowers = [
+            multiprocessing.Process(target=_borrow_and_map, args=(partial(BorrowedPool, proxy), results))
+            for _ in range(2)
+        ]
+        for process in borrowers:
+            process.start()
+        pids = results.get(timeout=30) + results.get(timeout=30)
+        for process in borrowers:
+            process.join()
+    # No pool of their own: the borrowers' items ran on the owner's 2 workers
+    assert len(owner_pids | set(pids)) <= 2
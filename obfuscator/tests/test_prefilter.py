@@ -0,0 +1,90 @@
+import os
+import re
+from types import SimpleNamespace
+
+from ..lib.detectors import CredentialFilth, ObfuscatorDetectors
+from ..lib.filths import configured_filth
+from ..lib.prefilter import LinePrefilter, PrefilteredScrubber, detectors_prefilter, regex_cue
+
+dir_name = os.path.dirname(__file__)
+logs_dir = f"{dir_name}/logs_dir"
+
+KEYWORDS = ["password", "username"]
+TEXT = "nothing here\nip 10.0.0.1\nmac aa:bb:cc:dd:ee:ff\nplain\nPassword: 12\nfile /var/log\nlast\n"
+
+
+class NumberScrubber:
+    def __init__(self):
+        self.calls = []
+
+    def clean(self, text):
+        self.calls.append(text)
+        return re.sub(r"\d+", "N", text)
+
+
+def test_candidate_ranges():
+    prefilter = LinePrefilter(keywords=KEYWORDS)
+    ranges = prefilter.candidate_ranges(TEXT)
+    assert [TEXT[start:end] for start, end in ranges] == [
+        "ip 10.0.0.1\nmac aa:bb:cc:dd:ee:ff\n",
+        "Password: 12\nfile /var/log\n",
+    ]
+    assert prefilter.candidate_ranges("no cue at all\n") == []
+    assert prefilter.candidate_ranges("::1") == [(0, 3)]
+
+
+def test_candidate_ranges_bytes():
+    prefilter = LinePrefilter(keywords=KEYWORDS)
+    data = TEXT.encode()
+    assert prefilter.candidate_ranges(data) == prefilter.candidate_ranges(TEXT)
+    # Non-ASCII bytes are not prefiltered
+    assert prefilter.candidate_ranges("café\n".encode()) == [(0, 6)]
+
+
+def test_prefiltered_scrubber():
+    scrubber = NumberScrubber()
+    prefiltered = PrefilteredScrubber(scrubber, LinePrefilter(keywords=KEYWORDS))
+    assert prefiltered.clean(text=TEXT) == NumberScrubber().clean(TEXT)
+    assert all("nothing" not in call and "last" not in call for call in scrubber.calls)
+    assert (prefiltered.hits, prefiltered.skips) == (4, 3)
+    assert prefiltered.clean(text="no cue 123") == "no cue 123"
+    assert prefiltered.skips == 4
+    assert "4 lines scrubbed, 4 skipped (50%)" == prefiltered.stats()
+
+
+def test_prefilter_covers_detectors():
+    prefilter = LinePrefilter(keywords=CredentialFilth.CREDENTIALS_KEYWORDS)
+    for root, _, files in os.walk(logs_dir):
+        for name in files:
+            with open(os.path.join(root, name), errors="surrogateescape") as f:
+                for line in f:
+                    if any(detector.filth_cls.regex.search(line) for detector in ObfuscatorDetectors):
+                        assert prefilter.candidate_ranges(line), line
+
+
+def _detector(regex=None):
+    attrs = {} if regex is None else {"regex": re.compile(regex)}
+    return SimpleNamespace(filth_cls=type("OtherFilth", (), attrs))
+
+
+def test_regex_cue():
+    assert regex_cue(r"#\d+") == "[\\#]"
+    assert regex_cue(r"\w+@\w+") == "[@]"
+    assert regex_cue(r"[@%]\w+:\d+") == "[:]"
+    assert regex_cue(r"(ticket|issue)-\d+|TCK\.\d+") is None
+    assert regex_cue(r"secret\w+") is None
+
+
+def test_detectors_prefilter():
+    builtins = {detector.filth_cls for detector in ObfuscatorDetectors}
+    # Configured by the strategies: subclasses of the built-in filths
+    detectors = [SimpleNamespace(filth_cls=configured_filth(filth_cls, "1234")) for filth_cls in builtins]
+    text = "ticket #42\nip 10.0.0.1\nplain\n"
+    prefilter = detectors_prefilter(detectors, builtins, KEYWORDS)
+    assert [text[start:end] for start, end in prefilter.candidate_ranges(text)] == ["ip 10.0.0.1\n"]
+    # Other detectors are not prefiltered away: their own cue
+    prefilter = detectors_prefilter(detectors + [_detector(r"#\d+")], builtins, KEYWORDS)
+    assert prefilter.candidate_ranges(text) == [(0, len("ticket #42\nip 10.0.0.1\n"))]
+    # Or no prefilter at all
+    assert detectors_prefilter(detectors + [_detector(r"secret\w+")], builtins, KEYWORDS) is None
+    assert detectors_prefilter([_detector()], builtins) is None
@@ -0,0 +1,55 @@
+import os
+from tempfile import mkstemp
+
+from ..lib.pruning import DetectorStats, can_match, order_by_hit_rate, required_chars, sample_file
+
+IPV4 = r"(25[0-5]|2[0-4][0-9]|[0-1]?[0-9]?[0-9])(\.(25[0-5]|2[0-4][0-9]|[0-1]?[0-9]?[0-9])){3}"
+IPV6 = r"(([0-9a-fA-F]{1,4}:){7,7}[0-9a-fA-F]{1,4}|([0-9a-fA-F]{1,4}:){1,7}:|:((:[0-9a-fA-F]{1,4}){1,7}|:))"
+MAC = r"([a-f0-9A-F]{2}:){5}[a-f0-9A-F]{2}"
+
+
+def test_required_chars():
+    assert required_chars(IPV4) == {frozenset(".")}
+    assert required_chars(IPV6) == {frozenset(":")}
+    assert required_chars(MAC) == {frozenset(":")}
+    assert required_chars(r"(/[\w.-]+)+/?") == {frozenset("/")}
+    assert required_chars(r"[0-9a-f]*[:.][0-9a-f:.]*") == {frozenset(":.")}
+    # Letters may match in another case, optional parts are not sure
+    assert required_chars(r"password\s*[:=\s]\s*\S+") == frozenset()
+    assert required_chars(r"a(:)?b") == frozenset()
+
+
+def test_can_match():
+    assert can_match(required_chars(MAC), "mac 00:11:22:33:44:55")
+    assert not can_match(required_chars(MAC), "ip 10.0.0.1")
+    assert can_match(required_chars(IPV4), b"ip 10.0.0.1")
+    assert can_match(frozenset(), "anything")
+
+
+def test_sample_file():
+    fd, path = mkstemp()
+    with os.fdopen(fd, "w") as f:
+        f.write("10.0.0.1\n" * 100 + "path /var\n")
+    try:
+        sample, met = sample_file(path, [required_chars(IPV4), required_chars(r"/\w+"), {frozenset(":")}], 64)
+        assert sample == b"10.0.0.1\n" * 7 + b"1"
+        # The path is beyond the sample: found by reading on
+        assert met == [True, True, False]
+    finally:
+        os.remove(path)
+
+
+def test_order_by_hit_rate():
+    groups = [["FILE-DIR", "CREDENTIALS", "MAC"], ["IP", "IPv6"]]
+    hits = {"MAC": 3, "IP": 1, "IPv6": 1, "CREDENTIALS": 3}
+    costs = {"IPv6": 100, "IP": 10, "CREDENTIALS": 5, "MAC": 2}
+    assert order_by_hit_rate(groups, hits, costs) == [["MAC", "CREDENTIALS", "FILE-DIR"], ["IP", "IPv6"]]
+
+
+def test_detector_stats():
+    stats, other = DetectorStats(), DetectorStats()
+    stats.add("IP", hits=2, seconds=0.5)
+    other.add("IP", hits=1, skips=1)
+    other.add("MAC", skips=3)
+    stats.update(other)
+    assert stats.report() == "IP: 3 hits, 1 skips, 0.500s, MAC: 0 hits, 3 skips, 0.000s"
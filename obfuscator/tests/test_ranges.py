@@ -0,0 +1,53 @@
+import os
+from tempfile import mkstemp
+
+from ..lib.ranges import open_range, split_ranges
+
+dir_name = os.path.dirname(__file__)
+ip_addr_log = f"{dir_name}/logs_dir/ip_addr.log"
+
+
+def test_split_ranges_newline_boundaries():
+    num_parts = 4
+    ranges = split_ranges(ip_addr_log, num_parts=num_parts)
+    assert len(ranges) == num_parts
+    assert [r.index for r in ranges] == list(range(num_parts))
+    assert ranges[0].start == 0
+    assert ranges[-1].end == os.path.getsize(ip_addr_log)
+
+    with open(ip_addr_log, "rb") as f:
+        content = f.read()
+    for prev, curr in zip(ranges, ranges[1:]):
+        assert prev.end == curr.start
+        assert content[curr.start - 1 : curr.start] == b"\n"
+
+
+def test_open_range_content():
+    ranges = split_ranges(ip_addr_log, num_parts=3)
+    parts = []
+    for file_range in ranges:
+        with open_range(file_range) as reader:
+            parts.append(reader.read())
+
+    with open(ip_addr_log) as f:
+        assert "".join(parts) == f.read()
+
+    with open_range(ranges[1], binary=True) as reader, open(ip_addr_log, "rb") as f:
+        f.seek(ranges[1].start)
+        assert reader.read() == f.read(ranges[1].size)
+
+
+def test_split_ranges_small_files():
+    fd, path = mkstemp()
+    try:
+        with open(fd, "w") as f:
+            f.write("one line without newline")
+        assert len(split_ranges(path, num_parts=4)) == 1
+
+        with open(path, "w"):
+            pass
+        (file_range,) = split_ranges(path, num_parts=4)
+        with open_range(file_range) as reader:
+            assert reader.read() == ""
+    finally:
+        os.remove(path)
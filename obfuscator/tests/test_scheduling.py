@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+from tempfile import mkstemp
+
+from ..lib.scheduling import MAX_SEGMENTS_PER_PASS, file_cost, largest_first, run_pipelined, segments_per_pass
+
+
+def test_run_pipelined_window():
+    lock = threading.Lock()
+    in_flight = []
+    done = []
+
+    def process(item):
+        with lock:
+            in_flight.append(item)
+            assert len(in_flight) <= 3
+        time.sleep(0.01)
+        with lock:
+            in_flight.remove(item)
+            done.append(item)
+
+    run_pipelined(process, range(10), window=3)
+    assert sorted(done) == list(range(10))
+
+
+def test_run_pipelined_raises():
+    def process(item):
+        if item == 2:
+            raise ValueError(item)
+
+    try:
+        run_pipelined(process, range(5), window=2)
+    except ValueError as e:
+        assert e.args == (2,)
+    else:
+        assert False, "ValueError not raised"
+
+
+def test_largest_first():
+    sizes = {"small": 10, "big": 1000, "medium": 100}
+    assert largest_first(sizes, cost=sizes.get) == ["big", "medium", "small"]
+
+
+def test_file_cost_segments():
+    fd, path = mkstemp()
+    try:
+        with open(fd, "w") as f:
+            f.write("x" * 100)
+        assert file_cost(path) == 100
+        # A single pass replacer: segments cost nothing more
+        assert file_cost(path, segments=1000) == 100
+        assert file_cost(path, segments=MAX_SEGMENTS_PER_PASS, per_pass=MAX_SEGMENTS_PER_PASS) == 100
+        assert file_cost(path, segments=MAX_SEGMENTS_PER_PASS + 1, per_pass=MAX_SEGMENTS_PER_PASS) == 200
+        assert file_cost(path, segments=11, per_pass=segments_per_pass(50)) == 200
+        assert file_cost(path + ".missing") == 0
+    finally:
+        os.remove(path)
+
+
+
+def test_segments_per_pass():
+    assert segments_per_pass(200) == 40
+    assert segments_per_pass(1000) == MAX_SEGMENTS_PER_PASS
+    assert segments_per_pass(1) == 1
@@ -0,0 +1,94 @@
+import os
+import re
+from tempfile import mkstemp
+
+from ..lib.pruning import DetectorStats
+from ..lib.segments import SegmentReplacer, SegmentScanner
+from ..lib.trie import trie_regex
+
+
+class Filth:
+    def __init__(self, placeholder, regex):
+        self.placeholder = placeholder
+        self.regex = regex
+
+    def __repr__(self):
+        return self.placeholder
+
+
+FILE_DIR = Filth("FILE-DIR", r"(/[\w.-]+)+/?")
+IPV4 = Filth("IPV4", r"(25[0-5]|2[0-4][0-9]|[0-1]?[0-9]?[0-9])(\.(25[0-5]|2[0-4][0-9]|[0-1]?[0-9]?[0-9])){3}")
+CREDENTIALS = Filth("CREDENTIALS", r"password\s*[:=\s]\s*\S+")
+
+CONTENT = """\
+connect 10.0.0.1 from /var/log/10.0.0.2
+connect 10.0.0.1 again
+PASSWORD: 1234
+password
+secret
+"""
+
+
+def _write(content):
+    fd, path = mkstemp(text=True)
+    with open(fd, "w") as f:
+        f.write(content)
+    return path
+
+
+def test_scan_single_pass():
+    path = _write(CONTENT)
+    try:
+        scanner = SegmentScanner([FILE_DIR, CREDENTIALS, IPV4])
+        filth_to_segment, total = scanner.scan(path)
+        assert filth_to_segment[FILE_DIR] == {"/var/log/10.0.0.2"}
+        assert filth_to_segment[IPV4] == {"10.0.0.1"}
+        # case-insensitive, but never across lines
+        assert filth_to_segment[CREDENTIALS] == {"PASSWORD: 1234"}
+        assert total == 3
+    finally:
+        os.remove(path)
+
+
+def test_scan_skips_filths_that_cannot_match():
+    path = _write("connect 10.0.0.1\npassword: 1\n")
+    stats = DetectorStats()
+    try:
+        filth_to_segment, _ = SegmentScanner([FILE_DIR, CREDENTIALS, IPV4]).scan(path, stats=stats)
+        assert filth_to_segment == {CREDENTIALS: {"password: 1"}, IPV4: {"10.0.0.1"}}
+        # No "/" in the file
+        assert dict(stats.skips) == {"FILE-DIR": 1, "CREDENTIALS": 0, "IPV4": 0}
+        assert dict(stats.hits) == {"FILE-DIR": 0, "CREDENTIALS": 1, "IPV4": 1}
+    finally:
+        os.remove(path)
+
+
+def test_scan_limit():
+    path = _write("".join(f"10.0.0.{i}\n" for i in range(100)))
+    try:
+        _, total = SegmentScanner([IPV4]).scan(path, limit=10)
+        assert total == 10
+    finally:
+        os.remove(path)
+
+
+class TokenFilth(Filth):
+    def replace_with(self, text):
+        return "{{%s-%s}}" % (self.placeholder, len(text))
+
+
+def test_trie_regex_longest_match():
+    regex = re.compile(trie_regex(["10.0.0.1", "10.0.0.10", "10.0.0.1/8", "a.b"]))
+    assert regex.findall("x 10.0.0.10 10.0.0.1/8 10.0.0.1 axb a.b") == ["10.0.0.10", "10.0.0.1/8", "10.0.0.1", "a.b"]
+
+
+def test_replace_file():
+    path = _write("from 10.0.0.1/8 to 10.0.0.10\r\nfrom 10.0.0.1\n")
+    file_dir, ipv4 = TokenFilth("FILE-DIR", ""), TokenFilth("IPV4", "")
+    try:
+        replacer = SegmentReplacer({file_dir: ["10.0.0.1/8"], ipv4: ["10.0.0.10", "10.0.0.1"]})
+        replacer.replace_file(path)
+        with open(path, newline="") as f:
+            assert f.read() == "from {{FILE-DIR-10}} to {{IPV4-9}}\r\nfrom {{IPV4-8}}\n"
+    finally:
+        os.remove(path)
@@ -0,0 +1,87 @@
+import io
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from ..lib.stream import LineStream, logs_to_stderr
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _upper(batch):
+    # Out of order completion: the output must keep the input order
+    time.sleep(random.random() / 100)
+    return b"".join(batch).upper()
+
+
+def test_stream_keeps_order():
+    data = b"".join(b"line %d\n" % i for i in range(1000)) + b"no newline"
+    writer = io.BytesIO()
+    stream = LineStream(_upper, batch_lines=7, flush_interval=1, in_flight=4)
+    assert stream.run(io.BytesIO(data), writer) == 1001
+    assert writer.getvalue() == data.upper()
+    assert stream.rate().startswith("1001 lines")
+
+
+def test_stream_batches_are_bounded():
+    sizes = []
+
+    def scrub(batch):
+        sizes.append(len(batch))
+        return b"".join(batch)
+
+    LineStream(scrub, batch_lines=10, flush_interval=1, in_flight=1).run(io.BytesIO(b"x\n" * 95), io.BytesIO())
+    assert sum(sizes) == 95 and max(sizes) == 10
+
+
+def test_stream_flushes_quiet_input():
+    read_fd, write_fd = os.pipe()
+    reader, source = os.fdopen(read_fd, "rb"), os.fdopen(write_fd, "wb")
+    writer = io.BytesIO()
+    stream = LineStream(_upper, batch_lines=100, flush_interval=0.05)
+    thread = threading.Thread(target=stream.run, args=(reader, writer))
+    thread.start()
+    try:
+        source.write(b"first\n")
+        source.flush()
+        # The batch is far from full, but its line is written once flush_interval passed
+        deadline = time.monotonic() + 5
+        while not writer.getvalue() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer.getvalue() == b"FIRST\n"
+    finally:
+        source.close()
+        thread.join()
+        reader.close()
+
+
+def test_logs_to_stderr():
+    logger = logging.getLogger("test_logs_to_stderr")
+    handler = logging.StreamHandler(sys.stdout)
+    logger.addHandler(handler)
+    try:
+        logs_to_stderr(logger)
+        assert handler.stream is sys.stderr
+    finally:
+        logger.removeHandler(handler)
+
+
+def test_stdin_to_stdout_without_logs():
+    lines = [f"connect from 10.0.{i % 7}.{i % 5}\n" for i in range(500)]
+    result = subprocess.run(
+        [sys.executable, "-m", "obfuscator.main", "-i", "-", "--workers", "2"],
+        cwd=root_dir,
+        input="".join(lines).encode(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    # Only the obfuscated lines on stdout, in order: logs went to stderr from the start
+    output = result.stdout.decode().splitlines()
+    assert len(output) == len(lines)
+    assert all(line.startswith("connect from ") and "10.0." not in line for line in output)
+    assert result.stderr
@@ -0,0 +1,166 @@
+import os
+import tempfile
+
+from ..lib.enums import RCEnum
+from ..lib.manifest import RunManifest
+from ..lib.tail import checkpoint, plan_tail
+from ..main import get_args_parser
+from ..strategy.tail import ObfuscateTail
+
+LINES = [f"connect from 10.0.{i % 7}.{i % 5} user=admin{i}\n".encode() for i in range(60)]
+
+
+def _append(path, data):
+    with open(path, "ab") as writer:
+        writer.write(data)
+
+
+def _plan(folder, files):
+    manifest = RunManifest(os.path.join(folder, "out"), salt="1234").load()
+    plans, moves = plan_tail(
+        files, manifest.entries, lambda path: os.path.join(folder, "out", os.path.basename(path)), salt="1234"
+    )
+    return {plan.path: plan for plan in plans}, moves
+
+
+def _done(folder, path, offset, partial=b""):
+    """Record path as obfuscated up to offset, like a run would"""
+    output = os.path.join(folder, "out", os.path.basename(path))
+    _append(output, b"")
+    RunManifest(os.path.join(folder, "out"), salt="1234").record(path, [output], **checkpoint(path, offset, partial))
+
+
+def test_resumes_appended_bytes():
+    with tempfile.TemporaryDirectory() as folder:
+        os.mkdir(os.path.join(folder, "out"))
+        log = os.path.join(folder, "app.log")
+        _append(log, b"ip 1.1.1.1\nip 2.2")
+        plans, _ = _plan(folder, [log])
+        assert (plans[log].offset, plans[log].resume) == (0, False)
+
+        _done(folder, log, offset=17, partial=b"ip 2.2")
+        assert _plan(folder, [log])[0] == {}
+
+        _append(log, b".2.2\n")
+        plan = _plan(folder, [log])[0][log]
+        assert (plan.offset, plan.partial, plan.resume, plan.final) == (17, b"ip 2.2", True, False)
+
+
+def test_truncated_file_starts_over():
+    with tempfile.TemporaryDirectory() as folder:
+        os.mkdir(os.path.join(folder, "out"))
+        log = os.path.join(folder, "app.log")
+        _append(log, b"ip 1.1.1.1\n")
+        _done(folder, log, offset=11)
+        # copytruncate: same inode, new content
+        with open(log, "wb") as writer:
+            writer.write(b"user=admin\n" * 3)
+        plan = _plan(folder, [log])[0][log]
+        assert (plan.offset, plan.resume) == (0, False)
+
+
+def test_renamed_file_finishes_its_tail():
+    with tempfile.TemporaryDirectory() as folder:
+        os.mkdir(os.path.join(folder, "out"))
+        log = os.path.join(folder, "app.log")
+        rotated = f"{log}.1"
+        _append(log, b"ip 1.1.1.1\n")
+        _done(folder, log, offset=11)
+        _append(log, b"ip 2.2.2.2\n")
+        # logrotate create: rename, then a new file at the path
+        os.rename(log, rotated)
+        _append(log, b"ip 3.3.3.3\n")
+
+        plans, moves = _plan(folder, [log, rotated])
+        assert moves == [(os.path.join(folder, "out", "app.log"), os.path.join(folder, "out", "app.log.1"))]
+        assert (plans[rotated].offset, plans[rotated].resume, plans[rotated].final) == (11, True, True)
+        assert (plans[log].offset, plans[log].resume) == (0, False)
+
+        # Once done, the record left at the old path is stale
+        _done(folder, rotated, offset=22)
+        _done(folder, log, offset=11)
+        assert _plan(folder, [log, rotated]) == ({}, [])
+
+
+def _tail(input_folder, output_folder, strategy_cls=ObfuscateTail, salt="1234"):
+    options = ["-i", input_folder, "-o", output_folder, "--follow", "--salt", salt, "--serially"]
+    return strategy_cls(get_args_parser().parse_args(options)).run()
+
+
+def _read(path):
+    with open(path, "rb") as reader:
+        return reader.read()
+
+
+def test_tail_run_appends_new_bytes():
+    with tempfile.TemporaryDirectory() as folder:
+        logs, out, once = (os.path.join(folder, name) for name in ("logs", "out", "once"))
+        os.mkdir(logs)
+        log = os.path.join(logs, "app.log")
+        _append(log, b"".join(LINES[:20]) + LINES[20][:9])
+        assert _tail(logs, out) == RCEnum.SUCCESS.value
+        # The line being written waits for its newline
+        assert _read(os.path.join(out, "app.log")).count(b"\n") == 20
+        assert _tail(logs, out) == RCEnum.IGNORED.value
+
+        _append(log, LINES[20][9:] + b"".join(LINES[21:]))
+        assert _tail(logs, out) == RCEnum.SUCCESS.value
+        assert _tail(logs, once) == RCEnum.SUCCESS.value
+        # Two runs, same output as one
+        assert _read(os.path.join(out, "app.log")) == _read(os.path.join(once, "app.log"))
+        assert b"10.0." not in _read(os.path.join(out, "app.log"))
+
+
+def _plan_paths(out, logs):
+    manifest = RunManifest(out, salt="1234").load()
+    files = sorted(os.path.join(logs, name) for name in os.listdir(logs))
+    plans, _ = plan_tail(files, manifest.entries, lambda path: os.path.join(out, os.path.basename(path)), "1234")
+    return [plan.path for plan in plans]
+
+
+class _FailingTail(ObfuscateTail):
+    """Fails on b.log after writing its output, before its checkpoint: like a crash"""
+
+    def tail_one(self, plan):
+        if os.path.basename(plan.path) != "b.log":
+            return super().tail_one(plan)
+        with open(plan.output, "ab") as writer:
+            writer.write(b"half written\n")
+        raise RuntimeError("crash")
+
+
+def test_tail_resumes_after_crash():
+    with tempfile.TemporaryDirectory() as folder:
+        logs, out, once = (os.path.join(folder, name) for name in ("logs", "out", "once"))
+        os.mkdir(logs)
+        for name in ("a.log", "b.log"):
+            _append(os.path.join(logs, name), b"".join(LINES[:30]))
+        assert _tail(logs, out) == RCEnum.SUCCESS.value
+
+        for name in ("a.log", "b.log"):
+            _append(os.path.join(logs, name), b"".join(LINES[30:]))
+        assert _tail(logs, out, _FailingTail) == RCEnum.FAILURE.value
+        # a.log's checkpoint was recorded by its worker: the next run has nothing more to do for it
+        assert _plan_paths(out, logs) == [os.path.join(logs, "b.log")]
+
+        assert _tail(logs, out) == RCEnum.SUCCESS.value
+        assert _tail(logs, once) == RCEnum.SUCCESS.value
+        for name in ("a.log", "b.log"):
+            # Neither written twice, nor the crashed run's bytes left
+            assert _read(os.path.join(out, name)) == _read(os.path.join(once, name)), name
+
+
+
+def test_tail_new_salt_starts_over():
+    with tempfile.TemporaryDirectory() as folder:
+        logs, out, once = (os.path.join(folder, name) for name in ("logs", "out", "once"))
+        os.mkdir(logs)
+        log = os.path.join(logs, "app.log")
+        _append(log, b"".join(LINES[:30]))
+        assert _tail(logs, out) == RCEnum.SUCCESS.value
+
+        _append(log, b"".join(LINES[30:]))
+        assert _tail(logs, out, salt="5678") == RCEnum.SUCCESS.value
+        assert _tail(logs, once, salt="5678") == RCEnum.SUCCESS.value
+        # Rewritten with the new salt: no tokens of the old one left
+        assert _read(os.path.join(out, "app.log")) == _read(os.path.join(once, "app.log"))